@@ -1,8 +1,65 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
 from .models import Medicamento, Proveedor
+from .reconciliacion import RELACIONES, corregir, diferencias
+
+# Diferencias que muestra el reporte de conciliación por relación
+LIMITE_REPORTE = 200
+
+
+# Registro de Medicamentos, con el reporte de conciliación de stock
+@admin.register(Medicamento)
+class MedicamentoAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/farmacia_app/medicamento/change_list.html'
+
+    def get_urls(self):
+        return [
+            path(
+                'reconciliacion/',
+                self.admin_site.admin_view(self.reconciliacion_view),
+                name='farmacia_app_medicamento_reconciliacion',
+            ),
+        ] + super().get_urls()
+
+    def reconciliacion_view(self, request):
+        """
+        Diferencias entre el stock de los medicamentos, sus lotes y lo
+        ingresado; con POST aplica las correcciones
+        """
+        if request.method == 'POST':
+            if not self.has_change_permission(request):
+                messages.error(request, 'No tiene permiso para corregir el stock.')
+            else:
+                # El stock de un medicamento solo se toca si se marcó su fila
+                corregidas = corregir(medicamentos=[
+                    int(pk) for pk in request.POST.getlist('medicamento') if pk.isdigit()
+                ])
+                messages.success(request, 'Correcciones aplicadas: ' + ', '.join(
+                    f'{filas} {relacion}' for relacion, filas in corregidas.items()
+                ) + '.')
+            return redirect('admin:farmacia_app_medicamento_reconciliacion')
+
+        # Una fila de más indica que hay diferencias fuera del reporte
+        relaciones = []
+        for relacion in RELACIONES:
+            filas = list(diferencias(relacion, LIMITE_REPORTE + 1))
+            relaciones.append({
+                'nombre': relacion,
+                'filas': filas[:LIMITE_REPORTE],
+                'truncado': len(filas) > LIMITE_REPORTE,
+            })
+        return TemplateResponse(request, 'admin/farmacia_app/medicamento/reconciliacion.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Conciliación de stock',
+            'relaciones': relaciones,
+            'limite': LIMITE_REPORTE,
+            'puede_corregir': self.has_change_permission(request),
+        })
 
-# Registro de Medicamentos
-admin.site.register(Medicamento)
 
 # Registro de Proveedores con configuración personalizada
 @admin.register(Proveedor)
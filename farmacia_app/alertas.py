@@ -0,0 +1,115 @@
+"""
+Alertas de reposición de stock.
+
+Cada cambio de un Medicamento se evalúa solo para ese medicamento y solo toca
+Alerta_Stock cuando cruza una frontera (stock normal / bajo stock / agotado),
+así que la mayoría de las ventas no agregan consultas. Las operaciones
+masivas, que no emiten señales, llaman a sincronizar_alertas().
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .inventario import FILTRO_AGOTADO, FILTRO_BAJO_STOCK
+from .models import AlertaStock, Medicamento
+
+# Tipo de alerta -> filtro de stock (mismo criterio que el reporte)
+FILTROS_ALERTA = {
+    'agotado': FILTRO_AGOTADO,
+    'bajo_stock': FILTRO_BAJO_STOCK,
+}
+
+
+def tipo_alerta(valores):
+    """
+    Tipo de alerta que corresponde a (cantidad, precio_unitario, stock_minimo),
+    o None si el stock es normal o el medicamento no existe
+    """
+    if valores is None:
+        return None
+    cantidad, _, stock_minimo = valores
+    if cantidad <= 0:
+        return 'agotado'
+    if cantidad <= stock_minimo:
+        return 'bajo_stock'
+    return None
+
+
+def alertas_abiertas():
+    return AlertaStock.objects.filter(fecha_cierre__isnull=True)
+
+
+def registrar_cambio_alerta(id_medicamento, anterior, nuevo):
+    """
+    Abre o cierra la alerta del medicamento si cambió de categoría de stock.
+
+    `anterior` y `nuevo` son (cantidad, precio_unitario, stock_minimo), como
+    en inventario.registrar_cambio_stock.
+    """
+    registrar_cambios_alerta([(id_medicamento, anterior, nuevo)])
+
+
+def registrar_cambios_alerta(cambios):
+    """
+    Como registrar_cambio_alerta para varios (id_medicamento, anterior, nuevo):
+    a lo sumo un UPDATE para cerrar y un INSERT para abrir
+    """
+    cerrar = []
+    abrir = []
+    for id_medicamento, anterior, nuevo in cambios:
+        tipo_anterior = tipo_alerta(anterior)
+        tipo_nuevo = tipo_alerta(nuevo)
+        if tipo_anterior == tipo_nuevo:
+            continue
+        if tipo_anterior is not None:
+            cerrar.append(id_medicamento)
+        if tipo_nuevo is not None:
+            cantidad, _, stock_minimo = nuevo
+            abrir.append(AlertaStock(
+                id_medicamento_id=id_medicamento,
+                tipo=tipo_nuevo,
+                cantidad=cantidad,
+                stock_minimo=stock_minimo,
+            ))
+    if not cerrar and not abrir:
+        return
+
+    with transaction.atomic():
+        if cerrar:
+            alertas_abiertas().filter(id_medicamento__in=cerrar).update(fecha_cierre=timezone.now())
+        if abrir:
+            AlertaStock.objects.bulk_create(abrir)
+
+
+def sincronizar_alertas():
+    """
+    Ajusta todas las alertas al stock actual con consultas por conjuntos;
+    devuelve (abiertas, cerradas)
+    """
+    ahora = timezone.now()
+    cerradas = 0
+    abiertas = 0
+    with transaction.atomic():
+        for tipo, filtro in FILTROS_ALERTA.items():
+            cerradas += alertas_abiertas().filter(tipo=tipo).exclude(
+                id_medicamento__in=Medicamento.objects.filter(filtro).values('pk')
+            ).update(fecha_cierre=ahora)
+
+        for tipo, filtro in FILTROS_ALERTA.items():
+            faltantes = Medicamento.objects.filter(filtro).exclude(
+                pk__in=alertas_abiertas().values('id_medicamento')
+            ).values_list('pk', 'cantidad', 'stock_minimo')
+            nuevas = AlertaStock.objects.bulk_create(
+                (
+                    AlertaStock(
+                        id_medicamento_id=pk,
+                        tipo=tipo,
+                        cantidad=cantidad,
+                        stock_minimo=stock_minimo,
+                        fecha_apertura=ahora,
+                    )
+                    for pk, cantidad, stock_minimo in faltantes.iterator(chunk_size=2000)
+                ),
+                batch_size=500,
+            )
+            abiertas += len(nuevas)
+    return abiertas, cerradas
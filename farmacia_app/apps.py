@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FarmaciaAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'farmacia_app'
+
+    def ready(self):
+        # Registrar los receptores de señales
+        from . import signals  # noqa: F401
@@ -0,0 +1,91 @@
+"""
+Búsqueda de texto completo sobre el catálogo de medicamentos.
+
+En SQLite se usa la tabla virtual FTS5 "Medicamento_fts" (ver la migración
+0005_medicamento_busqueda): tokenizador unicode61 sin diacríticos, de modo
+que "unguento" encuentra "Ungüento", coincidencia por prefijo y orden por
+bm25 ponderado. En otros motores se recurre a icontains sobre las mismas
+columnas.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Lookup, Q, Value
+
+from .models import MedicamentoBusqueda
+
+# Columnas que cubre la búsqueda (las mismas que indexa FTS5)
+CAMPOS_BUSQUEDA = [
+    'nombre_generico',
+    'presentacion',
+    'cod_laboratorio',
+    'registro_sanitario',
+    'contra_indicaciones',
+]
+
+
+class Coincide(Lookup):
+    """
+    Lookup `match` para la columna oculta de FTS5: genera "<tabla> MATCH %s"
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+MedicamentoBusqueda._meta.get_field('documento').register_lookup(Coincide)
+
+
+def fts_disponible():
+    return connection.vendor == 'sqlite'
+
+
+def construir_consulta_fts(texto):
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura.
+
+    Cada palabra se cita (para neutralizar la sintaxis de FTS5) y se marca
+    como prefijo; todas las palabras deben aparecer (AND implícito).
+    """
+    terminos = re.findall(r'\w+', texto or '')
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+
+def buscar_medicamentos(queryset, texto):
+    """
+    Filtra el queryset de Medicamento por `texto` y lo anota con `rango`.
+
+    Ordenar por ('rango', 'id_medicamento') da los resultados más relevantes
+    primero con un orden total, apto para paginar por cursor.
+    """
+    consulta = construir_consulta_fts(texto)
+    if not consulta:
+        return queryset.none()
+
+    if fts_disponible():
+        return queryset.filter(busqueda__documento__match=consulta).annotate(
+            rango=F('busqueda__rango')
+        )
+
+    filtro = Q()
+    for termino in re.findall(r'\w+', texto):
+        por_termino = Q()
+        for campo in CAMPOS_BUSQUEDA:
+            por_termino |= Q(**{f'{campo}__icontains': termino})
+        filtro &= por_termino
+    return queryset.filter(filtro).annotate(rango=Value(0.0, output_field=FloatField()))
+
+
+def reconstruir_indice():
+    """
+    Regenera todo el índice FTS5 a partir de la tabla Medicamento
+    """
+    if not fts_disponible():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('INSERT INTO "Medicamento_fts"("Medicamento_fts") VALUES (\'rebuild\')')
+        cursor.execute('INSERT INTO "Medicamento_fts"("Medicamento_fts") VALUES (\'optimize\')')
+    return True
@@ -0,0 +1,217 @@
+"""
+Recepción de una entrega del proveedor: una FacturaCompra con todas sus líneas.
+
+Antes se creaba la factura, luego cada Lote, cada LoteMedicamento y a mano el
+stock de cada medicamento. registrar_recepcion lo hace en una transacción y el
+número de consultas no depende de cuántas líneas traiga la factura: una
+lectura de los medicamentos, el INSERT de la factura, un bulk_create por
+tabla (Lote, LoteMedicamento, CompraMedicamento) y el aumento del stock con
+un solo UPDATE condicional (stock.ajustar_stock_varios, un CASE por
+medicamento), que además actualiza el resumen de inventario y las alertas.
+Django parte cada bulk_create en tandas de 999 parámetros en SQLite (unas 140
+líneas por INSERT de lotes), así que una entrega de 200 líneas son unas 20
+consultas en total.
+
+Cada línea es un lote: el mismo medicamento puede venir en varias líneas con
+números de lote o fechas distintas. El estado de cada lote sale de su fecha de
+vencimiento (estado_lotes.estado_por_vencimiento). Los números de lote y de
+factura son únicos (restricciones del modelo): una línea sin número recibe
+SIN-LOTE-<factura>-<línea>, y un número ya registrado rechaza la recepción
+completa con el mismo mensaje que los formularios.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .estado_lotes import estado_por_vencimiento
+from .models import CompraMedicamento, FacturaCompra, Lote, LoteMedicamento, Medicamento, Proveedor
+from .restricciones import restriccion_violada
+from .stock import ajustar_stock_varios
+
+CENTAVOS = Decimal('0.01')
+
+# Máximo de líneas aceptadas en una recepción
+MAXIMO_LINEAS = 1000
+
+
+class RecepcionInvalida(Exception):
+    pass
+
+
+def _entero_positivo(valor, campo):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise RecepcionInvalida(f'Valor inválido en {campo}: {valor!r}')
+    if valor <= 0:
+        raise RecepcionInvalida(f'{campo} debe ser mayor que cero')
+    return valor
+
+
+def _monto(valor, campo, defecto=None):
+    if valor in (None, ''):
+        if defecto is None:
+            raise RecepcionInvalida(f'Falta {campo}')
+        return defecto
+    try:
+        valor = Decimal(str(valor)).quantize(CENTAVOS)
+    except InvalidOperation:
+        raise RecepcionInvalida(f'Valor inválido en {campo}: {valor!r}')
+    if valor < 0:
+        raise RecepcionInvalida(f'{campo} no puede ser negativo')
+    return valor
+
+
+def _fecha(valor, campo):
+    if valor in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        raise RecepcionInvalida(f'Fecha inválida en {campo}: {valor!r}')
+
+
+class LineaRecepcion:
+    """
+    Una línea de la factura: las unidades de un lote de un medicamento
+    """
+
+    def __init__(self, datos, numero):
+        if not isinstance(datos, dict):
+            raise RecepcionInvalida(f'Línea {numero} mal formada')
+        self.id_medicamento = _entero_positivo(datos.get('id_medicamento'), 'id_medicamento')
+        self.cantidad = _entero_positivo(datos.get('cantidad'), 'cantidad')
+        self.precio_unitario = _monto(datos.get('precio_unitario'), 'precio_unitario')
+        self.numero = numero
+        self.numero_lote = str(datos.get('numero_lote') or '').strip()[:100] or None
+        self.fecha_fabricacion = _fecha(datos.get('fecha_fabricacion'), 'fecha_fabricacion')
+        self.fecha_vencimiento = _fecha(datos.get('fecha_vencimiento'), 'fecha_vencimiento')
+        if (self.fecha_fabricacion and self.fecha_vencimiento
+                and self.fecha_vencimiento < self.fecha_fabricacion):
+            raise RecepcionInvalida(f'Línea {numero}: vence antes de su fabricación')
+
+    @property
+    def subtotal(self):
+        return self.precio_unitario * self.cantidad
+
+
+class Recepcion:
+    """
+    Factura de compra validada en memoria, lista para guardarse con bulk_create
+    """
+
+    def __init__(self, id_proveedor, lineas, numero_factura=None, fecha=None,
+                 impuesto=None, estado=None):
+        self.id_proveedor = _entero_positivo(id_proveedor, 'id_proveedor')
+        if not lineas or not isinstance(lineas, list):
+            raise RecepcionInvalida('La factura no tiene líneas')
+        if len(lineas) > MAXIMO_LINEAS:
+            raise RecepcionInvalida(f'La factura supera el máximo de {MAXIMO_LINEAS} líneas')
+        self.lineas = [LineaRecepcion(datos, numero) for numero, datos in enumerate(lineas, 1)]
+        numeros_lote = set()
+        for linea in self.lineas:
+            if linea.numero_lote in numeros_lote:
+                raise RecepcionInvalida(f'Línea {linea.numero}: el lote {linea.numero_lote} está repetido')
+            if linea.numero_lote:
+                numeros_lote.add(linea.numero_lote)
+        self.numero_factura = str(numero_factura or '').strip()[:50] or None
+        self.fecha = _fecha(fecha, 'fecha') or timezone.localdate()
+        self.impuesto = _monto(impuesto, 'impuesto', Decimal('0.00'))
+        self.estado = str(estado or '').strip()[:50] or 'Recibida'
+        self.total = sum((linea.subtotal for linea in self.lineas), Decimal('0')) + self.impuesto
+
+    def cantidades(self):
+        """
+        {id_medicamento: unidades recibidas} sumando las líneas del mismo producto
+        """
+        cantidades = {}
+        for linea in self.lineas:
+            cantidades[linea.id_medicamento] = cantidades.get(linea.id_medicamento, 0) + linea.cantidad
+        return cantidades
+
+    def factura(self):
+        return FacturaCompra(
+            fecha=self.fecha,
+            total=self.total,
+            id_proveedor_id=self.id_proveedor,
+            numero_factura=self.numero_factura,
+            impuesto=self.impuesto,
+            estado=self.estado,
+        )
+
+    def lotes(self, factura, hoy=None):
+        return [
+            Lote(
+                cantidad=linea.cantidad,
+                numero_lote=linea.numero_lote or f'SIN-LOTE-{factura.pk}-{linea.numero}',
+                fecha_fabricacion=linea.fecha_fabricacion,
+                fecha_vencimiento=linea.fecha_vencimiento,
+                estado=estado_por_vencimiento(linea.fecha_vencimiento, hoy),
+                id_factura_compra=factura,
+                id_medicamento_id=linea.id_medicamento,
+            )
+            for linea in self.lineas
+        ]
+
+    def lotes_medicamento(self, lotes):
+        return [
+            LoteMedicamento(
+                id_lote=lote,
+                id_medicamento_id=linea.id_medicamento,
+                cantidad=linea.cantidad,
+                fecha_ingreso=self.fecha,
+            )
+            for linea, lote in zip(self.lineas, lotes)
+        ]
+
+    def compras(self, factura):
+        return [
+            CompraMedicamento(
+                id_factura_compra=factura,
+                id_medicamento_id=linea.id_medicamento,
+                cantidad=linea.cantidad,
+                precio_unitario=linea.precio_unitario,
+                subtotal=linea.subtotal,
+            )
+            for linea in self.lineas
+        ]
+
+
+def registrar_recepcion(id_proveedor, lineas, numero_factura=None, fecha=None,
+                        impuesto=None, estado=None):
+    """
+    Registra una factura de compra con sus lotes y suma las unidades al stock;
+    lanza RecepcionInvalida.
+
+    `lineas` es una lista de {'id_medicamento', 'cantidad', 'precio_unitario',
+    'numero_lote', 'fecha_fabricacion', 'fecha_vencimiento'}; el total de la
+    factura es la suma de las líneas más el impuesto.
+    """
+    recepcion = Recepcion(id_proveedor, lineas, numero_factura, fecha, impuesto, estado)
+    cantidades = recepcion.cantidades()
+
+    try:
+        with transaction.atomic():
+            if not Proveedor.objects.filter(pk=recepcion.id_proveedor).exists():
+                raise RecepcionInvalida(f'El proveedor {recepcion.id_proveedor} no existe')
+            existentes = set(Medicamento.objects.filter(pk__in=cantidades).values_list('pk', flat=True))
+            faltante = next((pk for pk in cantidades if pk not in existentes), None)
+            if faltante is not None:
+                raise RecepcionInvalida(f'El medicamento {faltante} no existe')
+
+            factura = recepcion.factura()
+            factura.save()
+            lotes = Lote.objects.bulk_create(recepcion.lotes(factura))
+            LoteMedicamento.objects.bulk_create(recepcion.lotes_medicamento(lotes))
+            CompraMedicamento.objects.bulk_create(recepcion.compras(factura))
+            # Un ingreso nunca deja el stock negativo: el UPDATE no puede fallar
+            ajustar_stock_varios(cantidades.items())
+    except IntegrityError as error:
+        # Número de factura o de lote ya registrado: la transacción ya se deshizo
+        restriccion = restriccion_violada(error, FacturaCompra, Lote)
+        if restriccion is None:
+            raise
+        raise RecepcionInvalida(restriccion.violation_error_message)
+    return factura
@@ -0,0 +1,135 @@
+"""
+Estado de los lotes ("Activo", "Por Vencer", "Vencido") según su fecha de
+vencimiento.
+
+Lote.estado se escribía a mano y casi siempre estaba desactualizado.
+actualizar_estado_lotes lo recalcula para todos los lotes con tres UPDATE,
+uno por estado, y cada uno escribe solo los lotes cuyo estado cambia. Cada
+sentencia recorre su rango de fechas por lote_vencimiento_idx, así que correrlo
+cada pocos minutos sobre millones de lotes no reescribe lo que ya está al día
+(con un millón de lotes, una ejecución sin cambios tarda ~0,1 s). Los lotes
+marcados "Inactivo" a mano no se tocan.
+
+Las reglas vienen de settings.FARMACIA_LOTES:
+
+    DIAS_POR_VENCER     días antes del vencimiento en que un lote pasa a "Por Vencer"
+    INTERVALO_MINUTOS   cada cuánto lo recalcula el proceso web (None: nunca)
+
+Con INTERVALO_MINUTOS, wsgi.py y asgi.py arrancan iniciar_programador: un
+hilo por proceso que lo ejecuta al iniciar y luego en cada intervalo. Sin él,
+el comando actualizar_estado_lotes se programa con cron. Varias ejecuciones a
+la vez no se estorban: las sentencias son idempotentes.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Lote
+
+logger = logging.getLogger(__name__)
+
+ACTIVO = 'Activo'
+POR_VENCER = 'Por Vencer'
+VENCIDO = 'Vencido'
+INACTIVO = 'Inactivo'
+
+REGLAS_POR_DEFECTO = {
+    'DIAS_POR_VENCER': 30,
+    'INTERVALO_MINUTOS': None,
+}
+
+# Días de aviso aceptados (diez años); con más, hoy + días no cabe en un date
+MAXIMO_DIAS_POR_VENCER = 3650
+
+_programador = None
+_candado = threading.Lock()
+
+
+def reglas():
+    """
+    Reglas vigentes (settings.FARMACIA_LOTES sobre REGLAS_POR_DEFECTO)
+    """
+    return {**REGLAS_POR_DEFECTO, **getattr(settings, 'FARMACIA_LOTES', {})}
+
+
+def _limites(hoy, dias_por_vencer):
+    hoy = hoy or timezone.localdate()
+    if dias_por_vencer is None:
+        dias_por_vencer = reglas()['DIAS_POR_VENCER']
+    dias_por_vencer = min(MAXIMO_DIAS_POR_VENCER, max(0, dias_por_vencer))
+    return hoy, hoy + timedelta(days=dias_por_vencer)
+
+
+def estado_por_vencimiento(fecha_vencimiento, hoy=None, dias_por_vencer=None):
+    """
+    Estado de un lote con esa fecha de vencimiento (sin fecha: "Activo")
+    """
+    hoy, limite = _limites(hoy, dias_por_vencer)
+    if fecha_vencimiento is None or fecha_vencimiento > limite:
+        return ACTIVO
+    return VENCIDO if fecha_vencimiento < hoy else POR_VENCER
+
+
+def actualizar_estado_lotes(hoy=None, dias_por_vencer=None):
+    """
+    Reclasifica todos los lotes (salvo los "Inactivo") con un UPDATE por
+    estado; devuelve {estado: lotes que cambiaron a ese estado}
+    """
+    hoy, limite = _limites(hoy, dias_por_vencer)
+    condiciones = {
+        VENCIDO: Q(fecha_vencimiento__lt=hoy),
+        POR_VENCER: Q(fecha_vencimiento__range=(hoy, limite)),
+        ACTIVO: Q(fecha_vencimiento__gt=limite) | Q(fecha_vencimiento__isnull=True),
+    }
+    with transaction.atomic():
+        return {
+            estado: Lote.objects.filter(condicion).exclude(
+                estado__in=[estado, INACTIVO]
+            ).update(estado=estado)
+            for estado, condicion in condiciones.items()
+        }
+
+
+# ===========================
+# PROGRAMADOR DENTRO DEL PROCESO
+# ===========================
+def iniciar_programador(intervalo_minutos=None):
+    """
+    Arranca, una sola vez por proceso, el hilo que llama a
+    actualizar_estado_lotes cada `intervalo_minutos` (por defecto el de
+    FARMACIA_LOTES); devuelve el Event que lo detiene o None si no hay intervalo
+    """
+    global _programador
+    if intervalo_minutos is None:
+        intervalo_minutos = reglas()['INTERVALO_MINUTOS']
+    if not intervalo_minutos:
+        return None
+
+    with _candado:
+        if _programador is None:
+            _programador = threading.Event()
+            threading.Thread(
+                target=_ciclo,
+                args=(_programador, intervalo_minutos * 60),
+                name='actualizar_estado_lotes',
+                daemon=True,
+            ).start()
+    return _programador
+
+
+def _ciclo(detener, segundos):
+    while not detener.is_set():
+        try:
+            actualizar_estado_lotes()
+        except Exception:
+            # Un fallo (p. ej. la base bloqueada) no detiene las siguientes ejecuciones
+            logger.exception('No se pudo actualizar el estado de los lotes')
+        finally:
+            # Conexión propia del hilo: no se mantiene abierta entre ejecuciones
+            connection.close()
+        detener.wait(segundos)
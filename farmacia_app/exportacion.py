@@ -0,0 +1,175 @@
+"""
+Exportación de reportes en CSV y XLSX por streaming.
+
+Las filas llegan de un QuerySet.values_list(...).iterator(chunk_size=...) y se
+escriben al cliente a medida que se leen, así que la memoria no depende del
+tamaño de la tabla. El XLSX se genera fila por fila con zipfile escribiendo
+sobre un búfer que se vacía en cada bloque (sin dependencias externas).
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+# Filas por lectura a la base de datos y por bloque enviado al cliente
+TAMANO_BLOQUE = 2000
+
+FORMATOS = ('csv', 'xlsx')
+
+_CARACTERES_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Eco:
+    """
+    Pseudo-archivo para csv.writer: devuelve lo escrito en vez de guardarlo
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def _filas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca UTF-8 (acentos y ñ)
+    yield '\ufeff' + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+class _BufferZip:
+    """
+    Destino no posicionable para zipfile; acumula bytes hasta que se vacían
+    """
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+_TIPOS_CONTENIDO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_RELACIONES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_RELACIONES_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _libro(nombre_hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nombre_hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _celda(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, (date, datetime)):
+        valor = valor.isoformat()
+    texto = _CARACTERES_INVALIDOS_XML.sub('', str(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _fila_xml(fila):
+    return '<row>' + ''.join(_celda(valor) for valor in fila) + '</row>'
+
+
+def _filas_xlsx(nombre_hoja, encabezados, filas):
+    buffer = _BufferZip()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', _TIPOS_CONTENIDO)
+        archivo.writestr('_rels/.rels', _RELACIONES)
+        archivo.writestr('xl/workbook.xml', _libro(nombre_hoja))
+        archivo.writestr('xl/_rels/workbook.xml.rels', _RELACIONES_LIBRO)
+        yield buffer.vaciar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _fila_xml(encabezados)
+            ).encode('utf-8'))
+            bloque = []
+            for fila in filas:
+                bloque.append(_fila_xml(fila))
+                if len(bloque) >= TAMANO_BLOQUE:
+                    hoja.write(''.join(bloque).encode('utf-8'))
+                    bloque = []
+                    yield buffer.vaciar()
+            hoja.write((''.join(bloque) + '</sheetData></worksheet>').encode('utf-8'))
+    yield buffer.vaciar()
+
+
+def respuesta_exportacion(formato, nombre_archivo, encabezados, queryset_valores):
+    """
+    StreamingHttpResponse con `queryset_valores` (un values_list, o cualquier
+    iterable de filas ya calculadas) en CSV o XLSX
+    """
+    if hasattr(queryset_valores, 'iterator'):
+        filas = queryset_valores.iterator(chunk_size=TAMANO_BLOQUE)
+    else:
+        filas = iter(queryset_valores)
+
+    if formato == 'xlsx':
+        respuesta = StreamingHttpResponse(
+            _filas_xlsx(nombre_archivo, encabezados, filas),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    else:
+        respuesta = StreamingHttpResponse(
+            _filas_csv(encabezados, filas),
+            content_type='text/csv; charset=utf-8',
+        )
+
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return respuesta
@@ -1,13 +1,15 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Medicamento, Proveedor, Empleados, Venta, Lote, FacturaCompra, LoteMedicamento, Cliente, DevolucionCliente, DevolucionProveedor
+from .opciones import OpcionesCacheadasMixin
+from .restricciones import RestriccionesUnicasMixin
 from datetime import date
 
 
 # ========================
 # FORMULARIOS DE PROVEEDORES
 # ========================
-class ProveedorForm(forms.ModelForm):
+class ProveedorForm(RestriccionesUnicasMixin, forms.ModelForm):
     class Meta:
         model = Proveedor
         fields = '__all__'
@@ -56,34 +58,10 @@ class ProveedorForm(forms.ModelForm):
         self.fields['direccion'].required = False
         self.fields['telefono'].required = False
 
-    def clean_ruc(self):
-        ruc = self.cleaned_data.get('ruc')
-        if ruc:
-            # Verificar si ya existe un proveedor con el mismo RUC
-            proveedores = Proveedor.objects.filter(ruc=ruc)
-            if self.instance and self.instance.pk:
-                # Si estamos editando, excluir el registro actual
-                proveedores = proveedores.exclude(pk=self.instance.pk)
-            if proveedores.exists():
-                raise ValidationError('Ya existe un proveedor con este RUC.')
-        return ruc
-
-    def clean_correo(self):
-        correo = self.cleaned_data.get('correo')
-        if correo:
-            # Verificar si ya existe un proveedor con el mismo correo
-            proveedores = Proveedor.objects.filter(correo=correo)
-            if self.instance and self.instance.pk:
-                # Si estamos editando, excluir el registro actual
-                proveedores = proveedores.exclude(pk=self.instance.pk)
-            if proveedores.exists():
-                raise ValidationError('Ya existe un proveedor con este correo electrónico.')
-        return correo
-
 # ========================
 # FORMULARIOS DE MEDICAMENTOS
 # ========================
-class MedicamentoForm(forms.ModelForm):
+class MedicamentoForm(RestriccionesUnicasMixin, forms.ModelForm):
     class Meta:
         model = Medicamento
         fields = '__all__'
@@ -190,28 +168,11 @@ class MedicamentoForm(forms.ModelForm):
             return 10  # Valor por defecto
         return stock_minimo
 
-    def clean_registro_sanitario(self):
-        registro_sanitario = self.cleaned_data.get('registro_sanitario')
-
-        if registro_sanitario:
-            medicamentos = Medicamento.objects.filter(
-                registro_sanitario=registro_sanitario
-            )
-
-            # Si estamos editando, excluir el actual
-            if self.instance and self.instance.pk:
-                medicamentos = medicamentos.exclude(pk=self.instance.pk)
 
-            if medicamentos.exists():
-                raise ValidationError(
-                    'Ya existe un medicamento con este registro sanitario.'
-                )
-
-        return registro_sanitario
 # ========================
 # FORMULARIOS DE EMPLEADOS
 # ========================
-class EmpleadoForm(forms.ModelForm):
+class EmpleadoForm(RestriccionesUnicasMixin, forms.ModelForm):
     class Meta:
         model = Empleados
         fields = '__all__'
@@ -260,37 +221,15 @@ class EmpleadoForm(forms.ModelForm):
         self.fields['telefono'].required = False
         self.fields['correo'].required = False
 
-    def clean_cedula(self):
-        cedula = self.cleaned_data.get('cedula')
-        if cedula:
-            # Verificar si ya existe un empleado con la misma cédula
-            empleados = Empleados.objects.filter(cedula=cedula)
-            if self.instance and self.instance.pk:
-                # Si estamos editando, excluir el registro actual
-                empleados = empleados.exclude(pk=self.instance.pk)
-            if empleados.exists():
-                raise ValidationError('Ya existe un empleado con esta cédula.')
-        return cedula
-
-    def clean_correo(self):
-        correo = self.cleaned_data.get('correo')
-        if correo:
-            # Verificar si ya existe un empleado con el mismo correo
-            empleados = Empleados.objects.filter(correo=correo)
-            if self.instance and self.instance.pk:
-                # Si estamos editando, excluir el registro actual
-                empleados = empleados.exclude(pk=self.instance.pk)
-            if empleados.exists():
-                raise ValidationError('Ya existe un empleado con este correo electrónico.')
-        return correo
-
 # ========================
 # FORMULARIOS DE VENTAS
 # ========================
-class VentaForm(forms.ModelForm):
+class VentaForm(OpcionesCacheadasMixin, forms.ModelForm):
+    OPCIONES = {'id_cliente': 'clientes', 'id_empleado': 'empleados', 'id_medicamento': 'medicamentos'}
+
     class Meta:
         model = Venta
-        fields = '__all__'
+        exclude = ['precio_unitario']
         widgets = {
             'fecha': forms.DateInput(attrs={
                 'class': 'form-control',
@@ -346,7 +285,9 @@ class VentaForm(forms.ModelForm):
         self.fields['descuento'].required = False
         self.fields['impuesto'].required = False
     
-class LoteForm(forms.ModelForm):
+class LoteForm(RestriccionesUnicasMixin, OpcionesCacheadasMixin, forms.ModelForm):
+    OPCIONES = {'id_medicamento': 'medicamentos', 'id_factura_compra': 'facturas'}
+
     class Meta:
         model = Lote
         fields = '__all__'
@@ -393,21 +334,6 @@ class LoteForm(forms.ModelForm):
     # VALIDACIONES PERSONALIZADAS
     # =============================
 
-    def clean_numero_lote(self):
-        numero_lote = self.cleaned_data.get('numero_lote')
-
-        if numero_lote:
-            lotes = Lote.objects.filter(numero_lote=numero_lote)
-
-            # Si estamos editando, excluir el registro actual
-            if self.instance and self.instance.pk:
-                lotes = lotes.exclude(pk=self.instance.pk)
-
-            if lotes.exists():
-                raise ValidationError('Ya existe un lote con este número de lote.')
-
-        return numero_lote
-
     def clean(self):
         cleaned_data = super().clean()
 
@@ -423,7 +349,9 @@ class LoteForm(forms.ModelForm):
 
         return cleaned_data
     
-class FacturaCompraForm(forms.ModelForm):
+class FacturaCompraForm(RestriccionesUnicasMixin, OpcionesCacheadasMixin, forms.ModelForm):
+    OPCIONES = {'id_proveedor': 'proveedores'}
+
     class Meta:
         model = FacturaCompra
         fields = '__all__'
@@ -467,21 +395,6 @@ class FacturaCompraForm(forms.ModelForm):
     # =============================
     # VALIDACIONES PERSONALIZADAS
     # =============================
-    
-    def clean_numero_factura(self):
-        numero_factura = self.cleaned_data.get('numero_factura')
-
-        if numero_factura:
-            facturas = FacturaCompra.objects.filter(numero_factura=numero_factura)
-
-            # Excluir este registro si estamos editando
-            if self.instance and self.instance.pk:
-                facturas = facturas.exclude(pk=self.instance.pk)
-
-            if facturas.exists():
-                raise ValidationError("Ya existe una factura con este número.")
-
-        return numero_factura
 
     def clean(self):
         cleaned_data = super().clean()
@@ -498,7 +411,7 @@ class FacturaCompraForm(forms.ModelForm):
 
         return cleaned_data
     
-class LoteMedicamentoForm(forms.ModelForm):
+class LoteMedicamentoForm(RestriccionesUnicasMixin, forms.ModelForm):
     class Meta:
         model = LoteMedicamento
         fields = '__all__'
@@ -541,29 +454,12 @@ class LoteMedicamentoForm(forms.ModelForm):
         return cantidad
 
     # ===========================================
-    # VALIDACIÓN INDIVIDUAL: evitar duplicados (mismo lote + medicamento)
+    # VALIDACIÓN: fecha de ingreso (los duplicados de lote + medicamento
+    # los rechaza lote_medicamento_unico al guardar)
     # ===========================================
     def clean(self):
         cleaned_data = super().clean()
 
-        lote = cleaned_data.get('id_lote')
-        medicamento = cleaned_data.get('id_medicamento')
-
-        if lote and medicamento:
-            consulta = LoteMedicamento.objects.filter(
-                id_lote=lote,
-                id_medicamento=medicamento
-            )
-
-            # Si está editando, excluir el actual
-            if self.instance and self.instance.pk:
-                consulta = consulta.exclude(pk=self.instance.pk)
-
-            if consulta.exists():
-                raise ValidationError(
-                    "Este medicamento ya está asignado a este lote."
-                )
-
         # Validación: fecha de ingreso no puede ser futura
         fecha_ingreso = cleaned_data.get('fecha_ingreso')
         from datetime import date
@@ -616,7 +512,9 @@ class ClienteForm(forms.ModelForm):
         if fecha and fecha > date.today():
             raise ValidationError("La fecha no puede ser futura.")
         return fecha
-class DevolucionClienteForm(forms.ModelForm):
+class DevolucionClienteForm(OpcionesCacheadasMixin, forms.ModelForm):
+    OPCIONES = {'id_venta': 'ventas', 'id_medicamento': 'medicamentos', 'id_empleado': 'empleados'}
+
     class Meta:
         model = DevolucionCliente
         fields = [
@@ -634,7 +532,9 @@ class DevolucionClienteForm(forms.ModelForm):
             'motivo_devolucion': forms.Textarea(attrs={'rows': 3}),
         }
 
-class DevolucionProveedorForm(forms.ModelForm):
+class DevolucionProveedorForm(OpcionesCacheadasMixin, forms.ModelForm):
+    OPCIONES = {'id_factura_compra': 'facturas', 'id_empleado': 'empleados'}
+
     class Meta:
         model = DevolucionProveedor
         fields = [
@@ -0,0 +1,92 @@
+"""
+Claves de idempotencia para los formularios de creación.
+
+Cada formulario lleva un campo oculto con una clave nueva (ver
+clave_idempotencia, un context processor). La primera petición con esa clave
+la reserva en la caché; si termina en una redirección, se guarda la URL de
+destino durante TTL_SEGUNDOS y cualquier reenvío con la misma clave (doble
+clic, reintento del navegador) recibe esa misma redirección sin ejecutar la
+vista ni tocar la base de datos. Si el formulario tiene errores la reserva se
+libera para poder corregirlo y enviarlo de nuevo.
+
+La caché es la de Django (settings.CACHES), que expira las claves sola; con
+varios procesos debe ser una caché compartida para que la clave los abarque.
+"""
+import re
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils.functional import SimpleLazyObject
+
+CAMPO_CLAVE = 'clave_idempotencia'
+
+# Tiempo que se recuerda el resultado de una clave
+TTL_SEGUNDOS = 60 * 60
+
+# Cuánto espera un reenvío a que termine la petición original
+ESPERA_MAXIMA_SEGUNDOS = 10
+
+EN_PROCESO = '__en_proceso__'
+
+_FORMATO_CLAVE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def clave_idempotencia(request):
+    """
+    Context processor: clave nueva (solo se genera si la plantilla la usa)
+    """
+    return {CAMPO_CLAVE: SimpleLazyObject(lambda: uuid.uuid4().hex)}
+
+
+def _llave_cache(request, clave):
+    return f'idempotencia:{request.user.pk}:{request.path}:{clave}'
+
+
+def _esperar_resultado(llave):
+    limite = time.monotonic() + ESPERA_MAXIMA_SEGUNDOS
+    while time.monotonic() < limite:
+        destino = cache.get(llave)
+        if destino != EN_PROCESO:
+            return destino
+        time.sleep(0.1)
+    return EN_PROCESO
+
+
+def idempotente(vista):
+    """
+    Decorador para vistas de creación que redirigen tras un POST exitoso
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave = request.POST.get(CAMPO_CLAVE, '') if request.method == 'POST' else ''
+        if not _FORMATO_CLAVE.match(clave):
+            # Formularios sin clave (o de otras versiones) se comportan como antes
+            return vista(request, *args, **kwargs)
+
+        llave = _llave_cache(request, clave)
+        if not cache.add(llave, EN_PROCESO, TTL_SEGUNDOS):
+            destino = _esperar_resultado(llave)
+            if destino == EN_PROCESO:
+                return HttpResponse('La solicitud original todavía se está procesando', status=409)
+            if destino is not None:
+                return HttpResponseRedirect(destino)
+            # La petición original falló y liberó la clave: se procesa esta
+            if not cache.add(llave, EN_PROCESO, TTL_SEGUNDOS):
+                return HttpResponse('La solicitud original todavía se está procesando', status=409)
+
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        except Exception:
+            cache.delete(llave)
+            raise
+
+        if isinstance(respuesta, HttpResponseRedirect):
+            cache.set(llave, respuesta.url, TTL_SEGUNDOS)
+        else:
+            cache.delete(llave)
+        return respuesta
+
+    return envoltura
@@ -0,0 +1,225 @@
+"""
+Importación masiva del catálogo de medicamentos desde CSV o JSON.
+
+El archivo se lee en streaming y se procesa por lotes: cada lote se valida en
+memoria contra un conjunto precargado con los registros sanitarios
+existentes (en lugar de un exists() por fila, como hace MedicamentoForm) y
+se guarda con bulk_create / bulk_update dentro de su propia transacción.
+"""
+import csv
+import json
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .alertas import sincronizar_alertas
+from .inventario import recalcular_inventario
+from .models import Medicamento
+from .opciones import invalidar_opciones
+from .sugerencias import invalidar_indice
+
+# Columnas que se pueden importar (el resto de campos se ignora)
+CAMPOS_IMPORTABLES = [
+    'nombre_generico',
+    'fecha_caducidad',
+    'cantidad',
+    'contra_indicaciones',
+    'dosis',
+    'cod_laboratorio',
+    'registro_sanitario',
+    'precauciones',
+    'presentacion',
+    'precio_unitario',
+    'stock_minimo',
+    'via_administracion',
+    'requiere_receta',
+    'estado',
+    'fecha_registro',
+]
+
+CAMPOS_FECHA = {'fecha_caducidad', 'fecha_registro'}
+CAMPOS_ENTEROS = {'cantidad', 'stock_minimo', 'estado'}
+
+TAMANO_LOTE = 500
+
+
+class FilaInvalida(Exception):
+    pass
+
+
+# ===========================
+# LECTURA EN STREAMING
+# ===========================
+def leer_csv(archivo):
+    for fila in csv.DictReader(archivo):
+        yield fila
+
+
+def leer_json(archivo, tamano_bloque=64 * 1024):
+    """
+    Lee un arreglo JSON de objetos (o JSON Lines) objeto por objeto, sin
+    cargar todo el archivo en memoria
+    """
+    decodificador = json.JSONDecoder()
+    pendiente = ''
+    fin = False
+    while True:
+        pendiente = pendiente.lstrip(' \t\r\n,[]')
+        if not pendiente:
+            if fin:
+                return
+            bloque = archivo.read(tamano_bloque)
+            fin = not bloque
+            pendiente += bloque
+            continue
+        try:
+            objeto, posicion = decodificador.raw_decode(pendiente)
+        except json.JSONDecodeError:
+            if fin:
+                raise
+            bloque = archivo.read(tamano_bloque)
+            fin = not bloque
+            pendiente += bloque
+            continue
+        yield objeto
+        pendiente = pendiente[posicion:]
+
+
+# ===========================
+# VALIDACIÓN
+# ===========================
+def _texto(valor):
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def limpiar_fila(fila):
+    """
+    Convierte una fila cruda en los valores del modelo o lanza FilaInvalida
+    """
+    datos = {}
+    for campo in CAMPOS_IMPORTABLES:
+        valor = _texto(fila.get(campo))
+        if valor is None:
+            continue
+        try:
+            if campo in CAMPOS_FECHA:
+                valor = date.fromisoformat(valor)
+            elif campo in CAMPOS_ENTEROS:
+                valor = int(valor)
+            elif campo == 'precio_unitario':
+                valor = Decimal(valor).quantize(Decimal('0.01'))
+            elif campo == 'requiere_receta':
+                valor = valor.lower() in ('1', 'true', 'si', 'sí', 'yes')
+        except (ValueError, InvalidOperation):
+            raise FilaInvalida(f'Valor inválido en {campo}: {valor!r}')
+        datos[campo] = valor
+
+    if not datos.get('nombre_generico'):
+        raise FilaInvalida('Falta nombre_generico')
+    if datos.get('cantidad', 0) < 0:
+        raise FilaInvalida('La cantidad no puede ser negativa')
+    if datos.get('precio_unitario', 0) < 0:
+        raise FilaInvalida('El precio no puede ser negativo')
+    if datos.get('estado', 1) not in (0, 1):
+        raise FilaInvalida('El estado debe ser 0 o 1')
+    return datos
+
+
+# ===========================
+# IMPORTACIÓN
+# ===========================
+class ResultadoImportacion:
+
+    def __init__(self):
+        self.creados = 0
+        self.actualizados = 0
+        self.rechazados = []  # (número de fila, motivo)
+        self.segundos = 0.0
+
+    @property
+    def procesados(self):
+        return self.creados + self.actualizados + len(self.rechazados)
+
+    @property
+    def filas_por_segundo(self):
+        return self.procesados / self.segundos if self.segundos else 0.0
+
+
+def _guardar_lote(lote, existentes, resultado):
+    """
+    Inserta los nuevos y actualiza los existentes del lote en una transacción
+    """
+    nuevos = []
+    # Los existentes se agrupan por columnas presentes para no pisar con
+    # valores por defecto las columnas que la fila no trae
+    actualizar = {}
+    for datos in lote:
+        id_existente = existentes.get(datos.get('registro_sanitario'))
+        if id_existente is None:
+            nuevos.append(Medicamento(**datos))
+        else:
+            actualizar.setdefault(frozenset(datos), []).append(
+                Medicamento(id_medicamento=id_existente, **datos)
+            )
+
+    with transaction.atomic():
+        if nuevos:
+            Medicamento.objects.bulk_create(nuevos, batch_size=len(nuevos))
+        for campos, medicamentos in actualizar.items():
+            Medicamento.objects.bulk_update(medicamentos, sorted(campos), batch_size=len(medicamentos))
+
+    resultado.creados += len(nuevos)
+    resultado.actualizados += sum(len(grupo) for grupo in actualizar.values())
+
+
+def importar_medicamentos(filas, tamano_lote=TAMANO_LOTE):
+    """
+    Importa un iterable de diccionarios; devuelve un ResultadoImportacion
+    """
+    inicio = time.monotonic()
+    resultado = ResultadoImportacion()
+
+    # Un solo recorrido para conocer los registros sanitarios ya cargados
+    existentes = dict(
+        Medicamento.objects.exclude(registro_sanitario__isnull=True)
+        .exclude(registro_sanitario='')
+        .values_list('registro_sanitario', 'id_medicamento')
+    )
+    vistos_en_archivo = set()
+
+    lote = []
+    for numero, fila in enumerate(filas, start=1):
+        try:
+            datos = limpiar_fila(fila)
+        except FilaInvalida as e:
+            resultado.rechazados.append((numero, str(e)))
+            continue
+
+        registro = datos.get('registro_sanitario')
+        if registro:
+            if registro in vistos_en_archivo:
+                resultado.rechazados.append((numero, f'Registro sanitario repetido en el archivo: {registro}'))
+                continue
+            vistos_en_archivo.add(registro)
+
+        lote.append(datos)
+        if len(lote) >= tamano_lote:
+            _guardar_lote(lote, existentes, resultado)
+            lote = []
+
+    if lote:
+        _guardar_lote(lote, existentes, resultado)
+
+    # Las operaciones masivas no emiten señales: se refrescan los derivados
+    recalcular_inventario()
+    sincronizar_alertas()
+    invalidar_indice()
+    invalidar_opciones(Medicamento)
+
+    resultado.segundos = time.monotonic() - inicio
+    return resultado
@@ -0,0 +1,143 @@
+"""
+Cálculos de inventario hechos en la base de datos.
+
+Las categorías de stock se definen una sola vez aquí para que el reporte,
+los conteos y los listados por categoría usen exactamente el mismo criterio.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventarioResumen, Medicamento
+
+# Categorías de stock (mismo criterio que medicamento_detail)
+FILTRO_AGOTADO = Q(cantidad__lte=0)
+FILTRO_BAJO_STOCK = Q(cantidad__gt=0, cantidad__lte=F('stock_minimo'))
+FILTRO_STOCK_NORMAL = Q(cantidad__gt=F('stock_minimo'))
+
+CATEGORIAS_STOCK = {
+    'agotados': FILTRO_AGOTADO,
+    'bajo_stock': FILTRO_BAJO_STOCK,
+    'normal': FILTRO_STOCK_NORMAL,
+}
+
+VALOR_INVENTARIO = ExpressionWrapper(
+    F('cantidad') * F('precio_unitario'),
+    output_field=DecimalField(max_digits=20, decimal_places=2),
+)
+
+
+def resumen_inventario(queryset=None):
+    """
+    Valor del inventario y conteos por categoría en una sola consulta
+    """
+    if queryset is None:
+        queryset = Medicamento.objects.all()
+    return queryset.aggregate(
+        total_medicamentos=Count('pk'),
+        total_valor_inventario=Coalesce(
+            Sum(VALOR_INVENTARIO),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=20, decimal_places=2),
+        ),
+        total_agotados=Count('pk', filter=FILTRO_AGOTADO),
+        total_bajo_stock=Count('pk', filter=FILTRO_BAJO_STOCK),
+        total_stock_normal=Count('pk', filter=FILTRO_STOCK_NORMAL),
+    )
+
+
+def medicamentos_por_categoria(categoria):
+    """
+    Queryset (sin evaluar) de los medicamentos de una categoría de stock
+    """
+    return Medicamento.objects.filter(CATEGORIAS_STOCK[categoria])
+
+
+# ===========================
+# RESUMEN MANTENIDO POR DIFERENCIAS
+# ===========================
+ID_RESUMEN = 1
+
+
+def _contribucion(valores):
+    """
+    Aporte de un medicamento al resumen: (valor, cuenta, agotado, bajo stock).
+
+    `valores` es (cantidad, precio_unitario, stock_minimo) o None si el
+    medicamento no existe (antes de crearlo o después de borrarlo).
+    """
+    if valores is None:
+        return Decimal('0'), 0, 0, 0
+    cantidad, precio_unitario, stock_minimo = valores
+    valor = Decimal(cantidad) * Decimal(precio_unitario or 0)
+    agotado = 1 if cantidad <= 0 else 0
+    bajo_stock = 1 if 0 < cantidad <= stock_minimo else 0
+    return valor, 1, agotado, bajo_stock
+
+
+def registrar_cambio_stock(anterior, nuevo):
+    """
+    Aplica al resumen la diferencia entre el estado anterior y el nuevo de un
+    medicamento con un solo UPDATE atómico (sin leer la fila del resumen)
+    """
+    registrar_cambios_stock([(anterior, nuevo)])
+
+
+def registrar_cambios_stock(cambios):
+    """
+    Como registrar_cambio_stock para varios (anterior, nuevo) en un solo UPDATE
+    """
+    delta = [Decimal('0'), 0, 0, 0]
+    for anterior, nuevo in cambios:
+        for i, (a, n) in enumerate(zip(_contribucion(anterior), _contribucion(nuevo))):
+            delta[i] += n - a
+    if not any(delta):
+        return
+    valor, cuenta, agotados, bajo_stock = delta
+    InventarioResumen.objects.filter(pk=ID_RESUMEN).update(
+        valor_inventario=F('valor_inventario') + valor,
+        total_medicamentos=F('total_medicamentos') + cuenta,
+        total_agotados=F('total_agotados') + agotados,
+        total_bajo_stock=F('total_bajo_stock') + bajo_stock,
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+def recalcular_inventario():
+    """
+    Recalcula el resumen desde cero y lo guarda; devuelve (resumen, anterior)
+    """
+    datos = resumen_inventario()
+    anterior = InventarioResumen.objects.filter(pk=ID_RESUMEN).first()
+    resumen, _ = InventarioResumen.objects.update_or_create(
+        pk=ID_RESUMEN,
+        defaults={
+            'valor_inventario': datos['total_valor_inventario'],
+            'total_medicamentos': datos['total_medicamentos'],
+            'total_agotados': datos['total_agotados'],
+            'total_bajo_stock': datos['total_bajo_stock'],
+            'fecha_actualizacion': timezone.now(),
+        },
+    )
+    return resumen, anterior
+
+
+def obtener_resumen_inventario():
+    """
+    Lee la fila del resumen (una consulta) con las mismas llaves que resumen_inventario
+    """
+    resumen = InventarioResumen.objects.filter(pk=ID_RESUMEN).first()
+    if resumen is None:
+        resumen, _ = recalcular_inventario()
+    return {
+        'total_medicamentos': resumen.total_medicamentos,
+        'total_valor_inventario': resumen.valor_inventario,
+        'total_agotados': resumen.total_agotados,
+        'total_bajo_stock': resumen.total_bajo_stock,
+        'total_stock_normal': (
+            resumen.total_medicamentos - resumen.total_agotados - resumen.total_bajo_stock
+        ),
+        'fecha_actualizacion': resumen.fecha_actualizacion,
+    }
@@ -0,0 +1,115 @@
+"""
+Asignación de lotes a las ventas (FEFO: primero en vencer, primero en salir).
+
+Cada línea vendida toma sus unidades de los lotes con existencias de su
+medicamento en orden de fecha_vencimiento (los lotes sin fecha al final),
+saltando los ya vencidos, y la asignación queda registrada en AsignacionLote.
+Lo que ningún lote cubre se registra sin lote, para que la diferencia entre
+el stock y los lotes quede a la vista en lugar de perderse.
+
+El costo no depende de cuántas líneas traiga la venta: una lectura de los
+lotes de sus medicamentos por el índice lote_medicamento_venc_idx (los
+agotados se saltan al leer), un UPDATE (un CASE por lote) y un bulk_create.
+Se llama dentro de la transacción de la venta después de descontar el stock,
+cuyo UPDATE ya bloquea los medicamentos y serializa las ventas del mismo
+producto.
+"""
+from collections import defaultdict, deque
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import AsignacionLote, Lote
+
+
+def _por_lote(valores):
+    """
+    CASE id_lote WHEN ... THEN valor END para un dict {pk: valor}
+    """
+    return Case(
+        *[When(pk=pk, then=Value(valor)) for pk, valor in valores.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _sumar_a_lotes(deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    if deltas:
+        Lote.objects.filter(pk__in=deltas).update(cantidad=F('cantidad') + _por_lote(deltas))
+
+
+def lotes_disponibles(ids_medicamento, fecha=None):
+    """
+    Lotes con existencias y sin vencer de los medicamentos, en orden FEFO
+    """
+    fecha = fecha or timezone.localdate()
+    return Lote.objects.filter(
+        Q(fecha_vencimiento__gte=fecha) | Q(fecha_vencimiento__isnull=True),
+        id_medicamento__in=ids_medicamento,
+        cantidad__gt=0,
+    ).order_by('id_medicamento', F('fecha_vencimiento').asc(nulls_last=True), 'id_lote')
+
+
+def asignar_lotes(lineas):
+    """
+    Asigna lotes a [(venta, factura o None, id_medicamento, cantidad)] y
+    descuenta sus existencias; devuelve las AsignacionLote creadas
+    """
+    lineas = [linea for linea in lineas if linea[2] is not None and linea[3] > 0]
+    if not lineas:
+        return []
+
+    with transaction.atomic():
+        abiertos = defaultdict(deque)
+        for pk, id_medicamento, cantidad in lotes_disponibles(
+            {id_medicamento for _, _, id_medicamento, _ in lineas}
+        ).select_for_update().values_list('pk', 'id_medicamento', 'cantidad'):
+            abiertos[id_medicamento].append([pk, cantidad])
+
+        asignaciones = []
+        consumo = defaultdict(int)
+        for venta, factura, id_medicamento, cantidad in lineas:
+            pendientes = cantidad
+            lotes = abiertos[id_medicamento]
+            while pendientes and lotes:
+                lote = lotes[0]
+                tomadas = min(pendientes, lote[1])
+                asignaciones.append(AsignacionLote(
+                    id_venta=venta, id_factura=factura, id_lote_id=lote[0],
+                    id_medicamento_id=id_medicamento, cantidad=tomadas,
+                ))
+                consumo[lote[0]] -= tomadas
+                pendientes -= tomadas
+                lote[1] -= tomadas
+                if not lote[1]:
+                    lotes.popleft()
+            if pendientes:
+                asignaciones.append(AsignacionLote(
+                    id_venta=venta, id_factura=factura, id_lote=None,
+                    id_medicamento_id=id_medicamento, cantidad=pendientes,
+                ))
+
+        _sumar_a_lotes(consumo)
+        return AsignacionLote.objects.bulk_create(asignaciones)
+
+
+def liberar_lotes(ventas):
+    """
+    Devuelve a sus lotes las unidades asignadas a las ventas y borra las
+    asignaciones (al eliminar o editar una venta)
+    """
+    with transaction.atomic():
+        asignaciones = list(
+            AsignacionLote.objects.filter(id_venta__in=ventas).values_list('pk', 'id_lote', 'cantidad')
+        )
+        if not asignaciones:
+            return
+        borradas, _ = AsignacionLote.objects.filter(pk__in=[pk for pk, _, _ in asignaciones]).delete()
+        # Si otra petición ya las liberó, no se devuelven dos veces
+        if borradas != len(asignaciones):
+            return
+        devoluciones = defaultdict(int)
+        for _, id_lote, cantidad in asignaciones:
+            devoluciones[id_lote] += cantidad
+        _sumar_a_lotes(devoluciones)
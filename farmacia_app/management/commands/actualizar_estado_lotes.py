@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from farmacia_app.estado_lotes import MAXIMO_DIAS_POR_VENCER, actualizar_estado_lotes, reglas
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el estado (Activo, Por Vencer, Vencido) de todos los lotes según su '
+        'fecha de vencimiento; pensado para correr cada pocos minutos desde cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Días de aviso antes del vencimiento (por defecto FARMACIA_LOTES)')
+
+    def handle(self, *args, **options):
+        dias = reglas()['DIAS_POR_VENCER'] if options['dias'] is None else options['dias']
+        if not 0 <= dias <= MAXIMO_DIAS_POR_VENCER:
+            raise CommandError(f'--dias debe estar entre 0 y {MAXIMO_DIAS_POR_VENCER}')
+        cambios = actualizar_estado_lotes(dias_por_vencer=dias)
+        resumen = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in cambios.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Estado de los lotes actualizado ({dias} días de aviso). Cambios: {resumen}.'
+        ))
@@ -0,0 +1,194 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+
+from farmacia_app.models import Cliente, FacturaCompra, Lote, Medicamento, Proveedor, Venta
+
+# Índices agregados en 0007_indices_rendimiento: (modelo, nombre). Los de
+# búsqueda exacta son desde 0015 las restricciones únicas que los reemplazaron
+INDICES = [
+    (Medicamento, 'medicamento_registro_unico'),
+    (Lote, 'lote_numero_unico'),
+    (Lote, 'lote_vencimiento_idx'),
+    (Venta, 'venta_fecha_idx'),
+    (FacturaCompra, 'facturacompra_numero_unico'),
+    (Proveedor, 'proveedor_ruc_unico'),
+    (Cliente, 'cliente_cedula_idx'),
+]
+
+HOY = date(2025, 1, 1)
+
+
+def _consultas(filas):
+    """
+    Consultas de las vistas y formularios que dependen de los índices
+    """
+    muestra = filas // 2
+    return [
+        # Ya servida por medicamento_nombre_id_idx (0004); sirve de referencia
+        ('Medicamentos activos por nombre',
+         Medicamento.objects.filter(estado=1).order_by('nombre_generico', 'id_medicamento')[:50]),
+        ('Medicamento por registro sanitario',
+         Medicamento.objects.filter(registro_sanitario=f'RS-{muestra}')),
+        ('Lote por número',
+         Lote.objects.filter(numero_lote=f'L-{muestra}')),
+        ('Lotes por vencer (30 días)',
+         Lote.objects.filter(fecha_vencimiento__range=(HOY, HOY + timedelta(days=30)))
+         .order_by('fecha_vencimiento', 'id_lote')[:50]),
+        ('Ventas del día',
+         Venta.objects.filter(fecha=HOY).order_by('-fecha', '-id_venta')[:50]),
+        ('Factura por número',
+         FacturaCompra.objects.filter(numero_factura=f'F-{muestra % 1000}')),
+        ('Proveedor por RUC',
+         Proveedor.objects.filter(ruc=f'RUC-{muestra % 100}')),
+        ('Cliente por cédula',
+         Cliente.objects.filter(cedula=f'C-{muestra}')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el plan (EXPLAIN QUERY PLAN) y el tiempo de las consultas frecuentes '
+        'con y sin los índices de rendimiento, sobre una base de prueba con datos sintéticos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=100000,
+                            help='Medicamentos, lotes, ventas y clientes a generar (por tabla)')
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Ejecuciones por consulta para medir el tiempo')
+
+    def handle(self, *args, **options):
+        filas = options['filas']
+        repeticiones = options['repeticiones']
+
+        # Nunca sobre Farmacia.db: se crea (y luego destruye) una base de prueba
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.stdout.write(f'Generando {filas} filas por tabla...')
+            self._poblar(filas)
+            consultas = _consultas(filas)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== Sin índices =='))
+            self._alternar_indices(crear=False)
+            sin_indices = self._medir(consultas, repeticiones)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== Con índices =='))
+            self._alternar_indices(crear=True)
+            con_indices = self._medir(consultas, repeticiones)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\n== Resumen (ms por consulta) =='))
+            for (nombre, _), antes, despues in zip(consultas, sin_indices, con_indices):
+                mejora = antes / despues if despues else 0
+                self.stdout.write(f'{nombre:40} {antes:10.3f} {despues:10.3f}   x{mejora:.1f}')
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _poblar(self, filas):
+        aleatorio = random.Random(0)
+        proveedores = Proveedor.objects.bulk_create(
+            [Proveedor(nombre_contacto=f'Proveedor {i}', ruc=f'RUC-{i}' if i % 5 else None) for i in range(100)]
+        )
+        facturas = FacturaCompra.objects.bulk_create(
+            [
+                FacturaCompra(
+                    fecha=HOY - timedelta(days=i % 365),
+                    total=Decimal('100.00'),
+                    id_proveedor=proveedores[i % len(proveedores)],
+                    numero_factura=f'F-{i}',
+                )
+                for i in range(1000)
+            ],
+            batch_size=1000,
+        )
+        Medicamento.objects.bulk_create(
+            (
+                Medicamento(
+                    nombre_generico=f'Medicamento {aleatorio.randrange(filas):07d}',
+                    cantidad=aleatorio.randrange(0, 200),
+                    precio_unitario=Decimal('1.00'),
+                    # Un tercio sin registro y un cuarto inactivos, como en producción
+                    registro_sanitario=f'RS-{i}' if i % 3 else None,
+                    estado=0 if i % 4 == 0 else 1,
+                )
+                for i in range(filas)
+            ),
+            batch_size=2000,
+        )
+        ids_medicamento = list(Medicamento.objects.values_list('pk', flat=True))
+        Lote.objects.bulk_create(
+            (
+                Lote(
+                    cantidad=100,
+                    numero_lote=f'L-{i}',
+                    fecha_vencimiento=HOY + timedelta(days=aleatorio.randrange(-365, 1095)),
+                    id_factura_compra=facturas[i % len(facturas)],
+                    id_medicamento_id=aleatorio.choice(ids_medicamento),
+                )
+                for i in range(filas)
+            ),
+            batch_size=2000,
+        )
+        Cliente.objects.bulk_create(
+            (Cliente(nombre=f'Cliente {i}', cedula=f'C-{i}' if i % 2 else None) for i in range(filas)),
+            batch_size=2000,
+        )
+        Venta.objects.bulk_create(
+            (
+                Venta(
+                    fecha=HOY - timedelta(days=aleatorio.randrange(730)),
+                    total=Decimal('10.00'),
+                    id_medicamento_id=aleatorio.choice(ids_medicamento),
+                )
+                for i in range(filas)
+            ),
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _alternar_indices(self, crear):
+        indices, restricciones = [], []
+        for modelo, nombre in INDICES:
+            indice = next(i for i in modelo._meta.indexes + modelo._meta.constraints if i.name == nombre)
+            (indices if isinstance(indice, models.Index) else restricciones).append((modelo, indice))
+        with connection.schema_editor() as editor:
+            # SQLite reconstruye la tabla para una restricción sin condición y
+            # la vuelve a crear con todos sus índices: las restricciones se
+            # quitan antes que los índices y se agregan después
+            if crear:
+                for modelo, indice in indices:
+                    editor.add_index(modelo, indice)
+                for modelo, restriccion in restricciones:
+                    editor.add_constraint(modelo, restriccion)
+            else:
+                for modelo, restriccion in restricciones:
+                    editor.remove_constraint(modelo, restriccion)
+                for modelo, indice in indices:
+                    editor.remove_index(modelo, indice)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _medir(self, consultas, repeticiones):
+        tiempos = []
+        with connection.cursor() as cursor:
+            for nombre, queryset in consultas:
+                sql, parametros = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)
+                plan = '; '.join(fila[-1] for fila in cursor.fetchall())
+
+                inicio = time.perf_counter()
+                for _ in range(repeticiones):
+                    cursor.execute(sql, parametros)
+                    cursor.fetchall()
+                milisegundos = (time.perf_counter() - inicio) * 1000 / repeticiones
+                tiempos.append(milisegundos)
+
+                self.stdout.write(f'{nombre}: {milisegundos:.3f} ms')
+                self.stdout.write(f'    {plan}')
+        return tiempos
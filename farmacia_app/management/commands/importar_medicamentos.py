@@ -0,0 +1,57 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from farmacia_app.importacion import TAMANO_LOTE, importar_medicamentos, leer_csv, leer_json
+
+
+class Command(BaseCommand):
+    help = 'Importa (o actualiza por registro sanitario) el catálogo de medicamentos desde CSV o JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv, .json o .jsonl')
+        parser.add_argument(
+            '--formato', choices=['csv', 'json'],
+            help='Formato del archivo (por defecto se deduce de la extensión)'
+        )
+        parser.add_argument(
+            '--tamano-lote', type=int, default=TAMANO_LOTE,
+            help=f'Filas por transacción (por defecto {TAMANO_LOTE})'
+        )
+        parser.add_argument(
+            '--rechazados',
+            help='Ruta de un CSV donde escribir las filas rechazadas y su motivo'
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not os.path.exists(ruta):
+            raise CommandError(f'No existe el archivo {ruta}')
+        if options['tamano_lote'] < 1:
+            raise CommandError('El tamaño de lote debe ser mayor a cero')
+
+        formato = options['formato']
+        if formato is None:
+            formato = 'csv' if ruta.lower().endswith('.csv') else 'json'
+        lector = leer_csv if formato == 'csv' else leer_json
+
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+            resultado = importar_medicamentos(lector(archivo), options['tamano_lote'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Creados: {resultado.creados}, actualizados: {resultado.actualizados}, '
+            f'rechazados: {len(resultado.rechazados)} '
+            f'({resultado.filas_por_segundo:.0f} filas/s en {resultado.segundos:.2f} s)'
+        ))
+
+        for numero, motivo in resultado.rechazados[:20]:
+            self.stdout.write(self.style.WARNING(f'Fila {numero}: {motivo}'))
+        if len(resultado.rechazados) > 20:
+            self.stdout.write(f'... y {len(resultado.rechazados) - 20} más')
+
+        if options['rechazados'] and resultado.rechazados:
+            with open(options['rechazados'], 'w', encoding='utf-8', newline='') as salida:
+                escritor = csv.writer(salida)
+                escritor.writerow(['fila', 'motivo'])
+                escritor.writerows(resultado.rechazados)
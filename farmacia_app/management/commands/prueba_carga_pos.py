@@ -0,0 +1,286 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from farmacia_app.models import Medicamento, VentaDiaria
+from farmacia_app.precios import cotizar
+
+# Rutas de cada aplicación: la WSGI usa las vistas síncronas y la ASGI las del POS
+RUTAS = {
+    'WSGI': {'sugerencias': 'medicamento_sugerencias', 'cobro': 'venta_checkout'},
+    'ASGI': {'sugerencias': 'medicamento_sugerencias_pos', 'cobro': 'venta_checkout_pos'},
+}
+
+# Host aceptado por ALLOWED_HOSTS durante la prueba
+HOST = 'localhost'
+
+# Días de historial del acumulado que recorre el reporte
+DIAS_HISTORIAL = 3 * 365
+
+
+def _percentil(valores, proporcion):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * proporcion))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga del POS: con reportes lentos en curso, los terminales envían peticiones '
+        '(autocompletado y cobro) a un ritmo fijo, primero a la aplicación WSGI con un número fijo '
+        'de workers y luego a la ASGI, sobre una base de prueba; compara la latencia y el '
+        'rendimiento de las peticiones del POS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medicamentos', type=int, default=2000,
+                            help='Medicamentos a generar')
+        parser.add_argument('--historial', type=int, default=500000,
+                            help='Filas del acumulado de ventas que agrupa cada reporte')
+        parser.add_argument('--reportes', type=int, default=2,
+                            help='Reportes lentos (ventas mensuales de todo el historial) enviados al inicio')
+        parser.add_argument('--pos', type=int, default=300,
+                            help='Peticiones del POS (un tercio son cobros)')
+        parser.add_argument('--tasa', type=float, default=100,
+                            help='Peticiones del POS que llegan por segundo')
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Hilos de la aplicación WSGI (como los workers de gunicorn)')
+
+    def handle(self, *args, **options):
+        # Nunca sobre Farmacia.db: se crea (y luego destruye) una base de prueba
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            # DEBUG registra cada consulta y distorsiona los tiempos
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=[HOST]):
+                self.stdout.write(
+                    f'Generando {options["medicamentos"]} medicamentos y '
+                    f'{options["historial"]} filas de historial...'
+                )
+                self._preparar(options['medicamentos'], options['historial'])
+
+                resultados = {}
+                for nombre in ('WSGI', 'ASGI'):
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {nombre} =='))
+                    resultados[nombre] = self._ejecutar(nombre, options)
+                    self._mostrar(resultados[nombre])
+
+                wsgi, asgi = resultados['WSGI'], resultados['ASGI']
+                self.stdout.write(self.style.MIGRATE_HEADING('\n== Resumen (POS) =='))
+                self.stdout.write(f'{"":22} {"WSGI":>10} {"ASGI":>10}')
+                self.stdout.write(f'{"peticiones/s":22} {wsgi["por_segundo"]:10.1f} {asgi["por_segundo"]:10.1f}')
+                self.stdout.write(f'{"latencia p50 (ms)":22} {wsgi["p50"]:10.1f} {asgi["p50"]:10.1f}')
+                self.stdout.write(f'{"latencia p95 (ms)":22} {wsgi["p95"]:10.1f} {asgi["p95"]:10.1f}')
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _preparar(self, cantidad, historial):
+        Medicamento.objects.bulk_create(
+            (
+                Medicamento(
+                    nombre_generico=f'Medicamento {i:07d}',
+                    cantidad=10 ** 6,
+                    precio_unitario=Decimal('1.00'),
+                )
+                for i in range(cantidad)
+            ),
+            batch_size=2000,
+        )
+        self.ids = list(Medicamento.objects.values_list('pk', flat=True))
+        self.monto = str(cotizar({self.ids[0]: 1}).total)
+
+        # Una fila por (día, medicamento, empleado), sin repetir la clave única
+        self.desde = timezone.localdate() - timedelta(days=DIAS_HISTORIAL)
+        VentaDiaria.objects.bulk_create(
+            (
+                VentaDiaria(
+                    fecha=self.desde + timedelta(days=i % DIAS_HISTORIAL),
+                    id_medicamento=self.ids[i // DIAS_HISTORIAL % len(self.ids)],
+                    id_empleado=i // (DIAS_HISTORIAL * len(self.ids)),
+                    unidades=1,
+                    monto=Decimal('1.00'),
+                    numero_ventas=1,
+                )
+                for i in range(historial)
+            ),
+            batch_size=2000,
+        )
+
+        usuario = get_user_model().objects.create_user(
+            username='prueba-carga', password=get_random_string(20), rol='administrador'
+        )
+        cliente = Client()
+        cliente.force_login(usuario)
+        self.csrf = get_random_string(32)
+        self.cookie = (
+            f'{settings.SESSION_COOKIE_NAME}={cliente.cookies[settings.SESSION_COOKIE_NAME].value}; '
+            f'{settings.CSRF_COOKIE_NAME}={self.csrf}'
+        )
+
+    def _peticiones(self, nombre, options):
+        """
+        [(tipo, llegada en segundos, método, ruta, cuerpo)]: los reportes
+        llegan al inicio y el POS a ritmo constante
+        """
+        rutas = RUTAS[nombre]
+        # El reporte pasa casi todo su tiempo agrupando en SQLite, esperando a la base
+        reporte = f'{reverse("venta_reporte")}?periodo=mensual&desde={self.desde.isoformat()}'
+        peticiones = [('reporte', 0, 'GET', reporte, b'')] * options['reportes']
+        for i in range(options['pos']):
+            llegada = i / options['tasa']
+            pk = self.ids[i % len(self.ids)]
+            if i % 3 == 0:
+                cuerpo = (
+                    f'{{"lineas": [{{"id_medicamento": {pk}, "cantidad": 1}}], '
+                    f'"pagos": [{{"tipo_pago": "Efectivo", "monto": "{self.monto}"}}]}}'
+                ).encode()
+                peticiones.append(('pos', llegada, 'POST', reverse(rutas['cobro']), cuerpo))
+            else:
+                ruta = f'{reverse(rutas["sugerencias"])}?q=medicamento%20{i % 1000:04d}'
+                peticiones.append(('pos', llegada, 'GET', ruta, b''))
+        return peticiones
+
+    def _ejecutar(self, nombre, options):
+        peticiones = self._peticiones(nombre, options)
+        calentamiento = [p for p in peticiones if p[0] == 'pos'][:2]
+        if nombre == 'WSGI':
+            aplicacion = get_wsgi_application()
+            for _, _, metodo, ruta, cuerpo in calentamiento:
+                self._wsgi(aplicacion, metodo, ruta, cuerpo)
+            return self._medir_wsgi(aplicacion, peticiones, options['workers'])
+        aplicacion = get_asgi_application()
+        return asyncio.run(self._medir_asgi(aplicacion, peticiones, calentamiento))
+
+    # ===========================
+    # WSGI: un número fijo de hilos atiende la cola de peticiones
+    # ===========================
+    def _wsgi(self, aplicacion, metodo, ruta, cuerpo):
+        ruta, _, consulta = ruta.partition('?')
+        entorno = {
+            'REQUEST_METHOD': metodo, 'PATH_INFO': ruta, 'QUERY_STRING': consulta, 'SCRIPT_NAME': '',
+            'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': HOST, 'HTTP_COOKIE': self.cookie, 'HTTP_X_CSRFTOKEN': self.csrf,
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(cuerpo)),
+            'wsgi.input': io.BytesIO(cuerpo), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        estado = []
+        respuesta = aplicacion(entorno, lambda status, headers, exc_info=None: estado.append(int(status[:3])))
+        try:
+            for _ in respuesta:
+                pass
+        finally:
+            # Emite request_finished, que cierra la conexión del hilo
+            respuesta.close()
+        return estado[0]
+
+    def _medir_wsgi(self, aplicacion, peticiones, workers):
+        def atender(peticion):
+            tipo, llegada, metodo, ruta, cuerpo = peticion
+            estado = self._wsgi(aplicacion, metodo, ruta, cuerpo)
+            return tipo, estado, time.perf_counter() - inicio - llegada
+
+        with ThreadPoolExecutor(max_workers=workers) as hilos:
+            inicio = time.perf_counter()
+            pendientes = []
+            for peticion in peticiones:
+                # La petición entra a la cola al llegar; espera si no hay un worker libre
+                time.sleep(max(0, inicio + peticion[1] - time.perf_counter()))
+                pendientes.append(hilos.submit(atender, peticion))
+            terminadas = [pendiente.result() for pendiente in pendientes]
+        return self._resumir(terminadas, time.perf_counter() - inicio)
+
+    # ===========================
+    # ASGI: cada petición se atiende al llegar
+    # ===========================
+    async def _asgi(self, aplicacion, metodo, ruta, cuerpo):
+        ruta, _, consulta = ruta.partition('?')
+        alcance = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': metodo,
+            'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'query_string': consulta.encode(),
+            'root_path': '', 'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+            'headers': [
+                (b'host', HOST.encode()), (b'cookie', self.cookie.encode()),
+                (b'x-csrftoken', self.csrf.encode()), (b'content-type', b'application/json'),
+                (b'content-length', str(len(cuerpo)).encode()),
+            ],
+        }
+        recibido = False
+        estado = None
+
+        async def recibir():
+            nonlocal recibido
+            if not recibido:
+                recibido = True
+                return {'type': 'http.request', 'body': cuerpo, 'more_body': False}
+            # El cliente nunca se desconecta; Django cancela esta espera al responder
+            await asyncio.Event().wait()
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje['type'] == 'http.response.start':
+                estado = mensaje['status']
+
+        await aplicacion(alcance, recibir, enviar)
+        return estado
+
+    async def _medir_asgi(self, aplicacion, peticiones, calentamiento):
+        for _, _, metodo, ruta, cuerpo in calentamiento:
+            await self._asgi(aplicacion, metodo, ruta, cuerpo)
+
+        async def atender(peticion):
+            tipo, llegada, metodo, ruta, cuerpo = peticion
+            await asyncio.sleep(max(0, inicio + llegada - time.perf_counter()))
+            estado = await self._asgi(aplicacion, metodo, ruta, cuerpo)
+            return tipo, estado, time.perf_counter() - inicio - llegada
+
+        inicio = time.perf_counter()
+        terminadas = await asyncio.gather(*(atender(peticion) for peticion in peticiones))
+        return self._resumir(terminadas, time.perf_counter() - inicio)
+
+    # ===========================
+    # RESULTADOS
+    # ===========================
+    def _resumir(self, terminadas, duracion):
+        """
+        Latencias medidas desde la llegada de cada petición (incluyen la
+        espera en la cola de workers)
+        """
+        pos = [segundos for tipo, _, segundos in terminadas if tipo == 'pos']
+        reportes = [segundos for tipo, _, segundos in terminadas if tipo == 'reporte']
+        return {
+            'pos': len(pos),
+            'errores': sum(1 for _, estado, _ in terminadas if not 200 <= estado < 300),
+            'duracion': duracion,
+            'por_segundo': len(pos) / duracion,
+            'p50': statistics.median(pos) * 1000,
+            'p95': _percentil(pos, 0.95) * 1000,
+            'duracion_reportes': max(reportes, default=0),
+        }
+
+    def _mostrar(self, resultado):
+        self.stdout.write(
+            f'POS: {resultado["pos"]} peticiones en {resultado["duracion"]:.2f} s '
+            f'({resultado["por_segundo"]:.1f}/s), latencia p50 {resultado["p50"]:.1f} ms, '
+            f'p95 {resultado["p95"]:.1f} ms'
+        )
+        self.stdout.write(f'Reportes terminados a los {resultado["duracion_reportes"]:.2f} s')
+        if resultado['errores']:
+            self.stdout.write(self.style.WARNING(f'{resultado["errores"]} respuestas con error'))
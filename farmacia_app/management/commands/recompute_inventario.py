@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from farmacia_app.alertas import sincronizar_alertas
+from farmacia_app.inventario import recalcular_inventario
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula desde cero el resumen de inventario y las alertas de stock '
+        'y reporta la desviación corregida'
+    )
+
+    def handle(self, *args, **options):
+        resumen, anterior = recalcular_inventario()
+
+        if anterior is None:
+            self.stdout.write('No existía el resumen; se creó desde cero.')
+        else:
+            campos = ['valor_inventario', 'total_medicamentos', 'total_agotados', 'total_bajo_stock']
+            for campo in campos:
+                antes = getattr(anterior, campo)
+                despues = getattr(resumen, campo)
+                if antes != despues:
+                    self.stdout.write(f'{campo}: {antes} -> {despues}')
+
+        abiertas, cerradas = sincronizar_alertas()
+        if abiertas or cerradas:
+            self.stdout.write(f'Alertas de stock: {abiertas} abiertas, {cerradas} cerradas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Inventario recalculado: {resumen.total_medicamentos} medicamentos, '
+            f'valor ${resumen.valor_inventario}.'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from farmacia_app.reconciliacion import RELACIONES, corregir, diferencias
+
+
+class Command(BaseCommand):
+    help = (
+        'Busca diferencias entre el stock de los medicamentos, el de sus lotes y lo '
+        'ingresado en cada lote; con --corregir ajusta los lotes en bloque y el stock '
+        'de los medicamentos confirmados con --medicamento'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--relacion', choices=RELACIONES, action='append',
+                            help='Relación a revisar (por defecto todas; se puede repetir)')
+        parser.add_argument('--corregir', action='store_true',
+                            help='Ajusta las cantidades guardadas a las esperadas')
+        parser.add_argument('--medicamento', type=int, action='append', default=[],
+                            help='Con --corregir, reemplaza el stock de este medicamento por la '
+                                 'suma de sus lotes (se puede repetir); sin él no se toca')
+        parser.add_argument('--limite', type=int, default=None,
+                            help='Máximo de diferencias a listar por relación')
+
+    def handle(self, *args, **options):
+        relaciones = options['relacion'] or RELACIONES
+        for relacion in relaciones:
+            total = 0
+            # Se escriben a medida que llegan las tandas
+            for diferencia in diferencias(relacion, options['limite']):
+                total += 1
+                self.stdout.write(self._linea(relacion, diferencia))
+            self.stdout.write(f'{relacion}: {total} diferencias')
+
+        if options['corregir']:
+            corregidas = corregir(relaciones, options['medicamento'])
+            resumen = ', '.join(f'{relacion}: {filas}' for relacion, filas in corregidas.items())
+            self.stdout.write(self.style.SUCCESS(f'Correcciones aplicadas. {resumen}.'))
+
+    def _linea(self, relacion, diferencia):
+        cambio = f"{diferencia['cantidad']} -> {diferencia['esperado']}"
+        if relacion == 'lotes':
+            return (
+                f"Lote {diferencia['id_lote']} ({diferencia['numero_lote']}, "
+                f"medicamento {diferencia['id_medicamento']}): {cambio}"
+            )
+        return f"Medicamento {diferencia['id_medicamento']} ({diferencia['nombre_generico']}): {cambio}"
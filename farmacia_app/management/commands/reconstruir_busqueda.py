@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from farmacia_app.busqueda import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye en bloque el índice de texto completo (FTS5) de medicamentos'
+
+    def handle(self, *args, **options):
+        if reconstruir_indice():
+            self.stdout.write(self.style.SUCCESS('Índice de búsqueda reconstruido.'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                'El motor de base de datos no es SQLite; no hay índice FTS5 que reconstruir.'
+            ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from farmacia_app.ventas_diarias import reconstruir_ventas_diarias
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye desde cero el acumulado diario de ventas (Venta_Diaria) '
+        'a partir de las ventas y sus líneas'
+    )
+
+    def handle(self, *args, **options):
+        filas = reconstruir_ventas_diarias()
+        self.stdout.write(self.style.SUCCESS(
+            f'Acumulado de ventas reconstruido: {filas} filas.'
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0003_lote_id_medicamento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(fields=['nombre_generico', 'id_medicamento', 'estado'], name='medicamento_nombre_id_idx'),
+        ),
+    ]
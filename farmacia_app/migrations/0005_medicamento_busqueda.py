@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Columnas indexadas y su peso en bm25 (mismo orden)
+COLUMNAS_FTS = [
+    ('nombre_generico', 10.0),
+    ('presentacion', 2.0),
+    ('cod_laboratorio', 5.0),
+    ('registro_sanitario', 5.0),
+    ('contra_indicaciones', 1.0),
+]
+
+
+def crear_indice_fts(apps, schema_editor):
+    """
+    Crea la tabla FTS5, sus triggers de sincronización y la llena (solo SQLite)
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    columnas = ', '.join(nombre for nombre, _ in COLUMNAS_FTS)
+    nuevas = ', '.join(f'new.{nombre}' for nombre, _ in COLUMNAS_FTS)
+    viejas = ', '.join(f'old.{nombre}' for nombre, _ in COLUMNAS_FTS)
+    pesos = ', '.join(str(peso) for _, peso in COLUMNAS_FTS)
+
+    sentencias = [
+        f"""
+        CREATE VIRTUAL TABLE "Medicamento_fts" USING fts5(
+            {columnas},
+            content='Medicamento',
+            content_rowid='id_medicamento',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """,
+        f"""INSERT INTO "Medicamento_fts"("Medicamento_fts", rank) VALUES ('rank', 'bm25({pesos})')""",
+        f"""
+        CREATE TRIGGER "Medicamento_fts_ai" AFTER INSERT ON "Medicamento" BEGIN
+            INSERT INTO "Medicamento_fts"(rowid, {columnas})
+            VALUES (new.id_medicamento, {nuevas});
+        END
+        """,
+        f"""
+        CREATE TRIGGER "Medicamento_fts_ad" AFTER DELETE ON "Medicamento" BEGIN
+            INSERT INTO "Medicamento_fts"("Medicamento_fts", rowid, {columnas})
+            VALUES ('delete', old.id_medicamento, {viejas});
+        END
+        """,
+        # Solo se reindexa cuando cambia una columna buscable (no en cada venta)
+        f"""
+        CREATE TRIGGER "Medicamento_fts_au" AFTER UPDATE OF {columnas} ON "Medicamento" BEGIN
+            INSERT INTO "Medicamento_fts"("Medicamento_fts", rowid, {columnas})
+            VALUES ('delete', old.id_medicamento, {viejas});
+            INSERT INTO "Medicamento_fts"(rowid, {columnas})
+            VALUES (new.id_medicamento, {nuevas});
+        END
+        """,
+        """INSERT INTO "Medicamento_fts"("Medicamento_fts") VALUES ('rebuild')""",
+    ]
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+def eliminar_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    for trigger in ('Medicamento_fts_ai', 'Medicamento_fts_ad', 'Medicamento_fts_au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+    schema_editor.execute('DROP TABLE IF EXISTS "Medicamento_fts"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0004_medicamento_nombre_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicamentoBusqueda',
+            fields=[
+                ('id_medicamento', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='busqueda', serialize=False, to='farmacia_app.medicamento')),
+                ('documento', models.TextField(db_column='Medicamento_fts')),
+                ('rango', models.FloatField(db_column='rank')),
+            ],
+            options={
+                'db_table': 'Medicamento_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(crear_indice_fts, eliminar_indice_fts),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def calcular_resumen_inicial(apps, schema_editor):
+    """
+    Crea la fila del resumen con la valoración actual del catálogo
+    """
+    Medicamento = apps.get_model('farmacia_app', 'Medicamento')
+    InventarioResumen = apps.get_model('farmacia_app', 'InventarioResumen')
+
+    valor = models.ExpressionWrapper(
+        models.F('cantidad') * models.F('precio_unitario'),
+        output_field=models.DecimalField(max_digits=20, decimal_places=2),
+    )
+    datos = Medicamento.objects.aggregate(
+        valor_inventario=models.Sum(valor),
+        total_medicamentos=models.Count('pk'),
+        total_agotados=models.Count('pk', filter=models.Q(cantidad__lte=0)),
+        total_bajo_stock=models.Count(
+            'pk', filter=models.Q(cantidad__gt=0, cantidad__lte=models.F('stock_minimo'))
+        ),
+    )
+    datos['valor_inventario'] = datos['valor_inventario'] or 0
+    InventarioResumen.objects.create(id_resumen=1, **datos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0005_medicamento_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventarioResumen',
+            fields=[
+                ('id_resumen', models.AutoField(primary_key=True, serialize=False)),
+                ('valor_inventario', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('total_medicamentos', models.IntegerField(default=0)),
+                ('total_agotados', models.IntegerField(default=0)),
+                ('total_bajo_stock', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'Inventario_Resumen',
+            },
+        ),
+        migrations.RunPython(calcular_resumen_inicial, migrations.RunPython.noop),
+    ]
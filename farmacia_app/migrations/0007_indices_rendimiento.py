@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0006_inventario_resumen'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('cedula__isnull', False)), fields=['cedula'], name='cliente_cedula_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facturacompra',
+            index=models.Index(condition=models.Q(('numero_factura__isnull', False)), fields=['numero_factura'], name='facturacompra_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['numero_lote'], name='lote_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['fecha_vencimiento', 'id_lote'], name='lote_vencimiento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(condition=models.Q(('registro_sanitario__isnull', False)), fields=['registro_sanitario'], name='medicamento_registro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proveedor',
+            index=models.Index(condition=models.Q(('ruc__isnull', False)), fields=['ruc'], name='proveedor_ruc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha', 'id_venta'], name='venta_fecha_idx'),
+        ),
+    ]
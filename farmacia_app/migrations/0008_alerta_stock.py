@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def abrir_alertas_iniciales(apps, schema_editor):
+    """
+    Abre una alerta por cada medicamento agotado o bajo su stock mínimo
+    """
+    Medicamento = apps.get_model('farmacia_app', 'Medicamento')
+    AlertaStock = apps.get_model('farmacia_app', 'AlertaStock')
+
+    filtros = {
+        'agotado': models.Q(cantidad__lte=0),
+        'bajo_stock': models.Q(cantidad__gt=0, cantidad__lte=models.F('stock_minimo')),
+    }
+    for tipo, filtro in filtros.items():
+        AlertaStock.objects.bulk_create(
+            [
+                AlertaStock(id_medicamento_id=pk, tipo=tipo, cantidad=cantidad, stock_minimo=stock_minimo)
+                for pk, cantidad, stock_minimo in Medicamento.objects.filter(filtro).values_list(
+                    'pk', 'cantidad', 'stock_minimo'
+                )
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0007_indices_rendimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id_alerta', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('agotado', 'Agotado'), ('bajo_stock', 'Bajo stock')], max_length=20)),
+                ('cantidad', models.IntegerField()),
+                ('stock_minimo', models.IntegerField()),
+                ('fecha_apertura', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True)),
+                ('id_medicamento', models.ForeignKey(db_column='id_medicamento', on_delete=django.db.models.deletion.CASCADE, related_name='alertas_stock', to='farmacia_app.medicamento')),
+            ],
+            options={
+                'db_table': 'Alerta_Stock',
+                'indexes': [models.Index(condition=models.Q(('fecha_cierre__isnull', True)), fields=['fecha_apertura'], name='alerta_abierta_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('fecha_cierre__isnull', True)), fields=('id_medicamento',), name='alerta_abierta_unica')],
+            },
+        ),
+        migrations.RunPython(abrir_alertas_iniciales, migrations.RunPython.noop),
+    ]
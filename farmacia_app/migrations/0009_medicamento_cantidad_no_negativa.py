@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Para agregar un CHECK, SQLite reconstruye la tabla Medicamento y se pierden
+# los triggers del índice FTS: se recrean con las definiciones de 0005
+busqueda = import_module('farmacia_app.migrations.0005_medicamento_busqueda')
+
+
+def corregir_stock_negativo(apps, schema_editor):
+    """
+    Lleva a cero el stock negativo que dejaron ventas concurrentes antes de
+    agregar la restricción; siguen agotados, solo cambia la valoración
+    """
+    Medicamento = apps.get_model('farmacia_app', 'Medicamento')
+    InventarioResumen = apps.get_model('farmacia_app', 'InventarioResumen')
+
+    if not Medicamento.objects.filter(cantidad__lt=0).update(cantidad=0):
+        return
+    valor = Medicamento.objects.aggregate(
+        valor=models.Sum(models.ExpressionWrapper(
+            models.F('cantidad') * models.F('precio_unitario'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        ))
+    )['valor']
+    InventarioResumen.objects.filter(pk=1).update(valor_inventario=valor or 0)
+
+
+def recrear_indice_fts(apps, schema_editor):
+    busqueda.eliminar_indice_fts(apps, schema_editor)
+    busqueda.crear_indice_fts(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0008_alerta_stock'),
+    ]
+
+    operations = [
+        # Al revertir, este paso corre después de quitar el CHECK (otra reconstrucción)
+        migrations.RunPython(corregir_stock_negativo, recrear_indice_fts),
+        migrations.AddConstraint(
+            model_name='medicamento',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gte', 0)), name='medicamento_cantidad_no_negativa', violation_error_message='La cantidad no puede ser negativa'),
+        ),
+        migrations.RunPython(recrear_indice_fts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0009_medicamento_cantidad_no_negativa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaSincronizada',
+            fields=[
+                ('uuid', models.UUIDField(primary_key=True, serialize=False)),
+                ('fecha_recepcion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('id_venta', models.ForeignKey(blank=True, db_column='id_venta', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sincronizaciones', to='farmacia_app.venta')),
+            ],
+            options={
+                'db_table': 'Venta_Sincronizada',
+            },
+        ),
+    ]
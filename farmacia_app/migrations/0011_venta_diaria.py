@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def acumular_ventas_existentes(apps, schema_editor):
+    """
+    Llena el acumulado con las ventas ya registradas: las simples aportan su
+    total y las de carrito lo reparten entre sus líneas en proporción al total
+    de cada una (lo mismo que ventas_diarias.reconstruir_ventas_diarias)
+    """
+    Venta = apps.get_model('farmacia_app', 'Venta')
+    Factura = apps.get_model('farmacia_app', 'Factura')
+    VentaDiaria = apps.get_model('farmacia_app', 'VentaDiaria')
+
+    grupos = {}
+
+    def acumular(fecha, id_medicamento, id_empleado, unidades, monto, ventas):
+        acumulado = grupos.setdefault((fecha, id_medicamento or 0, id_empleado or 0), [0, Decimal('0'), 0])
+        acumulado[0] += unidades or 0
+        acumulado[1] += monto or Decimal('0')
+        acumulado[2] += ventas
+
+    simples = Venta.objects.filter(fecha__isnull=False, factura__isnull=True).values_list(
+        'fecha', 'id_medicamento', 'id_empleado'
+    ).annotate(
+        unidades=models.Sum('cantidad'), monto=models.Sum('total'), ventas=models.Count('pk'),
+    ).order_by()
+    for fila in simples.iterator():
+        acumular(*fila)
+
+    def repartir(venta, lineas):
+        fecha, id_empleado, total = venta
+        total = total or Decimal('0')
+        base = sum((monto or Decimal('0') for _, _, monto in lineas), Decimal('0'))
+        restante = total
+        por_medicamento = {}
+        for posicion, (id_medicamento, cantidad, monto) in enumerate(lineas):
+            if posicion == len(lineas) - 1:
+                parte = restante
+            elif base:
+                parte = (total * (monto or Decimal('0')) / base).quantize(Decimal('0.01'))
+            else:
+                parte = Decimal('0')
+            restante -= parte
+            valores = por_medicamento.setdefault(id_medicamento, [0, Decimal('0')])
+            valores[0] += cantidad or 0
+            valores[1] += parte
+        # Dos líneas del mismo medicamento cuentan como una sola venta
+        for id_medicamento, (unidades, monto) in por_medicamento.items():
+            acumular(fecha, id_medicamento, id_empleado, unidades, monto, 1)
+
+    lineas = Factura.objects.filter(id_venta__fecha__isnull=False).order_by('id_venta', 'pk').values_list(
+        'id_venta', 'id_venta__fecha', 'id_venta__id_empleado', 'id_venta__total',
+        'id_medicamento', 'cantidad', Coalesce('total', 'subtotal'),
+    )
+    actual, venta, lineas_venta = None, None, []
+    for id_venta, fecha, id_empleado, total, id_medicamento, cantidad, monto in lineas.iterator():
+        if id_venta != actual:
+            if lineas_venta:
+                repartir(venta, lineas_venta)
+            actual, venta, lineas_venta = id_venta, (fecha, id_empleado, total), []
+        lineas_venta.append((id_medicamento or 0, cantidad, monto))
+    if lineas_venta:
+        repartir(venta, lineas_venta)
+
+    VentaDiaria.objects.bulk_create(
+        (
+            VentaDiaria(
+                fecha=fecha, id_medicamento=id_medicamento, id_empleado=id_empleado,
+                unidades=unidades, monto=monto, numero_ventas=ventas,
+            )
+            for (fecha, id_medicamento, id_empleado), (unidades, monto, ventas) in grupos.items()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0010_venta_sincronizada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id_venta_diaria', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('id_medicamento', models.IntegerField(default=0)),
+                ('id_empleado', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('numero_ventas', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'Venta_Diaria',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'id_medicamento', 'id_empleado'), name='venta_diaria_clave_unica')],
+            },
+        ),
+        migrations.RunPython(acumular_ventas_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0011_venta_diaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsignacionLote',
+            fields=[
+                ('id_asignacion', models.AutoField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'Asignacion_Lote',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(condition=models.Q(('cantidad__gt', 0)), fields=['id_medicamento', 'fecha_vencimiento', 'id_lote'], name='lote_fefo_idx'),
+        ),
+        migrations.AddField(
+            model_name='asignacionlote',
+            name='id_factura',
+            field=models.ForeignKey(blank=True, db_column='id_factura', null=True, on_delete=django.db.models.deletion.CASCADE, to='farmacia_app.factura'),
+        ),
+        migrations.AddField(
+            model_name='asignacionlote',
+            name='id_lote',
+            field=models.ForeignKey(blank=True, db_column='id_lote', null=True, on_delete=django.db.models.deletion.SET_NULL, to='farmacia_app.lote'),
+        ),
+        migrations.AddField(
+            model_name='asignacionlote',
+            name='id_medicamento',
+            field=models.ForeignKey(db_column='id_medicamento', on_delete=django.db.models.deletion.CASCADE, to='farmacia_app.medicamento'),
+        ),
+        migrations.AddField(
+            model_name='asignacionlote',
+            name='id_venta',
+            field=models.ForeignKey(db_column='id_venta', on_delete=django.db.models.deletion.CASCADE, related_name='asignaciones_lote', to='farmacia_app.venta'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+def copiar_precio_actual(apps, schema_editor):
+    """
+    Las ventas anteriores no guardaban el precio: se toma el actual del medicamento
+    """
+    Venta = apps.get_model('farmacia_app', 'Venta')
+    Medicamento = apps.get_model('farmacia_app', 'Medicamento')
+    Venta.objects.filter(id_medicamento__isnull=False, precio_unitario__isnull=True).update(
+        precio_unitario=models.Subquery(
+            Medicamento.objects.filter(pk=models.OuterRef('id_medicamento')).values('precio_unitario')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0012_asignacion_lote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='precio_unitario',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(copiar_precio_actual, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0013_venta_precio_unitario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['id_medicamento', 'fecha_vencimiento', 'id_lote'], name='lote_medicamento_venc_idx'),
+        ),
+    ]
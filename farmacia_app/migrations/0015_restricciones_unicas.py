@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Concat
+
+# Los repetidos se vacían (NULL) salvo en el registro más antiguo
+VACIAR = [
+    ('Proveedor', 'ruc'),
+    ('Proveedor', 'correo'),
+    ('Medicamento', 'registro_sanitario'),
+    ('Empleados', 'cedula'),
+    ('Empleados', 'correo'),
+]
+# Números de documento: los repetidos conservan el número, con su id como sufijo
+RENUMERAR = [
+    ('FacturaCompra', 'numero_factura'),
+    ('Lote', 'numero_lote'),
+]
+
+
+def _sobrantes(Modelo, campo):
+    # Todos los registros con un valor repetido menos el primero de cada valor
+    repetidos = Modelo.objects.filter(**{f'{campo}__isnull': False}).values(campo).annotate(
+        registros=models.Count('pk'), primero=models.Min('pk'),
+    ).filter(registros__gt=1)
+    return Modelo.objects.filter(**{f'{campo}__in': repetidos.values(campo)}).exclude(
+        pk__in=repetidos.values('primero')
+    )
+
+
+def eliminar_repetidos(apps, schema_editor):
+    """
+    Deja los datos en condiciones de crear las restricciones únicas: un UPDATE
+    por campo y la fusión de las asignaciones de lote repetidas
+    """
+    for nombre, campo in VACIAR + RENUMERAR:
+        Modelo = apps.get_model('farmacia_app', nombre)
+        if Modelo._meta.get_field(campo).null:
+            # Los formularios guardan los campos opcionales vacíos como NULL
+            Modelo.objects.filter(**{campo: ''}).update(**{campo: None})
+        if (nombre, campo) in VACIAR:
+            _sobrantes(Modelo, campo).update(**{campo: None})
+        else:
+            _sobrantes(Modelo, campo).update(**{
+                campo: Concat(campo, models.Value('-'), Cast('pk', models.CharField()))
+            })
+
+    # Un medicamento asignado varias veces al mismo lote queda en una sola
+    # fila con la suma (lo ingresado al lote no cambia)
+    LoteMedicamento = apps.get_model('farmacia_app', 'LoteMedicamento')
+    repetidos = LoteMedicamento.objects.values('id_lote', 'id_medicamento').annotate(
+        registros=models.Count('pk'), primero=models.Min('pk'), total=models.Sum('cantidad'),
+    ).filter(registros__gt=1)
+    for grupo in repetidos:
+        LoteMedicamento.objects.filter(pk=grupo['primero']).update(cantidad=grupo['total'])
+        LoteMedicamento.objects.filter(
+            id_lote=grupo['id_lote'], id_medicamento=grupo['id_medicamento']
+        ).exclude(pk=grupo['primero']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0014_lote_medicamento_vencimiento'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_repetidos, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='facturacompra',
+            name='facturacompra_numero_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lote_numero_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicamento',
+            name='medicamento_registro_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='proveedor',
+            name='proveedor_ruc_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='empleados',
+            constraint=models.UniqueConstraint(condition=models.Q(('cedula__isnull', False)), fields=('cedula',), name='empleado_cedula_unico', violation_error_message='Ya existe un empleado con esta cédula.'),
+        ),
+        migrations.AddConstraint(
+            model_name='empleados',
+            constraint=models.UniqueConstraint(condition=models.Q(('correo__isnull', False)), fields=('correo',), name='empleado_correo_unico', violation_error_message='Ya existe un empleado con este correo electrónico.'),
+        ),
+        migrations.AddConstraint(
+            model_name='facturacompra',
+            constraint=models.UniqueConstraint(condition=models.Q(('numero_factura__isnull', False)), fields=('numero_factura',), name='facturacompra_numero_unico', violation_error_message='Ya existe una factura con este número.'),
+        ),
+        migrations.AddConstraint(
+            model_name='lote',
+            constraint=models.UniqueConstraint(fields=('numero_lote',), name='lote_numero_unico', violation_error_message='Ya existe un lote con este número de lote.'),
+        ),
+        migrations.AddConstraint(
+            model_name='lotemedicamento',
+            constraint=models.UniqueConstraint(fields=('id_lote', 'id_medicamento'), name='lote_medicamento_unico', violation_error_message='Este medicamento ya está asignado a este lote.'),
+        ),
+        migrations.AddConstraint(
+            model_name='medicamento',
+            constraint=models.UniqueConstraint(condition=models.Q(('registro_sanitario__isnull', False)), fields=('registro_sanitario',), name='medicamento_registro_unico', violation_error_message='Ya existe un medicamento con este registro sanitario.'),
+        ),
+        migrations.AddConstraint(
+            model_name='proveedor',
+            constraint=models.UniqueConstraint(condition=models.Q(('ruc__isnull', False)), fields=('ruc',), name='proveedor_ruc_unico', violation_error_message='Ya existe un proveedor con este RUC.'),
+        ),
+        migrations.AddConstraint(
+            model_name='proveedor',
+            constraint=models.UniqueConstraint(condition=models.Q(('correo__isnull', False)), fields=('correo',), name='proveedor_correo_unico', violation_error_message='Ya existe un proveedor con este correo electrónico.'),
+        ),
+    ]
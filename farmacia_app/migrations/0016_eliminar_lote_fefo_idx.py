@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farmacia_app', '0015_restricciones_unicas'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lote',
+            name='lote_fefo_idx',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+from django.db import migrations
+
+
+def cambiar_modo_diario(modo):
+    def cambiar(apps, schema_editor):
+        # El modo queda guardado en el archivo: basta con cambiarlo una vez
+        if schema_editor.connection.vendor == 'sqlite':
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={modo}')
+    return cambiar
+
+
+class Migration(migrations.Migration):
+    # SQLite no cambia el modo del diario dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('farmacia_app', '0016_eliminar_lote_fefo_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(cambiar_modo_diario('WAL'), cambiar_modo_diario('DELETE')),
+    ]
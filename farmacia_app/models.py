@@ -14,6 +14,21 @@ class Proveedor(models.Model):
 
     class Meta:
         db_table = 'Proveedor'
+        constraints = [
+            # Su índice también sirve para buscar por RUC (reemplaza a proveedor_ruc_idx)
+            models.UniqueConstraint(
+                fields=['ruc'],
+                name='proveedor_ruc_unico',
+                condition=models.Q(ruc__isnull=False),
+                violation_error_message='Ya existe un proveedor con este RUC.',
+            ),
+            models.UniqueConstraint(
+                fields=['correo'],
+                name='proveedor_correo_unico',
+                condition=models.Q(correo__isnull=False),
+                violation_error_message='Ya existe un proveedor con este correo electrónico.',
+            ),
+        ]
 
     def __str__(self):
         return self.nombre_contacto
@@ -30,6 +45,14 @@ class FacturaCompra(models.Model):
 
     class Meta:
         db_table = 'Factura_Compra'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['numero_factura'],
+                name='facturacompra_numero_unico',
+                condition=models.Q(numero_factura__isnull=False),
+                violation_error_message='Ya existe una factura con este número.',
+            ),
+        ]
 
     def __str__(self):
         return f"Factura {self.numero_factura}"
@@ -71,11 +94,103 @@ class Medicamento(models.Model):
 
     class Meta:
         db_table = 'Medicamento'
+        indexes = [
+            # Recorre el listado en orden (nombre, id) y cubre los conteos por estado
+            models.Index(
+                fields=['nombre_generico', 'id_medicamento', 'estado'],
+                name='medicamento_nombre_id_idx',
+            ),
+        ]
+        constraints = [
+            # Índice parcial: SQLite lo crea sin reconstruir la tabla (ni los triggers FTS)
+            models.UniqueConstraint(
+                fields=['registro_sanitario'],
+                name='medicamento_registro_unico',
+                condition=models.Q(registro_sanitario__isnull=False),
+                violation_error_message='Ya existe un medicamento con este registro sanitario.',
+            ),
+            # Última defensa contra ventas concurrentes que sobrevendan
+            models.CheckConstraint(
+                condition=models.Q(cantidad__gte=0),
+                name='medicamento_cantidad_no_negativa',
+                violation_error_message='La cantidad no puede ser negativa',
+            ),
+        ]
 
     def __str__(self):
         return self.nombre_generico
 
 
+class InventarioResumen(models.Model):
+    """
+    Fila única con la valoración del inventario y los conteos de stock.
+
+    Se mantiene por diferencias cada vez que cambia un Medicamento (ver
+    inventario.registrar_cambio_stock) para que el reporte no recorra el
+    catálogo; el comando recompute_inventario corrige cualquier desviación.
+    """
+    id_resumen = models.AutoField(primary_key=True)
+    valor_inventario = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    total_medicamentos = models.IntegerField(default=0)
+    total_agotados = models.IntegerField(default=0)
+    total_bajo_stock = models.IntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'Inventario_Resumen'
+
+    def __str__(self):
+        return f"Inventario al {self.fecha_actualizacion:%Y-%m-%d %H:%M}"
+
+
+class AlertaStock(models.Model):
+    """
+    Alerta de reposición de un medicamento agotado o bajo su stock mínimo.
+
+    La abre o cierra alertas.registrar_cambio_alerta solo cuando el
+    medicamento cambia de categoría; una alerta sigue abierta mientras
+    fecha_cierre sea nula y hay a lo sumo una abierta por medicamento.
+    """
+
+    TIPOS = [
+        ('agotado', 'Agotado'),
+        ('bajo_stock', 'Bajo stock'),
+    ]
+
+    id_alerta = models.AutoField(primary_key=True)
+    id_medicamento = models.ForeignKey(
+        Medicamento,
+        on_delete=models.CASCADE,
+        db_column='id_medicamento',
+        related_name='alertas_stock',
+    )
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    cantidad = models.IntegerField()
+    stock_minimo = models.IntegerField()
+    fecha_apertura = models.DateTimeField(default=timezone.now)
+    fecha_cierre = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'Alerta_Stock'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_medicamento'],
+                condition=models.Q(fecha_cierre__isnull=True),
+                name='alerta_abierta_unica',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['fecha_apertura'],
+                name='alerta_abierta_idx',
+                condition=models.Q(fecha_cierre__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Alerta {self.get_tipo_display()} - {self.id_medicamento_id}"
+
+
 class Lote(models.Model):
     id_lote = models.AutoField(primary_key=True)
     cantidad = models.IntegerField()
@@ -90,6 +205,22 @@ class Lote(models.Model):
 
     class Meta:
         db_table = 'Lote'
+        indexes = [
+            models.Index(fields=['fecha_vencimiento', 'id_lote'], name='lote_vencimiento_idx'),
+            # Lotes de un medicamento por vencimiento: el listado paginado por
+            # cursor y la asignación FEFO (ver lotes.py)
+            models.Index(
+                fields=['id_medicamento', 'fecha_vencimiento', 'id_lote'],
+                name='lote_medicamento_venc_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['numero_lote'],
+                name='lote_numero_unico',
+                violation_error_message='Ya existe un lote con este número de lote.',
+            ),
+        ]
 
     def __str__(self):
         return f"Lote {self.numero_lote}"
@@ -104,6 +235,13 @@ class LoteMedicamento(models.Model):
 
     class Meta:
         db_table = 'Lote_Medicamento'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_lote', 'id_medicamento'],
+                name='lote_medicamento_unico',
+                violation_error_message='Este medicamento ya está asignado a este lote.',
+            ),
+        ]
 
     def __str__(self):
         return f"LoteMed {self.id_lote_medicamento}"
@@ -120,6 +258,9 @@ class Cliente(models.Model):
 
     class Meta:
         db_table = 'Cliente'
+        indexes = [
+            models.Index(fields=['cedula'], name='cliente_cedula_idx', condition=models.Q(cedula__isnull=False)),
+        ]
 
     def __str__(self):
         return self.nombre or f"Cliente {self.id_cliente}"
@@ -138,6 +279,20 @@ class Empleados(models.Model):
 
     class Meta:
         db_table = 'Empleados'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cedula'],
+                name='empleado_cedula_unico',
+                condition=models.Q(cedula__isnull=False),
+                violation_error_message='Ya existe un empleado con esta cédula.',
+            ),
+            models.UniqueConstraint(
+                fields=['correo'],
+                name='empleado_correo_unico',
+                condition=models.Q(correo__isnull=False),
+                violation_error_message='Ya existe un empleado con este correo electrónico.',
+            ),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -156,9 +311,14 @@ class Venta(models.Model):
     # Agregar estos dos campos
     id_medicamento = models.ForeignKey(Medicamento, on_delete=models.SET_NULL, blank=True, null=True)
     cantidad = models.IntegerField(default=1)
+    # Precio unitario al momento de la venta (ver precios.py); no cambia con el del medicamento
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
     class Meta:
         db_table = 'Venta'
+        indexes = [
+            models.Index(fields=['fecha', 'id_venta'], name='venta_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Venta {self.id_venta}"
@@ -195,6 +355,79 @@ class MetodoPago(models.Model):
         return f"{self.tipo_pago} - {self.monto}"
 
 
+class VentaDiaria(models.Model):
+    """
+    Acumulado de ventas por (fecha, medicamento, empleado) para los reportes.
+
+    Se mantiene por diferencias al crear, editar o eliminar ventas (ver
+    ventas_diarias.py) y se reconstruye con el comando reconstruir_ventas_diarias.
+    Los ids se guardan sin llave foránea para conservar el histórico aunque se
+    borre el medicamento o el empleado; 0 significa "sin medicamento/empleado".
+    """
+    id_venta_diaria = models.AutoField(primary_key=True)
+    fecha = models.DateField()
+    id_medicamento = models.IntegerField(default=0)
+    id_empleado = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    numero_ventas = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'Venta_Diaria'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'id_medicamento', 'id_empleado'],
+                name='venta_diaria_clave_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.id_medicamento} - {self.id_empleado}"
+
+
+class AsignacionLote(models.Model):
+    """
+    Unidades de una línea de venta tomadas de un lote (FEFO, ver lotes.py).
+    id_factura es la línea en las ventas por carrito y nulo en las simples;
+    id_lote nulo registra las unidades vendidas que ningún lote cubría.
+    """
+    id_asignacion = models.AutoField(primary_key=True)
+    id_venta = models.ForeignKey(Venta, on_delete=models.CASCADE, db_column='id_venta', related_name='asignaciones_lote')
+    id_factura = models.ForeignKey(Factura, on_delete=models.CASCADE, db_column='id_factura', blank=True, null=True)
+    id_lote = models.ForeignKey(Lote, on_delete=models.SET_NULL, db_column='id_lote', blank=True, null=True)
+    id_medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, db_column='id_medicamento')
+    cantidad = models.IntegerField()
+
+    class Meta:
+        db_table = 'Asignacion_Lote'
+
+    def __str__(self):
+        return f"Asignación {self.id_asignacion}"
+
+
+class VentaSincronizada(models.Model):
+    """
+    UUID de cada venta recibida de un terminal fuera de línea; reenviar un
+    lote no vuelve a aplicar las ventas cuyo UUID ya está aquí
+    """
+    uuid = models.UUIDField(primary_key=True)
+    id_venta = models.ForeignKey(
+        Venta,
+        on_delete=models.SET_NULL,
+        db_column='id_venta',
+        blank=True,
+        null=True,
+        related_name='sincronizaciones',
+    )
+    fecha_recepcion = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'Venta_Sincronizada'
+
+    def __str__(self):
+        return f"{self.uuid} -> Venta {self.id_venta_id}"
+
+
 class CompraMedicamento(models.Model):
     id_compra_medicamento = models.AutoField(primary_key=True)
     id_factura_compra = models.ForeignKey(FacturaCompra, on_delete=models.CASCADE, db_column='id_factura_compra')
@@ -279,4 +512,30 @@ class PresentacionMedicamento(models.Model):
         db_table = 'Presentacion_Medicamento'
 
     def __str__(self):
-        return f"Presentación {self.tipo_presentacion}"
\ No newline at end of file
+        return f"Presentación {self.tipo_presentacion}"
+
+class MedicamentoBusqueda(models.Model):
+    """
+    Tabla virtual FTS5 sobre el catálogo de medicamentos.
+
+    La crea y la mantiene sincronizada (por triggers) la migración
+    0005_medicamento_busqueda; Django solo la usa para el JOIN de búsqueda.
+    """
+    id_medicamento = models.OneToOneField(
+        Medicamento,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='busqueda'
+    )
+    # Columna oculta de FTS5 con el nombre de la tabla, usada en "MATCH"
+    documento = models.TextField(db_column='Medicamento_fts')
+    # Puntaje bm25 ponderado (menor es más relevante)
+    rango = models.FloatField(db_column='rank')
+
+    class Meta:
+        managed = False
+        db_table = 'Medicamento_fts'
+
+    def __str__(self):
+        return f"Búsqueda {self.id_medicamento_id}"
@@ -0,0 +1,170 @@
+"""
+Listas de opciones para los desplegables de los formularios.
+
+Cada lista (clientes, empleados, medicamentos, ...) se lee una vez con solo
+las columnas que muestran las plantillas y se guarda en la caché bajo un
+número de versión propio del modelo. Guardar o eliminar una fila sube la
+versión (señales en signals.py; las operaciones masivas llaman a
+invalidar_opciones), así que cada tabla se vuelve a leer una sola vez por
+cambio y no en cada vista de página.
+
+Los formularios validan sus llaves foráneas contra la misma lista con
+OpcionChoiceField, en lugar de consultar la tabla otra vez al enviar. El
+valor limpio es una instancia con las columnas de la lista ya cargadas (lo
+que muestran las plantillas, p. ej. el nombre del medicamento al volver a
+mostrar un formulario con errores); las demás columnas quedan diferidas y se
+leen de la tabla solo si algo las usa.
+"""
+import time
+
+from django import forms
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DEFERRED, F
+
+from .models import Cliente, Empleados, FacturaCompra, Medicamento, Proveedor, Venta
+
+# Las listas expiran solas aunque no cambie la versión
+TTL_SEGUNDOS = 24 * 60 * 60
+
+# nombre -> (modelo, columnas, orden); una columna (alias, ruta) sigue una relación
+LISTAS = {
+    'clientes': (Cliente, ('id_cliente', 'nombre', 'cedula'), ('nombre', 'id_cliente')),
+    'empleados': (Empleados, ('id_empleado', 'nombre', 'rol'), ('nombre', 'id_empleado')),
+    'medicamentos': (
+        Medicamento, ('id_medicamento', 'nombre_generico', 'presentacion'), ('nombre_generico', 'id_medicamento')
+    ),
+    'proveedores': (
+        Proveedor, ('id_proveedor', 'nombre_contacto', 'tipo_proveedor'), ('nombre_contacto', 'id_proveedor')
+    ),
+    'ventas': (Venta, ('id_venta', 'fecha'), ('-id_venta',)),
+    'facturas': (
+        FacturaCompra,
+        ('id_factura_compra', 'numero_factura', ('proveedor', 'id_proveedor__nombre_contacto')),
+        ('-id_factura_compra',),
+    ),
+}
+
+# modelo -> nombres de las listas que dependen de él
+_LISTAS_POR_MODELO = {}
+for _nombre, (_modelo, _, _) in LISTAS.items():
+    _LISTAS_POR_MODELO.setdefault(_modelo, []).append(_nombre)
+# La lista de facturas muestra el nombre del proveedor
+_LISTAS_POR_MODELO[Proveedor].append('facturas')
+
+
+def _clave_version(nombre):
+    return f'opciones:{nombre}:version'
+
+
+def _version(nombre):
+    version = cache.get(_clave_version(nombre))
+    if version is None:
+        # Tras vaciarse la caché se parte de un valor nuevo para no reutilizar
+        # una lista vieja que siga guardada con una versión anterior
+        cache.add(_clave_version(nombre), time.time_ns(), None)
+        version = cache.get(_clave_version(nombre))
+    return version
+
+
+def _subir_version(modelo):
+    for nombre in _LISTAS_POR_MODELO.get(modelo, ()):
+        try:
+            cache.incr(_clave_version(nombre))
+        except ValueError:
+            cache.add(_clave_version(nombre), time.time_ns(), None)
+
+
+def invalidar_opciones(modelo):
+    """
+    Sube la versión de las listas que dependen del modelo
+    """
+    _subir_version(modelo)
+    # Otra vez al confirmar, por si otra petición leyó la tabla antes del
+    # COMMIT y guardó la lista vieja con la versión nueva
+    transaction.on_commit(lambda: _subir_version(modelo))
+
+
+def opciones(nombre):
+    """
+    Lista de dicts con las columnas de LISTAS[nombre], desde la caché si la
+    versión no cambió
+    """
+    modelo, columnas, orden = LISTAS[nombre]
+    clave = f'opciones:{nombre}:{_version(nombre)}'
+    lista = cache.get(clave)
+    if lista is None:
+        campos = [columna for columna in columnas if isinstance(columna, str)]
+        relaciones = {alias: F(ruta) for alias, ruta in (c for c in columnas if not isinstance(c, str))}
+        lista = list(modelo.objects.order_by(*orden).values(*campos, **relaciones))
+        cache.set(clave, lista, TTL_SEGUNDOS)
+    return lista
+
+
+def opcion_por_id(nombre, pk):
+    """
+    Dict de la lista `nombre` con esa llave primaria, o None
+    """
+    atributo = LISTAS[nombre][0]._meta.pk.attname
+    return next((opcion for opcion in opciones(nombre) if opcion[atributo] == pk), None)
+
+
+def instancia_opcion(modelo, opcion, using=None):
+    """
+    Instancia del modelo con las columnas de la opción; las demás, diferidas
+    """
+    campos = [campo.attname for campo in modelo._meta.concrete_fields]
+    return modelo.from_db(using, campos, [opcion.get(campo, DEFERRED) for campo in campos])
+
+
+class OpcionChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField que valida contra la lista cacheada `opciones` en lugar
+    de consultar la tabla; devuelve una instancia con las columnas de la lista
+    """
+
+    def __init__(self, queryset, *, opciones=None, **kwargs):
+        self.opciones = opciones
+        super().__init__(queryset, **kwargs)
+
+    def to_python(self, value):
+        if self.opciones is None:
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        try:
+            opcion = opcion_por_id(self.opciones, int(value))
+        except (TypeError, ValueError):
+            opcion = None
+        if opcion is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return instancia_opcion(self.queryset.model, opcion, self.queryset.db)
+
+
+class OpcionesCacheadasMixin:
+    """
+    Para ModelForms: OPCIONES = {campo: nombre de la lista} cambia esos campos
+    por OpcionChoiceField
+    """
+    OPCIONES = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for campo, nombre in self.OPCIONES.items():
+            original = self.fields[campo]
+            self.fields[campo] = OpcionChoiceField(
+                original.queryset,
+                opciones=nombre,
+                required=original.required,
+                widget=original.widget,
+                label=original.label,
+                empty_label=original.empty_label,
+            )
+
+    def _get_validation_exclusions(self):
+        # Ya validados contra la lista: se evita el exists() de ForeignKey.validate
+        return super()._get_validation_exclusions() | set(self.OPCIONES)
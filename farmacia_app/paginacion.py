@@ -0,0 +1,173 @@
+"""
+Paginación por cursor (keyset) para los listados grandes.
+
+En lugar de OFFSET, cada página se pide a partir de los valores de
+ordenamiento de la última fila vista, de modo que la consulta recorre el
+índice compuesto desde ese punto y su costo no crece con el número de página.
+
+Si la primera columna admite NULL (nulos_al_final=True), la página se lee en
+dos tramos: primero las filas con valor y después las NULL, cada una con su
+propio rango del índice. Un solo filtro con "OR columna IS NULL" obligaría a
+recorrer el índice desde el principio.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+def codificar_cursor(valores):
+    """
+    Convierte la lista de valores de ordenamiento en un token apto para URL
+    """
+    texto = json.dumps(list(valores), cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor, cantidad_campos):
+    """
+    Devuelve la lista de valores del cursor o None si el token no es válido
+    """
+    if not cursor:
+        return None
+    try:
+        texto = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        valores = json.loads(texto)
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != cantidad_campos:
+        return None
+    return valores
+
+
+def _filtro_keyset(campos, valores, operador):
+    """
+    Construye (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... para el operador dado
+    """
+    filtro = Q()
+    for i, campo in enumerate(campos):
+        condicion = Q(**{f'{campo}__{operador}': valores[i]})
+        for campo_previo, valor_previo in zip(campos[:i], valores[:i]):
+            condicion &= Q(**{campo_previo: valor_previo})
+        filtro |= condicion
+    # c1 >= v1 es redundante, pero le da a SQLite el inicio del rango en el
+    # índice; con solo el OR lo recorre desde el principio
+    return Q(**{f'{campos[0]}__{operador}e': valores[0]}) & filtro
+
+
+def _attname(modelo, campo):
+    """
+    Atributo de la fila que guarda el valor del campo (o de la anotación)
+    """
+    try:
+        return modelo._meta.get_field(campo).attname
+    except FieldDoesNotExist:
+        return campo
+
+
+class PaginaCursor:
+    """
+    Resultado de una página: las filas y los cursores para navegar
+    """
+
+    def __init__(self, objetos, cursor_siguiente=None, cursor_anterior=None):
+        self.objetos = objetos
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+
+    @property
+    def tiene_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.cursor_anterior is not None
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+
+def _leer(queryset, campos, valores, operador, limite):
+    """
+    Hasta `limite` filas después (gt) o antes (lt) de `valores`, o desde el
+    extremo si no hay valores, en el orden del recorrido
+    """
+    if valores is not None:
+        queryset = queryset.filter(_filtro_keyset(campos, valores, operador))
+    orden = campos if operador == 'gt' else [f'-{campo}' for campo in campos]
+    return list(queryset.order_by(*orden)[:limite])
+
+
+def _recorrer(queryset, campos, valores, operador, limite, nulos_al_final):
+    if not nulos_al_final:
+        return _leer(queryset, campos, valores, operador, limite)
+
+    # Tramos (con NULL en el primer campo, desde qué campo ordena): las filas
+    # NULL se ordenan por el resto de los campos
+    tramos = [(False, 0), (True, 1)] if operador == 'gt' else [(True, 1), (False, 0)]
+    # Se omite el tramo que queda del otro lado del cursor
+    if valores is not None and (operador == 'gt') == (valores[0] is None):
+        tramos = tramos[1:]
+
+    filas = []
+    for i, (nulo, desde) in enumerate(tramos):
+        valores_tramo = valores[desde:] if i == 0 and valores is not None else None
+        consulta = queryset
+        # Con cursor, la comparación del primer campo ya descarta los NULL; un
+        # filtro IS NOT NULL de más haría que SQLite recorra el índice desde el inicio
+        if nulo or valores_tramo is None:
+            consulta = consulta.filter(**{f'{campos[0]}__isnull': nulo})
+        filas += _leer(consulta, campos[desde:], valores_tramo, operador, limite - len(filas))
+        if len(filas) >= limite:
+            break
+    return filas
+
+
+def paginar_por_cursor(queryset, campos, despues=None, antes=None, por_pagina=50, nulos_al_final=False):
+    """
+    Pagina el queryset en orden ascendente por `campos`.
+
+    `campos` debe terminar en una columna única (normalmente la llave
+    primaria) para que el orden sea total; puede incluir anotaciones.
+    `despues` y `antes` son tokens generados por codificar_cursor; si vienen
+    ambos se usa `despues`. Con nulos_al_final=True el primer campo admite
+    NULL y esas filas van después de todas las demás.
+    """
+    campos = list(campos)
+    attnames = [_attname(queryset.model, campo) for campo in campos]
+
+    def _valido(valores):
+        # Un NULL solo puede venir en el primer campo y si se admite
+        if valores is None or None in valores[1:] or (valores[0] is None and not nulos_al_final):
+            return None
+        return valores
+
+    valores_despues = _valido(decodificar_cursor(despues, len(campos)))
+    valores_antes = None if valores_despues else _valido(decodificar_cursor(antes, len(campos)))
+
+    if valores_antes is not None:
+        # Hacia atrás: se recorre el índice en orden inverso y se voltea la página
+        filas = _recorrer(queryset, campos, valores_antes, 'lt', por_pagina + 1, nulos_al_final)
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+        filas.reverse()
+        hay_anterior = hay_mas
+        hay_siguiente = True
+    else:
+        filas = _recorrer(queryset, campos, valores_despues, 'gt', por_pagina + 1, nulos_al_final)
+        hay_siguiente = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+        hay_anterior = valores_despues is not None
+
+    def _cursor(fila):
+        return codificar_cursor(getattr(fila, attname) for attname in attnames)
+
+    cursor_siguiente = _cursor(filas[-1]) if filas and hay_siguiente else None
+    cursor_anterior = _cursor(filas[0]) if filas and hay_anterior else None
+
+    return PaginaCursor(filas, cursor_siguiente, cursor_anterior)
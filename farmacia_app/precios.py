@@ -0,0 +1,123 @@
+"""
+Precios de las ventas calculados en el servidor.
+
+Un carrito (o una venta simple) se cotiza en una pasada: los precios de todos
+sus medicamentos se leen con un solo in_bulk y sobre ellos se aplican las
+reglas de settings.FARMACIA_PRECIOS:
+
+    TASA_IMPUESTO            proporción sobre el subtotal menos descuentos
+    DESCUENTO_MAXIMO         descuento manual máximo, proporción del subtotal
+    DESCUENTOS_POR_CANTIDAD  [(unidades mínimas de una línea, proporción)]
+
+El precio unitario de cada línea se guarda con la venta (Factura o
+Venta.precio_unitario) y no se vuelve a calcular: los reportes y las
+ediciones usan ese precio aunque el del medicamento cambie después.
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from .models import Medicamento
+
+CENTAVOS = Decimal('0.01')
+
+REGLAS_POR_DEFECTO = {
+    'TASA_IMPUESTO': '0',
+    'DESCUENTO_MAXIMO': '1',
+    'DESCUENTOS_POR_CANTIDAD': [],
+}
+
+LineaCotizada = namedtuple('LineaCotizada', 'cantidad precio_unitario subtotal descuento total')
+
+
+class PrecioInvalido(Exception):
+
+    def __init__(self, mensaje, campo='id_medicamento'):
+        self.campo = campo
+        super().__init__(mensaje)
+
+
+def _redondear(valor):
+    return valor.quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def reglas():
+    """
+    Reglas vigentes (settings.FARMACIA_PRECIOS sobre REGLAS_POR_DEFECTO)
+    """
+    configuradas = {**REGLAS_POR_DEFECTO, **getattr(settings, 'FARMACIA_PRECIOS', {})}
+    return {
+        'TASA_IMPUESTO': Decimal(str(configuradas['TASA_IMPUESTO'])),
+        'DESCUENTO_MAXIMO': Decimal(str(configuradas['DESCUENTO_MAXIMO'])),
+        # De mayor a menor umbral: gana el primero que se alcanza
+        'DESCUENTOS_POR_CANTIDAD': sorted(
+            ((int(minimo), Decimal(str(proporcion))) for minimo, proporcion in configuradas['DESCUENTOS_POR_CANTIDAD']),
+            reverse=True,
+        ),
+    }
+
+
+def precios_vigentes(ids):
+    """
+    {pk: precio_unitario} de los medicamentos activos, con un solo in_bulk
+    """
+    medicamentos = Medicamento.objects.filter(estado=1).only('precio_unitario').in_bulk(ids)
+    return {pk: medicamento.precio_unitario for pk, medicamento in medicamentos.items()}
+
+
+async def aprecios_vigentes(ids):
+    """
+    Versión asíncrona de precios_vigentes para las vistas ASGI
+    """
+    return {
+        pk: precio
+        async for pk, precio in Medicamento.objects.filter(estado=1, pk__in=ids).values_list(
+            'pk', 'precio_unitario'
+        )
+    }
+
+
+class Cotizacion:
+    """
+    Precio de una venta: líneas {pk: LineaCotizada} y totales
+    """
+
+    def __init__(self, cantidades, precios, descuento=Decimal('0')):
+        reglas_vigentes = reglas()
+        self.lineas = {}
+        for id_medicamento, cantidad in cantidades.items():
+            if id_medicamento not in precios:
+                raise PrecioInvalido(f'El medicamento {id_medicamento} no existe o está inactivo')
+            precio = precios[id_medicamento]
+            if precio is None:
+                raise PrecioInvalido(f'El medicamento {id_medicamento} no tiene precio')
+            subtotal = precio * cantidad
+            proporcion = next(
+                (p for minimo, p in reglas_vigentes['DESCUENTOS_POR_CANTIDAD'] if cantidad >= minimo),
+                Decimal('0'),
+            )
+            descuento_linea = _redondear(subtotal * proporcion)
+            self.lineas[id_medicamento] = LineaCotizada(
+                cantidad, precio, subtotal, descuento_linea, subtotal - descuento_linea
+            )
+
+        self.subtotal = sum((linea.subtotal for linea in self.lineas.values()), Decimal('0'))
+        if descuento > _redondear(self.subtotal * reglas_vigentes['DESCUENTO_MAXIMO']):
+            raise PrecioInvalido('El descuento supera el máximo permitido', campo='descuento')
+        self.descuento_reglas = sum((linea.descuento for linea in self.lineas.values()), Decimal('0'))
+        self.descuento = self.descuento_reglas + descuento
+        if self.descuento > self.subtotal:
+            raise PrecioInvalido('El descuento supera el total de la venta', campo='descuento')
+        self.impuesto = _redondear((self.subtotal - self.descuento) * reglas_vigentes['TASA_IMPUESTO'])
+        self.total = self.subtotal - self.descuento + self.impuesto
+
+
+def cotizar(cantidades, precios=None, descuento=Decimal('0')):
+    """
+    Cotiza {id_medicamento: cantidad}; sin `precios` se leen los vigentes.
+    Lanza PrecioInvalido si falta un precio o el descuento no es válido.
+    """
+    if precios is None:
+        precios = precios_vigentes(list(cantidades))
+    return Cotizacion(cantidades, precios, descuento or Decimal('0'))
@@ -0,0 +1,184 @@
+"""
+Pronóstico de las unidades de cada lote que vencerán sin venderse.
+
+La velocidad de venta de cada medicamento es el promedio diario de unidades
+de los últimos `ventana_dias` días (del acumulado VentaDiaria, que ya suma las
+ventas por día y medicamento). Con ella se proyecta la demanda hasta el
+vencimiento de cada lote y se reparte entre los lotes en orden FEFO, igual
+que las ventas (lotes.py): primero los que vencen antes.
+
+Si D es la demanda hasta el vencimiento de cada lote y Q la suma de las
+cantidades de los lotes del medicamento hasta él (inclusive), lo vendido
+acumulado hasta cada lote es
+
+    C[j] = min(D[j], C[j-1] + cantidad[j]) = Q[j] + min(0, min(D[i] - Q[i] para i <= j))
+
+y lo vendido del lote es C[j] - C[j-1]. Con NumPy la segunda forma se
+calcula para todos los lotes a la vez (sumas y mínimos acumulados por
+medicamento), sin recorrer los lotes en Python: los lotes y las ventas se
+leen una sola vez con values_list y el resto son operaciones sobre arreglos.
+Sin NumPy (dependencia opcional) se aplica la primera forma lote por lote,
+con el mismo resultado.
+
+Los lotes ya vencidos se pierden completos; los lotes sin fecha de
+vencimiento no se pierden y no se incluyen.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import CharField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Lote, Medicamento, VentaDiaria
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Días de ventas con que se calcula la velocidad, por defecto
+VENTANA_DIAS = 30
+
+LotePronostico = namedtuple(
+    'LotePronostico',
+    'id_lote numero_lote id_medicamento medicamento fecha_vencimiento dias cantidad '
+    'velocidad vendidas sin_vender perdida',
+)
+
+def _lotes(id_medicamento=None):
+    # Mismo orden que la asignación FEFO; lo recorre lote_medicamento_venc_idx.
+    # La fecha se lee como texto ISO: convertirla en arreglo es mucho más
+    # rápido que crear un date por lote
+    lotes = Lote.objects.filter(
+        cantidad__gt=0, fecha_vencimiento__isnull=False, id_medicamento__isnull=False
+    )
+    if id_medicamento is not None:
+        lotes = lotes.filter(id_medicamento=id_medicamento)
+    return lotes.order_by('id_medicamento', 'fecha_vencimiento', 'id_lote').annotate(
+        vencimiento=Cast('fecha_vencimiento', CharField())
+    ).values_list('id_lote', 'numero_lote', 'id_medicamento', 'vencimiento', 'cantidad')
+
+
+def _medicamentos(id_medicamento=None):
+    # Nombre y precio por medicamento, en lugar de repetirlos en cada lote
+    medicamentos = Medicamento.objects.all()
+    if id_medicamento is not None:
+        medicamentos = medicamentos.filter(pk=id_medicamento)
+    return {
+        pk: (nombre, precio or Decimal('0'))
+        for pk, nombre, precio in medicamentos.values_list('pk', 'nombre_generico', 'precio_unitario')
+    }
+
+
+def _ventas(hoy, ventana_dias, id_medicamento=None):
+    ventas = VentaDiaria.objects.filter(fecha__gte=hoy - timedelta(days=ventana_dias), fecha__lt=hoy)
+    if id_medicamento is not None:
+        ventas = ventas.filter(id_medicamento=id_medicamento)
+    # Una fila por medicamento: la suma la hace la base de datos
+    return ventas.order_by().values('id_medicamento').annotate(total=Sum('unidades')).values_list(
+        'id_medicamento', 'total'
+    )
+
+
+def _proyectar_numpy(medicamentos, fechas, cantidades, ventas, hoy, ventana_dias):
+    """
+    (días, velocidad, vendidas, posiciones de los lotes con sobrante) con
+    operaciones sobre arreglos
+    """
+    medicamentos = np.fromiter(medicamentos, dtype=np.int64, count=len(medicamentos))
+    dias = (np.array(fechas, dtype='datetime64[D]') - np.datetime64(hoy, 'D')).astype(np.int64) + 1
+    cantidades = np.fromiter(cantidades, dtype=np.int64, count=len(cantidades))
+
+    # Los lotes vienen ordenados por medicamento: cada grupo empieza donde cambia
+    inicio = np.ones(len(medicamentos), dtype=bool)
+    inicio[1:] = medicamentos[1:] != medicamentos[:-1]
+    grupo = np.cumsum(inicio) - 1
+    catalogo = medicamentos[inicio]
+
+    # Velocidad por medicamento: unidades de la ventana / días
+    velocidad_medicamento = np.zeros(len(catalogo))
+    if ventas:
+        ids_venta, unidades = (np.asarray(columna, dtype=np.int64) for columna in zip(*ventas))
+        indice = np.searchsorted(catalogo, ids_venta).clip(max=len(catalogo) - 1)
+        validas = catalogo[indice] == ids_venta
+        velocidad_medicamento = np.bincount(
+            indice[validas], weights=unidades[validas], minlength=len(catalogo)
+        ) / ventana_dias
+    velocidad = velocidad_medicamento[grupo]
+
+    # Demanda en unidades enteras hasta el vencimiento (0 si ya venció)
+    demanda = np.floor(velocidad * dias.clip(min=0)).astype(np.int64)
+
+    # Sumas acumuladas por medicamento: la global menos la de antes de su primer lote
+    acumulado = np.cumsum(cantidades)
+    acumulado -= (acumulado - cantidades)[inicio][grupo]
+
+    # Mínimo acumulado por medicamento: cada grupo se desplaza por debajo de
+    # todos los anteriores para que sus valores no lo alcancen
+    diferencia = demanda - acumulado
+    paso = 2 * int(np.abs(diferencia).max()) + 1
+    desplazamiento = grupo * paso
+    minimo = np.minimum.accumulate(diferencia - desplazamiento) + desplazamiento
+
+    vendido_acumulado = acumulado + np.minimum(minimo, 0)
+    vendidas = np.diff(vendido_acumulado, prepend=0)
+    vendidas[inicio] = vendido_acumulado[inicio]
+    return dias, velocidad, vendidas, np.flatnonzero(cantidades - vendidas)
+
+
+def _proyectar_python(medicamentos, fechas, cantidades, ventas, hoy, ventana_dias):
+    """
+    Igual que _proyectar_numpy, lote por lote
+    """
+    dias = [(date.fromisoformat(fecha) - hoy).days + 1 for fecha in fechas]
+    unidades_por_medicamento = dict(ventas)
+
+    velocidades = []
+    vendidas = []
+    anterior = None
+    for id_medicamento, dias_lote, cantidad in zip(medicamentos, dias, cantidades):
+        if id_medicamento != anterior:
+            anterior = id_medicamento
+            vendido_acumulado = 0
+            velocidad = unidades_por_medicamento.get(id_medicamento, 0) / ventana_dias
+        demanda = int(velocidad * max(dias_lote, 0))
+        nuevo = min(demanda, vendido_acumulado + cantidad)
+        velocidades.append(velocidad)
+        vendidas.append(nuevo - vendido_acumulado)
+        vendido_acumulado = nuevo
+    en_riesgo = [posicion for posicion, cantidad in enumerate(cantidades) if cantidad != vendidas[posicion]]
+    return dias, velocidades, vendidas, en_riesgo
+
+
+def pronosticar_perdidas(hoy=None, ventana_dias=VENTANA_DIAS, id_medicamento=None, solo_en_riesgo=True):
+    """
+    Lista de LotePronostico en orden FEFO; con `solo_en_riesgo` solo los lotes
+    a los que les quedarán unidades sin vender al vencer
+    """
+    hoy = hoy or timezone.localdate()
+    filas = list(_lotes(id_medicamento))
+    if not filas:
+        return []
+    ids_lote, numeros, medicamentos, fechas, cantidades = zip(*filas)
+    ventas = list(_ventas(hoy, ventana_dias, id_medicamento))
+
+    # Los días cuentan el de vencimiento: el lote se vende hasta ese día inclusive (ver lotes_disponibles)
+    proyectar = _proyectar_python if np is None else _proyectar_numpy
+    dias, velocidades, vendidas, en_riesgo = proyectar(
+        medicamentos, fechas, cantidades, ventas, hoy, ventana_dias
+    )
+
+    # Solo se arman las filas que se devuelven
+    catalogo = _medicamentos(id_medicamento)
+    pronostico = []
+    for posicion in (en_riesgo if solo_en_riesgo else range(len(filas))):
+        nombre, precio = catalogo[medicamentos[posicion]]
+        sin_vender = cantidades[posicion] - int(vendidas[posicion])
+        pronostico.append(LotePronostico(
+            ids_lote[posicion], numeros[posicion], medicamentos[posicion], nombre,
+            date.fromisoformat(fechas[posicion]), int(dias[posicion]) - 1, cantidades[posicion],
+            round(float(velocidades[posicion]), 2), int(vendidas[posicion]), sin_vender, precio * sin_vender,
+        ))
+    return pronostico
@@ -0,0 +1,71 @@
+"""
+Unicidad garantizada por la base de datos.
+
+Los formularios comprobaban cada campo único con un exists() antes de
+guardar: una consulta extra por campo en cada alta o edición, y aun así dos
+envíos simultáneos podían pasar ambos la comprobación. Ahora cada modelo
+declara sus UniqueConstraint (con su mensaje en violation_error_message) y
+RestriccionesUnicasMixin guarda sin consultar antes: si el INSERT o UPDATE
+choca con una restricción, el IntegrityError se convierte en el error del
+campo con el mismo mensaje de siempre.
+
+restriccion_violada reconoce la restricción por el texto del error: SQLite
+nombra las columnas ("UNIQUE constraint failed: Proveedor.ruc") y otros
+motores, la restricción.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import UniqueConstraint
+
+
+def restricciones_unicas(modelo):
+    return [
+        restriccion for restriccion in modelo._meta.constraints
+        if isinstance(restriccion, UniqueConstraint)
+    ]
+
+
+def restriccion_violada(error, *modelos):
+    """
+    UniqueConstraint de los modelos que causó el IntegrityError, o None
+    """
+    mensaje = str(error)
+    for modelo in modelos:
+        for restriccion in restricciones_unicas(modelo):
+            columnas = ', '.join(
+                f'{modelo._meta.db_table}.{modelo._meta.get_field(campo).column}'
+                for campo in restriccion.fields
+            )
+            if mensaje == f'UNIQUE constraint failed: {columnas}' or restriccion.name in mensaje:
+                return restriccion
+    return None
+
+
+class RestriccionesUnicasMixin:
+    """
+    Para ModelForms: la unicidad la valida la base de datos al guardar.
+    save() devuelve None (y el formulario queda con el error) si el registro
+    choca con una restricción única del modelo
+    """
+
+    def _get_validation_exclusions(self):
+        # Sin esto full_clean haría un exists() por restricción (UniqueConstraint.validate)
+        excluidos = super()._get_validation_exclusions()
+        for restriccion in restricciones_unicas(self._meta.model):
+            excluidos.update(restriccion.fields)
+        return excluidos
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+        try:
+            # Punto de guardado: la transacción de la petición sigue utilizable
+            with transaction.atomic():
+                return super().save()
+        except IntegrityError as error:
+            restriccion = restriccion_violada(error, self._meta.model)
+            if restriccion is None:
+                raise
+            # Las restricciones de varios campos quedan como error general
+            campo = restriccion.fields[0] if len(restriccion.fields) == 1 else None
+            self.add_error(campo if campo in self.fields else None, restriccion.violation_error_message)
+            return None
@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .alertas import registrar_cambio_alerta
+from .inventario import registrar_cambio_stock
+from .models import Medicamento
+from .opciones import LISTAS, invalidar_opciones
+from .sugerencias import invalidar_indice
+
+
+# ===========================
+# ÍNDICE DE AUTOCOMPLETADO
+# ===========================
+@receiver(post_save, sender=Medicamento)
+@receiver(post_delete, sender=Medicamento)
+def medicamento_cambiado(sender, **kwargs):
+    invalidar_indice()
+
+
+# ===========================
+# RESUMEN DE INVENTARIO Y ALERTAS DE STOCK
+# ===========================
+def _valores_inventario(medicamento):
+    return medicamento.cantidad, medicamento.precio_unitario, medicamento.stock_minimo
+
+
+@receiver(pre_save, sender=Medicamento)
+def medicamento_antes_de_guardar(sender, instance, **kwargs):
+    # Se leen los valores guardados (no los de la instancia, que pueden estar viejos)
+    instance._inventario_anterior = None
+    if instance.pk and not instance._state.adding:
+        instance._inventario_anterior = Medicamento.objects.filter(pk=instance.pk).values_list(
+            'cantidad', 'precio_unitario', 'stock_minimo'
+        ).first()
+
+
+@receiver(post_save, sender=Medicamento)
+def medicamento_guardado(sender, instance, **kwargs):
+    anterior = getattr(instance, '_inventario_anterior', None)
+    nuevo = _valores_inventario(instance)
+    registrar_cambio_stock(anterior, nuevo)
+    registrar_cambio_alerta(instance.pk, anterior, nuevo)
+
+
+@receiver(post_delete, sender=Medicamento)
+def medicamento_eliminado(sender, instance, **kwargs):
+    registrar_cambio_stock(_valores_inventario(instance), None)
+
+
+# ===========================
+# LISTAS DE OPCIONES DE LOS FORMULARIOS
+# ===========================
+def opciones_cambiadas(sender, **kwargs):
+    invalidar_opciones(sender)
+
+
+for _modelo in {modelo for modelo, _, _ in LISTAS.values()}:
+    post_save.connect(opciones_cambiadas, sender=_modelo, dispatch_uid=f'opciones_{_modelo.__name__}_save')
+    post_delete.connect(opciones_cambiadas, sender=_modelo, dispatch_uid=f'opciones_{_modelo.__name__}_delete')
@@ -0,0 +1,93 @@
+"""
+Movimientos de stock atómicos.
+
+El stock se modifica siempre con un UPDATE condicional sobre las filas
+(cantidad = cantidad + delta WHERE cantidad >= -delta) en lugar de leer,
+comparar en Python y guardar el objeto completo: con varios terminales
+vendiendo el mismo producto, la base de datos serializa los UPDATE y ninguno
+puede dejar el stock negativo ni pisar la venta de otro.
+
+Varios medicamentos se ajustan con una sola sentencia (un CASE por llave
+primaria), así que una venta de 20 líneas cuesta lo mismo que una de una.
+Como QuerySet.update() no emite señales, aquí mismo se actualizan el resumen
+de inventario y las alertas de stock con los valores anterior y nuevo.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .alertas import registrar_cambios_alerta
+from .inventario import registrar_cambios_stock
+from .models import Medicamento
+
+
+class StockInsuficiente(Exception):
+
+    def __init__(self, id_medicamento, disponible):
+        self.id_medicamento = id_medicamento
+        self.disponible = disponible
+        super().__init__(f'No hay suficiente stock. Stock disponible: {disponible}')
+
+
+def _por_medicamento(valores):
+    """
+    CASE id_medicamento WHEN ... THEN valor END para un dict {pk: valor}
+    """
+    return Case(
+        *[When(pk=pk, then=Value(valor)) for pk, valor in valores.items()],
+        output_field=IntegerField(),
+    )
+
+
+def ajustar_stock(id_medicamento, delta):
+    """
+    Suma `delta` (negativo para descontar) al stock del medicamento; lanza
+    StockInsuficiente si el descuento dejaría el stock por debajo de cero
+    """
+    ajustar_stock_varios([(id_medicamento, delta)])
+
+
+def ajustar_stock_varios(movimientos):
+    """
+    Aplica varios (id_medicamento, delta) con un solo UPDATE condicional; si a
+    alguno no le alcanza el stock no se aplica ninguno y se lanza
+    StockInsuficiente con el primero que falló
+    """
+    deltas = {}
+    for id_medicamento, delta in movimientos:
+        if id_medicamento is not None and delta:
+            deltas[id_medicamento] = deltas.get(id_medicamento, 0) + delta
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        punto = transaction.savepoint()
+        actualizadas = Medicamento.objects.filter(
+            pk__in=deltas,
+            cantidad__gte=_por_medicamento({pk: -delta for pk, delta in deltas.items()}),
+        ).update(cantidad=F('cantidad') + _por_medicamento(deltas))
+
+        if actualizadas != len(deltas):
+            # Se deshace el UPDATE parcial para informar el stock real
+            transaction.savepoint_rollback(punto)
+            disponibles = dict(
+                Medicamento.objects.filter(pk__in=deltas).values_list('pk', 'cantidad')
+            )
+            fallido = next(
+                (pk for pk in sorted(deltas) if disponibles.get(pk, 0) + deltas[pk] < 0),
+                min(deltas),
+            )
+            raise StockInsuficiente(fallido, disponibles.get(fallido, 0))
+        transaction.savepoint_commit(punto)
+
+        # Las filas quedan bloqueadas por el UPDATE hasta el fin de la
+        # transacción, así que el valor anterior es exactamente el nuevo menos delta
+        cambios = []
+        for pk, cantidad, precio_unitario, stock_minimo in Medicamento.objects.filter(
+            pk__in=deltas
+        ).values_list('pk', 'cantidad', 'precio_unitario', 'stock_minimo'):
+            nuevo = (cantidad, precio_unitario, stock_minimo)
+            anterior = (cantidad - deltas[pk], precio_unitario, stock_minimo)
+            cambios.append((pk, anterior, nuevo))
+        registrar_cambios_stock([(anterior, nuevo) for _, anterior, nuevo in cambios])
+        registrar_cambios_alerta(cambios)
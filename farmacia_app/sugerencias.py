@@ -0,0 +1,179 @@
+"""
+Índice de prefijos en memoria para el autocompletado de medicamentos en el POS.
+
+Cada proceso carga el índice de forma perezosa la primera vez que se consulta
+y lo descarta cuando se guarda o elimina un Medicamento (ver signals.py). Como
+otros procesos no reciben esas señales, el índice también caduca tras
+TTL_SEGUNDOS.
+
+El trie se guarda "aplanado": una lista ordenada de claves normalizadas en la
+que todas las claves con un mismo prefijo quedan contiguas, de modo que el
+subárbol de un prefijo se ubica con una búsqueda binaria. Da las mismas
+respuestas que un trie de nodos con una fracción de la memoria.
+
+El índice no guarda el stock (cambia en cada venta). sugerir_con_stock lo lee
+por llave primaria para una página de coincidencias; si se piden solo las que
+tienen stock, las agotadas se descartan antes del límite y se leen más
+páginas hasta completarlo, para que un prefijo con muchas agotadas no oculte
+las disponibles.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Medicamento
+
+# Segundos tras los que un proceso recarga el índice aunque no haya recibido señales
+TTL_SEGUNDOS = 300
+
+# Máximo de sugerencias por consulta
+LIMITE_SUGERENCIAS = 10
+
+# Coincidencias cuyo stock se lee por consulta cuando se omiten las agotadas
+PAGINA_CON_STOCK = 50
+
+
+def normalizar(texto):
+    """
+    Minúsculas, sin acentos y con espacios simples: "Ungüento" -> "unguento"
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+class IndicePrefijos:
+    """
+    Trie aplanado de claves normalizadas -> id_medicamento
+    """
+
+    def __init__(self, filas):
+        self.medicamentos = {}
+        entradas = set()
+        for id_medicamento, nombre, cod_laboratorio, precio in filas:
+            self.medicamentos[id_medicamento] = {
+                'id': id_medicamento,
+                'nombre': nombre,
+                'cod_laboratorio': cod_laboratorio,
+                'precio_unitario': str(precio) if precio is not None else None,
+            }
+            nombre_normalizado = normalizar(nombre)
+            # El nombre completo ordena primero; cada palabra permite buscar "zinc"
+            entradas.add((nombre_normalizado, id_medicamento))
+            for palabra in nombre_normalizado.split()[1:]:
+                entradas.add((palabra, id_medicamento))
+            if cod_laboratorio:
+                entradas.add((normalizar(cod_laboratorio), id_medicamento))
+
+        entradas = sorted(entradas)
+        self.claves = [clave for clave, _ in entradas]
+        self.ids = [id_medicamento for _, id_medicamento in entradas]
+
+    def coincidencias(self, prefijo):
+        """
+        Medicamentos cuyo nombre, palabra o código empieza por `prefijo`, en
+        orden y sin repetir, a medida que se piden
+        """
+        prefijo = normalizar(prefijo)
+        if not prefijo:
+            return
+
+        vistos = set()
+        posicion = bisect_left(self.claves, prefijo)
+        while posicion < len(self.claves) and self.claves[posicion].startswith(prefijo):
+            id_medicamento = self.ids[posicion]
+            if id_medicamento not in vistos:
+                vistos.add(id_medicamento)
+                yield self.medicamentos[id_medicamento]
+            posicion += 1
+
+    def buscar(self, prefijo, limite=LIMITE_SUGERENCIAS):
+        return list(islice(self.coincidencias(prefijo), limite))
+
+
+_indice = None
+_cargado_en = 0.0
+_candado = threading.Lock()
+
+
+def obtener_indice():
+    """
+    Devuelve el índice del proceso, construyéndolo si no existe o caducó
+    """
+    global _indice, _cargado_en
+    indice = _indice
+    if indice is not None and time.monotonic() - _cargado_en < TTL_SEGUNDOS:
+        return indice
+
+    with _candado:
+        if _indice is None or time.monotonic() - _cargado_en >= TTL_SEGUNDOS:
+            filas = Medicamento.objects.filter(estado=1).values_list(
+                'id_medicamento', 'nombre_generico', 'cod_laboratorio', 'precio_unitario'
+            )
+            _indice = IndicePrefijos(filas.iterator(chunk_size=2000))
+            _cargado_en = time.monotonic()
+        return _indice
+
+
+def invalidar_indice(**kwargs):
+    """
+    Descarta el índice del proceso; se reconstruye en la próxima consulta
+    """
+    global _indice
+    _indice = None
+
+
+def _paginas(indice, texto, solo_con_stock, limite):
+    coincidencias = indice.coincidencias(texto)
+    tamano = max(limite, PAGINA_CON_STOCK) if solo_con_stock else limite
+    while pagina := list(islice(coincidencias, tamano)):
+        yield pagina
+
+
+def _stock(pagina, solo_con_stock):
+    medicamentos = Medicamento.objects.filter(pk__in=[s['id'] for s in pagina])
+    if solo_con_stock:
+        medicamentos = medicamentos.filter(cantidad__gt=0)
+    return medicamentos.values_list('id_medicamento', 'cantidad')
+
+
+def _completar(resultados, pagina, stock, limite):
+    """
+    Agrega a `resultados` las sugerencias de la página que siguen en `stock`;
+    True cuando ya hay `limite`
+    """
+    for sugerencia in pagina:
+        if sugerencia['id'] in stock:
+            resultados.append({**sugerencia, 'cantidad': stock[sugerencia['id']]})
+            if len(resultados) == limite:
+                return True
+    return False
+
+
+def sugerir_con_stock(texto, solo_con_stock=False, limite=LIMITE_SUGERENCIAS):
+    """
+    Sugerencias con su stock actual; con solo_con_stock omite las agotadas
+    """
+    resultados = []
+    for pagina in _paginas(obtener_indice(), texto, solo_con_stock, limite):
+        if _completar(resultados, pagina, dict(_stock(pagina, solo_con_stock)), limite):
+            break
+    return resultados
+
+
+async def asugerir_con_stock(texto, solo_con_stock=False, limite=LIMITE_SUGERENCIAS):
+    """
+    Versión asíncrona de sugerir_con_stock para las vistas ASGI
+    """
+    # El índice en memoria se carga (o recarga) de forma síncrona
+    indice = await sync_to_async(obtener_indice)()
+    resultados = []
+    for pagina in _paginas(indice, texto, solo_con_stock, limite):
+        stock = {pk: cantidad async for pk, cantidad in _stock(pagina, solo_con_stock)}
+        if _completar(resultados, pagina, stock, limite):
+            break
+    return resultados
@@ -1,3 +1,1480 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .alertas import sincronizar_alertas
+from .estado_lotes import MAXIMO_DIAS_POR_VENCER, actualizar_estado_lotes, iniciar_programador
+from .forms import LoteMedicamentoForm, ProveedorForm, VentaForm
+from .importacion import leer_json
+from .inventario import recalcular_inventario
+from .models import (
+    AlertaStock, AsignacionLote, Cliente, CompraMedicamento, Empleados, Factura, FacturaCompra, InventarioResumen,
+    Lote, LoteMedicamento, Medicamento, MetodoPago, Proveedor, Venta, VentaDiaria,
+)
+from .opciones import opciones
+from .precios import PrecioInvalido, cotizar
+from . import pronostico
+from .reconciliacion import corregir, diferencias
+from .sugerencias import LIMITE_SUGERENCIAS, invalidar_indice
+from . import views
+
+
+class VistaAutenticadaTestCase(TestCase):
+    """
+    Base para las pruebas de vistas: deja un usuario con sesión iniciada y
+    la caché vacía
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = get_user_model().objects.create_user(
+            username='admin', password='clave-segura-123', rol='administrador'
+        )
+        self.client.force_login(self.usuario)
+
+
+class MedicamentoListTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico=f'Med {i:03d}', cantidad=i, estado=i % 2)
+            for i in range(7)
+        ])
+
+    @mock.patch.object(views, 'MEDICAMENTOS_POR_PAGINA', 3)
+    def test_paginacion_por_cursor_recorre_todo_sin_repetir(self):
+        url = reverse('medicamento_list')
+        vistos = []
+        parametros = {}
+        while True:
+            pagina = self.client.get(url, parametros).context['pagina']
+            vistos.extend(m.nombre_generico for m in pagina)
+            if not pagina.tiene_siguiente:
+                break
+            parametros = {'despues': pagina.cursor_siguiente}
+
+        self.assertEqual(vistos, [f'Med {i:03d}' for i in range(7)])
+
+        # Volver una página atrás devuelve el bloque anterior completo
+        pagina = self.client.get(url, {'antes': pagina.cursor_anterior}).context['pagina']
+        self.assertEqual([m.nombre_generico for m in pagina], ['Med 003', 'Med 004', 'Med 005'])
+
+    def test_conteos_en_una_sola_consulta(self):
+        respuesta = self.client.get(reverse('medicamento_list'), {'search': 'Med'})
+        self.assertEqual(respuesta.context['total_medicamentos'], 7)
+        self.assertEqual(respuesta.context['medicamentos_activos'], 3)
+        self.assertEqual(respuesta.context['medicamentos_inactivos'], 4)
+
+    def test_filtro_estado_se_mantiene(self):
+        respuesta = self.client.get(reverse('medicamento_list'), {'estado': '1'})
+        self.assertTrue(all(m.estado == 1 for m in respuesta.context['pagina']))
+        self.assertEqual(respuesta.context['total_medicamentos'], 3)
+
+
+class BusquedaMedicamentoTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.unguento = Medicamento.objects.create(
+            nombre_generico='Ungüento de zinc', presentacion='Ungüento', cod_laboratorio='LAB-77'
+        )
+        self.solucion = Medicamento.objects.create(
+            nombre_generico='Suero oral', presentacion='Solución', registro_sanitario='RS-NIC-12345'
+        )
+        Medicamento.objects.create(nombre_generico='Paracetamol', presentacion='Tabletas')
+
+    def _buscar(self, texto):
+        respuesta = self.client.get(reverse('medicamento_list'), {'search': texto})
+        return [m.pk for m in respuesta.context['pagina']]
+
+    def test_sin_acentos_y_por_prefijo(self):
+        self.assertEqual(self._buscar('unguen'), [self.unguento.pk])
+        self.assertEqual(self._buscar('solucion'), [self.solucion.pk])
+
+    def test_busca_en_otras_columnas(self):
+        self.assertEqual(self._buscar('lab-77'), [self.unguento.pk])
+        self.assertEqual(self._buscar('RS-NIC'), [self.solucion.pk])
+
+    def test_indice_sigue_a_ediciones_y_borrados(self):
+        self.unguento.nombre_generico = 'Pomada de zinc'
+        self.unguento.presentacion = 'Crema'
+        self.unguento.save()
+        self.assertEqual(self._buscar('pomada'), [self.unguento.pk])
+        self.assertEqual(self._buscar('unguento'), [])
+
+        self.solucion.delete()
+        self.assertEqual(self._buscar('suero'), [])
+
+    def test_sintaxis_fts_del_usuario_no_rompe_la_consulta(self):
+        self.assertEqual(self._buscar('"zinc* ('), [self.unguento.pk])
+
+
+class SugerenciasMedicamentoTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.unguento = Medicamento.objects.create(
+            nombre_generico='Ungüento de zinc', cod_laboratorio='LAB-77', cantidad=5, precio_unitario=10
+        )
+        self.agotado = Medicamento.objects.create(nombre_generico='Ungüento mentolado', cantidad=0)
+
+    def _sugerir(self, **parametros):
+        respuesta = self.client.get(reverse('medicamento_sugerencias'), parametros)
+        return [r['id'] for r in respuesta.json()['resultados']]
+
+    def test_prefijo_normalizado_en_nombre_palabras_y_codigo(self):
+        self.assertEqual(self._sugerir(q='UNGUE'), [self.unguento.pk, self.agotado.pk])
+        self.assertEqual(self._sugerir(q='zin'), [self.unguento.pk])
+        self.assertEqual(self._sugerir(q='lab-7'), [self.unguento.pk])
+
+    def test_filtra_sin_stock(self):
+        self.assertEqual(self._sugerir(q='ung', con_stock='1'), [self.unguento.pk])
+
+    def test_agotadas_no_ocultan_las_disponibles(self):
+        # 60 agotadas ordenan antes que "Ungüento de zinc": más de una página
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico=f'Ungüento agotado {i:02}', cantidad=0) for i in range(60)
+        ])
+        invalidar_indice()
+        self.assertEqual(len(self._sugerir(q='ung')), LIMITE_SUGERENCIAS)
+        self.assertEqual(self._sugerir(q='ung', con_stock='1'), [self.unguento.pk])
+
+    def test_indice_se_invalida_al_guardar_y_eliminar(self):
+        self._sugerir(q='ung')
+        nuevo = Medicamento.objects.create(nombre_generico='Ungüento nuevo', cantidad=1)
+        self.assertIn(nuevo.pk, self._sugerir(q='ung'))
+        nuevo.delete()
+        self.assertNotIn(nuevo.pk, self._sugerir(q='ung'))
+
+
+class ReporteStockTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico='Agotado', cantidad=0, stock_minimo=5, precio_unitario=Decimal('3.00')),
+            Medicamento(nombre_generico='Bajo', cantidad=2, stock_minimo=5, precio_unitario=Decimal('1.50')),
+            Medicamento(nombre_generico='Normal', cantidad=20, stock_minimo=5, precio_unitario=Decimal('2.25')),
+            Medicamento(nombre_generico='Sin precio', cantidad=7, stock_minimo=5),
+        ])
+        # bulk_create no emite señales: se parte de un resumen recalculado
+        recalcular_inventario()
+
+    def test_resumen_en_una_consulta(self):
+        # Sesión + usuario + la fila del resumen
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(reverse('medicamento_stock_report'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total_medicamentos'], 4)
+        self.assertEqual(respuesta.context['total_valor_inventario'], Decimal('48.00'))
+        self.assertEqual(respuesta.context['total_agotados'], 1)
+        self.assertEqual(respuesta.context['total_bajo_stock'], 1)
+        self.assertEqual(respuesta.context['total_stock_normal'], 2)
+        self.assertNotIn('pagina', respuesta.context)
+
+    def test_categoria_solicitada_agrega_una_consulta(self):
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(reverse('medicamento_stock_report'), {'categoria': 'bajo_stock'})
+        self.assertEqual([m.nombre_generico for m in respuesta.context['pagina']], ['Bajo'])
+
+
+class InventarioResumenTests(VistaAutenticadaTestCase):
+
+    def _resumen(self):
+        resumen = InventarioResumen.objects.get()
+        return (resumen.valor_inventario, resumen.total_medicamentos,
+                resumen.total_agotados, resumen.total_bajo_stock)
+
+    def test_diferencias_coinciden_con_recalculo(self):
+        medicamento = Medicamento.objects.create(
+            nombre_generico='Ibuprofeno', cantidad=12, stock_minimo=10, precio_unitario=Decimal('2.50')
+        )
+        otro = Medicamento.objects.create(nombre_generico='Loratadina', cantidad=3, precio_unitario=Decimal('4.00'))
+        self.assertEqual(self._resumen(), (Decimal('42.00'), 2, 0, 1))
+
+        # Venta que deja el medicamento en bajo stock
+        self.client.post(reverse('venta_create'), {
+            'id_medicamento': medicamento.pk, 'cantidad': 5, 'estado': 'Pagada',
+        })
+        self.assertEqual(self._resumen(), (Decimal('29.50'), 2, 0, 2))
+
+        # Cambio de precio y eliminación
+        otro.precio_unitario = Decimal('1.00')
+        otro.cantidad = 0
+        otro.save()
+        self.assertEqual(self._resumen(), (Decimal('17.50'), 2, 1, 1))
+        venta = Venta.objects.get()
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        otro.delete()
+
+        esperado = self._resumen()
+        recalcular_inventario()
+        self.assertEqual(self._resumen(), esperado)
+        self.assertEqual(esperado, (Decimal('30.00'), 1, 0, 0))
+
+
+class AlertaStockTests(VistaAutenticadaTestCase):
+
+    def _abiertas(self):
+        return list(AlertaStock.objects.filter(fecha_cierre__isnull=True).values_list('id_medicamento', 'tipo'))
+
+    def test_abre_y_cierra_al_cruzar_el_minimo(self):
+        medicamento = Medicamento.objects.create(
+            nombre_generico='Ibuprofeno', cantidad=12, stock_minimo=10, precio_unitario=Decimal('1.00')
+        )
+        self.assertEqual(self._abiertas(), [])
+
+        # Venta que cruza el mínimo: se abre la alerta
+        self.client.post(reverse('venta_create'), {
+            'id_medicamento': medicamento.pk, 'cantidad': 5, 'estado': 'Pagada',
+        })
+        self.assertEqual(self._abiertas(), [(medicamento.pk, 'bajo_stock')])
+
+        # Sin cruzar fronteras no se toca la tabla de alertas
+        medicamento.refresh_from_db()
+        medicamento.cantidad = 3
+        with self.assertNumQueries(3):  # lectura previa, UPDATE del medicamento y del resumen
+            medicamento.save()
+
+        medicamento.cantidad = 0
+        medicamento.save()
+        self.assertEqual(self._abiertas(), [(medicamento.pk, 'agotado')])
+
+        # Reposición: se cierra sin abrir otra
+        medicamento.cantidad = 50
+        medicamento.save()
+        self.assertEqual(self._abiertas(), [])
+        self.assertEqual(AlertaStock.objects.count(), 2)
+
+    def test_endpoint_y_contador_en_home(self):
+        agotado = Medicamento.objects.create(nombre_generico='Loratadina', cantidad=0)
+        Medicamento.objects.create(nombre_generico='Zinc', cantidad=100)
+
+        datos = self.client.get(reverse('alerta_stock_list')).json()
+        self.assertEqual(datos['total'], 1)
+        self.assertEqual(datos['alertas'][0]['id_medicamento'], agotado.pk)
+        self.assertEqual(datos['alertas'][0]['tipo'], 'agotado')
+
+        respuesta = self.client.get(reverse('home'))
+        self.assertEqual(respuesta.context['total_alertas_stock'], 1)
+
+    def test_sincronizar_tras_operacion_masiva(self):
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico='A', cantidad=0),
+            Medicamento(nombre_generico='B', cantidad=5, stock_minimo=10),
+            Medicamento(nombre_generico='C', cantidad=50),
+        ])
+        self.assertEqual(sincronizar_alertas(), (2, 0))
+        Medicamento.objects.filter(nombre_generico='A').update(cantidad=40)
+        self.assertEqual(sincronizar_alertas(), (0, 1))
+        self.assertEqual(AlertaStock.objects.filter(fecha_cierre__isnull=True).get().tipo, 'bajo_stock')
+
+
+class VentaListTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        medicamento = Medicamento.objects.create(nombre_generico='Ibuprofeno', precio_unitario=Decimal('2.00'))
+        Venta.objects.bulk_create([
+            Venta(
+                fecha=self.hoy - timedelta(days=i % 2),
+                total=Decimal('10.00'),
+                id_cliente=Cliente.objects.create(nombre=f'Cliente {i}'),
+                id_empleado=Empleados.objects.create(nombre=f'Empleado {i}'),
+                id_medicamento=medicamento,
+            )
+            for i in range(10)
+        ])
+
+    @mock.patch.object(views, 'VENTAS_POR_PAGINA', 3)
+    def test_consultas_fijas_por_pagina(self):
+        # Sesión, usuario, totales del periodo y la página con sus relaciones
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(reverse('venta_list'))
+        self.assertContains(respuesta, 'Cliente 0')
+        self.assertContains(respuesta, 'Ibuprofeno')
+        self.assertEqual(len(respuesta.context['pagina']), 3)
+        self.assertTrue(respuesta.context['pagina'].tiene_siguiente)
+
+    def test_por_defecto_solo_hoy_y_rango_opcional(self):
+        respuesta = self.client.get(reverse('venta_list'))
+        self.assertEqual(respuesta.context['total_ventas'], 5)
+        self.assertTrue(all(v.fecha == self.hoy for v in respuesta.context['pagina']))
+
+        ayer = (self.hoy - timedelta(days=1)).isoformat()
+        respuesta = self.client.get(reverse('venta_list'), {'desde': ayer, 'hasta': self.hoy.isoformat()})
+        self.assertEqual(respuesta.context['total_ventas'], 10)
+        self.assertEqual(respuesta.context['monto_total'], Decimal('100.00'))
+
+
+class VentaDiariaTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        self.empleado = Empleados.objects.create(nombre='Ana')
+        self.ibuprofeno = Medicamento.objects.create(
+            nombre_generico='Ibuprofeno', cantidad=50, precio_unitario=Decimal('2.00')
+        )
+        self.loratadina = Medicamento.objects.create(
+            nombre_generico='Loratadina', cantidad=50, precio_unitario=Decimal('3.00')
+        )
+
+    def _acumulado(self):
+        return sorted(VentaDiaria.objects.exclude(numero_ventas=0).values_list(
+            'fecha', 'id_medicamento', 'id_empleado', 'unidades', 'monto', 'numero_ventas'
+        ))
+
+    def _reconstruido(self):
+        actual = self._acumulado()
+        call_command('reconstruir_ventas_diarias', stdout=io.StringIO())
+        return actual, self._acumulado()
+
+    def test_crear_editar_y_eliminar_aplican_la_diferencia(self):
+        datos = {
+            'fecha': self.hoy.isoformat(), 'id_empleado': self.empleado.pk,
+            'id_medicamento': self.ibuprofeno.pk, 'cantidad': 4, 'total': '8.00', 'estado': 'Pagada',
+        }
+        self.client.post(reverse('venta_create'), datos)
+        self.client.post(reverse('venta_create'), dict(datos, cantidad=1, total='2.00'))
+        self.assertEqual(self._acumulado(), [
+            (self.hoy, self.ibuprofeno.pk, self.empleado.pk, 5, Decimal('10.00'), 2),
+        ])
+
+        # Mover una venta a otro medicamento y a ayer
+        venta = Venta.objects.filter(cantidad=1).get()
+        ayer = self.hoy - timedelta(days=1)
+        self.client.post(reverse('venta_edit', args=[venta.pk]), dict(
+            datos, fecha=ayer.isoformat(), id_medicamento=self.loratadina.pk, cantidad=2, total='6.00'
+        ))
+        self.assertEqual(self._acumulado(), [
+            (ayer, self.loratadina.pk, self.empleado.pk, 2, Decimal('6.00'), 1),
+            (self.hoy, self.ibuprofeno.pk, self.empleado.pk, 4, Decimal('8.00'), 1),
+        ])
+
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        actual, reconstruido = self._reconstruido()
+        self.assertEqual(actual, [(self.hoy, self.ibuprofeno.pk, self.empleado.pk, 4, Decimal('8.00'), 1)])
+        self.assertEqual(actual, reconstruido)
+
+    def test_carrito_aporta_sus_lineas(self):
+        respuesta = self.client.post(reverse('venta_checkout'), json.dumps({
+            'id_empleado': self.empleado.pk,
+            'lineas': [
+                {'id_medicamento': self.ibuprofeno.pk, 'cantidad': 2},
+                {'id_medicamento': self.loratadina.pk, 'cantidad': 1},
+            ],
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': '7.00'}],
+        }), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        actual, reconstruido = self._reconstruido()
+        self.assertEqual(actual, [
+            (self.hoy, self.ibuprofeno.pk, self.empleado.pk, 2, Decimal('4.00'), 1),
+            (self.hoy, self.loratadina.pk, self.empleado.pk, 1, Decimal('3.00'), 1),
+        ])
+        self.assertEqual(actual, reconstruido)
+
+        self.client.get(reverse('venta_delete', args=[respuesta.json()['id_venta']]))
+        self.assertEqual(self._acumulado(), [])
+
+    def test_venta_por_carrito_no_se_edita(self):
+        respuesta = self.client.post(reverse('venta_checkout'), json.dumps({
+            'lineas': [{'id_medicamento': self.ibuprofeno.pk, 'cantidad': 2}],
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': '4.00'}],
+        }), content_type='application/json')
+        url = reverse('venta_edit', args=[respuesta.json()['id_venta']])
+        respuesta = self.client.post(url, {
+            'fecha': self.hoy.isoformat(), 'id_medicamento': self.loratadina.pk, 'cantidad': 1, 'estado': 'Pagada',
+        }, follow=True)
+        self.assertRedirects(respuesta, reverse('venta_list'))
+        self.assertContains(respuesta, 'se cobró desde el carrito')
+        self.assertEqual(Medicamento.objects.get(pk=self.loratadina.pk).cantidad, 50)
+
+    @override_settings(FARMACIA_PRECIOS={'TASA_IMPUESTO': '0.12', 'DESCUENTO_MAXIMO': '0.50'})
+    def test_carrito_reparte_descuento_e_impuesto(self):
+        self.client.post(reverse('venta_create'), {
+            'fecha': self.hoy.isoformat(), 'id_empleado': self.empleado.pk,
+            'id_medicamento': self.ibuprofeno.pk, 'cantidad': 1, 'total': '2.00', 'estado': 'Pagada',
+        })
+        # Simple: 2.00 más 12%. Carrito: 7.00 menos 1.00, más 12% = 6.72 repartidos 4:3
+        respuesta = self.client.post(reverse('venta_checkout'), json.dumps({
+            'id_empleado': self.empleado.pk,
+            'lineas': [
+                {'id_medicamento': self.ibuprofeno.pk, 'cantidad': 2},
+                {'id_medicamento': self.loratadina.pk, 'cantidad': 1},
+            ],
+            'descuento': '1.00',
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': '6.72'}],
+        }), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        actual, reconstruido = self._reconstruido()
+        self.assertEqual(actual, [
+            (self.hoy, self.ibuprofeno.pk, self.empleado.pk, 3, Decimal('6.08'), 2),
+            (self.hoy, self.loratadina.pk, self.empleado.pk, 1, Decimal('2.88'), 1),
+        ])
+        self.assertEqual(actual, reconstruido)
+        self.assertEqual(
+            sum(monto for *_, monto, _ in actual),
+            Venta.objects.aggregate(total=Sum('total'))['total'],
+        )
+
+    def test_reporte_lee_solo_el_acumulado(self):
+        VentaDiaria.objects.bulk_create([
+            VentaDiaria(fecha=date(2026, 1, 5), id_medicamento=self.ibuprofeno.pk,
+                        id_empleado=self.empleado.pk, unidades=3, monto=Decimal('6.00'), numero_ventas=2),
+            VentaDiaria(fecha=date(2026, 1, 20), id_medicamento=self.loratadina.pk,
+                        unidades=1, monto=Decimal('3.00'), numero_ventas=1),
+            VentaDiaria(fecha=date(2026, 2, 1), id_medicamento=self.ibuprofeno.pk,
+                        id_empleado=self.empleado.pk, unidades=1, monto=Decimal('2.00'), numero_ventas=1),
+        ])
+        # Sesión, usuario, totales por mes, por medicamento (+ nombres) y por empleado (+ nombres)
+        with self.assertNumQueries(7):
+            respuesta = self.client.get(reverse('venta_reporte'), {
+                'periodo': 'mensual', 'desde': '2026-01-01', 'hasta': '2026-12-31',
+            })
+        self.assertEqual(
+            [(fila['periodo'], fila['unidades'], fila['monto']) for fila in respuesta.context['filas']],
+            [(date(2026, 1, 1), 4, Decimal('9.00')), (date(2026, 2, 1), 1, Decimal('2.00'))],
+        )
+        self.assertEqual(respuesta.context['total_monto'], Decimal('11.00'))
+        self.assertEqual(respuesta.context['medicamentos'][0]['objeto'], self.ibuprofeno)
+        self.assertEqual(respuesta.context['medicamentos'][0]['ventas'], 3)
+        self.assertContains(respuesta, 'Ana')
+
+
+@override_settings(FARMACIA_PRECIOS={
+    'TASA_IMPUESTO': '0.12',
+    'DESCUENTO_MAXIMO': '0.10',
+    'DESCUENTOS_POR_CANTIDAD': [(10, '0.05'), (20, '0.10')],
+})
+class PreciosTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Ibuprofeno', cantidad=100, precio_unitario=Decimal('2.50')
+        )
+
+    def test_cotizacion_con_una_sola_lectura_de_precios(self):
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico=f'Med {i}', precio_unitario=Decimal('1.00')) for i in range(20)
+        ])
+        cantidades = {pk: 10 for pk in Medicamento.objects.values_list('pk', flat=True)}
+        with self.assertNumQueries(1):
+            cotizacion = cotizar(cantidades, descuento=Decimal('5.00'))
+        # 20 x 10.00 + 25.00, menos 5% por cantidad y 5.00 manual, más 12%
+        self.assertEqual(cotizacion.subtotal, Decimal('225.00'))
+        self.assertEqual(cotizacion.descuento, Decimal('16.25'))
+        self.assertEqual(cotizacion.impuesto, Decimal('25.05'))
+        self.assertEqual(cotizacion.total, Decimal('233.80'))
+
+        with self.assertRaises(PrecioInvalido):
+            cotizar(cantidades, descuento=Decimal('30.00'))
+
+    def test_venta_simple_ignora_el_total_enviado_y_conserva_su_precio(self):
+        self.client.post(reverse('venta_create'), {
+            'id_medicamento': self.medicamento.pk, 'cantidad': 20, 'estado': 'Pagada',
+            'descuento': '1.00', 'impuesto': '0', 'total': '1.00',
+        })
+        venta = Venta.objects.get()
+        self.assertEqual(
+            (venta.precio_unitario, venta.descuento, venta.impuesto, venta.total),
+            (Decimal('2.50'), Decimal('6.00'), Decimal('5.28'), Decimal('49.28')),
+        )
+
+        # Cambiar la cantidad usa el precio con que se vendió, no el nuevo
+        Medicamento.objects.filter(pk=self.medicamento.pk).update(precio_unitario=Decimal('9.99'))
+        respuesta = self.client.get(reverse('venta_edit', args=[venta.pk]))
+        self.assertEqual(respuesta.context['descuento_manual'], Decimal('1.00'))
+        self.client.post(reverse('venta_edit', args=[venta.pk]), {
+            'id_medicamento': self.medicamento.pk, 'cantidad': 2, 'estado': 'Pagada', 'descuento': '0',
+        })
+        venta.refresh_from_db()
+        self.assertEqual((venta.precio_unitario, venta.total), (Decimal('2.50'), Decimal('5.60')))
+
+    def test_carrito_guarda_el_precio_de_cada_linea(self):
+        respuesta = self.client.post(reverse('venta_checkout'), json.dumps({
+            'lineas': [{'id_medicamento': self.medicamento.pk, 'cantidad': 10}],
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': '26.60'}],
+        }), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201)
+        linea = Factura.objects.get()
+        self.assertEqual(
+            (linea.precio_unitario, linea.subtotal, linea.total),
+            (Decimal('2.50'), Decimal('25.00'), Decimal('23.75')),
+        )
+        self.assertEqual(Venta.objects.get().impuesto, Decimal('2.85'))
+
+
+class VentaStockTests(VistaAutenticadaTestCase):
+
+    def test_editar_y_eliminar_ajustan_el_stock(self):
+        original = Medicamento.objects.create(nombre_generico='Ibuprofeno', cantidad=10, precio_unitario=Decimal('2.00'))
+        nuevo = Medicamento.objects.create(nombre_generico='Loratadina', cantidad=2, precio_unitario=Decimal('3.00'))
+        self.client.post(reverse('venta_create'), {
+            'id_medicamento': original.pk, 'cantidad': 4, 'estado': 'Pagada',
+        })
+        venta = Venta.objects.get()
+
+        # Sin stock suficiente en el nuevo medicamento no cambia nada
+        respuesta = self.client.post(reverse('venta_edit', args=[venta.pk]), {
+            'id_medicamento': nuevo.pk, 'cantidad': 3, 'estado': 'Pagada',
+        })
+        self.assertIn('Stock disponible: 2', respuesta.content.decode())
+        self.assertEqual(list(Medicamento.objects.order_by('pk').values_list('cantidad', flat=True)), [6, 2])
+
+        self.client.post(reverse('venta_edit', args=[venta.pk]), {
+            'id_medicamento': nuevo.pk, 'cantidad': 2, 'estado': 'Pagada',
+        })
+        self.assertEqual(list(Medicamento.objects.order_by('pk').values_list('cantidad', flat=True)), [10, 0])
+
+        # Eliminar dos veces solo devuelve el stock una vez
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        self.assertEqual(list(Medicamento.objects.order_by('pk').values_list('cantidad', flat=True)), [10, 2])
+
+
+class AsignacionLoteTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Amoxicilina', cantidad=100, precio_unitario=Decimal('1.00')
+        )
+
+    def _lote(self, numero, cantidad, dias):
+        return Lote.objects.create(
+            numero_lote=numero, cantidad=cantidad, id_medicamento=self.medicamento,
+            fecha_vencimiento=None if dias is None else self.hoy + timedelta(days=dias),
+        )
+
+    def _cantidades(self, *lotes):
+        return [Lote.objects.get(pk=lote.pk).cantidad for lote in lotes]
+
+    def test_primero_en_vencer_primero_en_salir(self):
+        sin_fecha = self._lote('SF', 10, None)
+        tardio = self._lote('L3', 10, 300)
+        vencido = self._lote('L0', 10, -1)
+        proximo = self._lote('L1', 4, 30)
+
+        self.client.post(reverse('venta_create'), {
+            'id_medicamento': self.medicamento.pk, 'cantidad': 20, 'estado': 'Pagada',
+        })
+        venta = Venta.objects.get()
+        self.assertEqual(self._cantidades(proximo, tardio, sin_fecha, vencido), [0, 0, 4, 10])
+        self.assertEqual(
+            list(venta.asignaciones_lote.order_by('pk').values_list('id_lote', 'cantidad')),
+            [(proximo.pk, 4), (tardio.pk, 10), (sin_fecha.pk, 6)],
+        )
+
+        # Sin existencias en lotes, lo que falta queda registrado sin lote
+        self.client.post(reverse('venta_edit', args=[venta.pk]), {
+            'id_medicamento': self.medicamento.pk, 'cantidad': 30, 'estado': 'Pagada',
+        })
+        self.assertEqual(self._cantidades(proximo, tardio, sin_fecha, vencido), [0, 0, 0, 10])
+        self.assertEqual(venta.asignaciones_lote.get(id_lote__isnull=True).cantidad, 6)
+
+        # Eliminar la venta devuelve las unidades a sus lotes
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        self.assertEqual(self._cantidades(proximo, tardio, sin_fecha, vencido), [4, 10, 10, 10])
+
+    def test_consultas_no_dependen_del_numero_de_lotes(self):
+        def cobrar():
+            return self.client.post(reverse('venta_checkout'), json.dumps({
+                'lineas': [{'id_medicamento': self.medicamento.pk, 'cantidad': 5}],
+                'pagos': [{'tipo_pago': 'Efectivo', 'monto': '5.00'}],
+            }), content_type='application/json')
+
+        self._lote('A', 10, 10)
+        cobrar()
+        with CaptureQueriesContext(connection) as pocos:
+            cobrar()
+
+        Lote.objects.bulk_create([
+            Lote(numero_lote=f'N{i}', cantidad=1, id_medicamento=self.medicamento,
+                 fecha_vencimiento=self.hoy + timedelta(days=i))
+            for i in range(1, 500)
+        ])
+        with CaptureQueriesContext(connection) as muchos:
+            self.assertEqual(cobrar().status_code, 201)
+        self.assertEqual(len(muchos), len(pocos))
+        self.assertEqual(
+            sorted(Lote.objects.filter(numero_lote__startswith='N', cantidad=0).values_list('numero_lote', flat=True)),
+            ['N1', 'N2', 'N3', 'N4', 'N5'],
+        )
+        self.assertEqual(
+            AsignacionLote.objects.filter(id_factura__isnull=False, id_lote__isnull=False).count(), 7
+        )
+
+
+class LoteListTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        self.ibuprofeno = Medicamento.objects.create(nombre_generico='Ibuprofeno', cantidad=0)
+        self.paracetamol = Medicamento.objects.create(nombre_generico='Paracetamol', cantidad=0)
+        # Dos sin fecha, uno vencido y cuatro por vencer (dos el mismo día)
+        dias = [None, 40, -3, 10, 10, 5, None]
+        Lote.objects.bulk_create([
+            Lote(
+                numero_lote=f'L-{i}', cantidad=1,
+                id_medicamento=self.ibuprofeno if i % 2 else self.paracetamol,
+                fecha_vencimiento=None if d is None else self.hoy + timedelta(days=d),
+            )
+            for i, d in enumerate(dias)
+        ])
+
+    def _numeros(self, pagina):
+        return [lote.numero_lote for lote in pagina]
+
+    @mock.patch.object(views, 'LOTES_POR_PAGINA', 3)
+    def test_paginacion_por_vencimiento_con_nulos_al_final(self):
+        url = reverse('lote_list')
+        vistos = []
+        parametros = {}
+        while True:
+            pagina = self.client.get(url, parametros).context['pagina']
+            vistos.extend(self._numeros(pagina))
+            if not pagina.tiene_siguiente:
+                break
+            parametros = {'despues': pagina.cursor_siguiente}
+
+        self.assertEqual(vistos, ['L-2', 'L-5', 'L-3', 'L-4', 'L-1', 'L-0', 'L-6'])
+
+        # Hacia atrás desde la última página (un lote sin fecha) cruzando a los que sí tienen
+        pagina = self.client.get(url, {'antes': pagina.cursor_anterior}).context['pagina']
+        self.assertEqual(self._numeros(pagina), ['L-4', 'L-1', 'L-0'])
+        pagina = self.client.get(url, {'antes': pagina.cursor_anterior}).context['pagina']
+        self.assertEqual(self._numeros(pagina), ['L-2', 'L-5', 'L-3'])
+        self.assertFalse(pagina.tiene_anterior)
+
+    def test_filtros_de_vencimiento_y_medicamento(self):
+        url = reverse('lote_list')
+        self.assertEqual(self._numeros(self.client.get(url, {'vencimiento': 'vencidos'}).context['pagina']), ['L-2'])
+        self.assertEqual(
+            self._numeros(self.client.get(url, {'vencimiento': 'por_vencer', 'dias': 10}).context['pagina']),
+            ['L-5', 'L-3', 'L-4'],
+        )
+        respuesta = self.client.get(url, {'medicamento': self.ibuprofeno.pk})
+        self.assertEqual(self._numeros(respuesta.context['pagina']), ['L-5', 'L-3', 'L-1'])
+        self.assertIn(f'medicamento={self.ibuprofeno.pk}', respuesta.context['filtros'])
+        # Un plazo enorme se limita en lugar de desbordar la fecha
+        respuesta = self.client.get(url, {'vencimiento': 'por_vencer', 'dias': 100000000})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['dias'], MAXIMO_DIAS_POR_VENCER)
+
+    def test_consultas_no_dependen_del_numero_de_lotes(self):
+        url = reverse('lote_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as pocos:
+            self.client.get(url)
+        Lote.objects.bulk_create([
+            Lote(numero_lote=f'M-{i}', cantidad=1, id_medicamento=self.ibuprofeno) for i in range(20)
+        ])
+        with CaptureQueriesContext(connection) as muchos:
+            self.client.get(url)
+        self.assertEqual(len(muchos), len(pocos))
+
+
+class EstadoLotesTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = date(2025, 6, 1)
+        self.medicamento = Medicamento.objects.create(nombre_generico='Amoxicilina', cantidad=0)
+        self.lotes = {
+            nombre: Lote.objects.create(
+                numero_lote=nombre, cantidad=10, id_medicamento=self.medicamento,
+                fecha_vencimiento=fecha, estado=estado,
+            )
+            for nombre, fecha, estado in [
+                ('vencido', self.hoy - timedelta(days=1), 'Activo'),
+                ('vence-hoy', self.hoy, None),
+                ('por-vencer', self.hoy + timedelta(days=30), 'Activo'),
+                ('activo', self.hoy + timedelta(days=31), 'Por Vencer'),
+                ('sin-fecha', None, 'DESCONOCIDO'),
+                ('inactivo', self.hoy - timedelta(days=100), 'Inactivo'),
+                ('al-dia', self.hoy - timedelta(days=5), 'Vencido'),
+            ]
+        }
+
+    def _estados(self):
+        return dict(Lote.objects.values_list('numero_lote', 'estado'))
+
+    def test_reclasifica_solo_lo_que_cambia(self):
+        cambios = actualizar_estado_lotes(hoy=self.hoy, dias_por_vencer=30)
+        self.assertEqual(cambios, {'Vencido': 1, 'Por Vencer': 2, 'Activo': 2})
+        self.assertEqual(self._estados(), {
+            'vencido': 'Vencido', 'vence-hoy': 'Por Vencer', 'por-vencer': 'Por Vencer',
+            'activo': 'Activo', 'sin-fecha': 'Activo', 'inactivo': 'Inactivo', 'al-dia': 'Vencido',
+        })
+        # Una segunda ejecución no reescribe nada
+        self.assertEqual(
+            actualizar_estado_lotes(hoy=self.hoy, dias_por_vencer=30),
+            {'Vencido': 0, 'Por Vencer': 0, 'Activo': 0},
+        )
+
+    @override_settings(FARMACIA_LOTES={'DIAS_POR_VENCER': 60})
+    def test_ventana_configurable(self):
+        call_command('actualizar_estado_lotes', stdout=io.StringIO())
+        lote = Lote.objects.create(
+            numero_lote='L-60', cantidad=1, fecha_vencimiento=timezone.localdate() + timedelta(days=45)
+        )
+        actualizar_estado_lotes()
+        lote.refresh_from_db()
+        self.assertEqual(lote.estado, 'Por Vencer')
+        # Sin INTERVALO_MINUTOS no se arranca ningún hilo
+        self.assertIsNone(iniciar_programador())
+
+    def test_comando_rechaza_dias_fuera_de_rango(self):
+        with self.assertRaises(CommandError):
+            call_command('actualizar_estado_lotes', '--dias', '100000000', stdout=io.StringIO())
+
+    def test_formulario_asigna_el_estado(self):
+        respuesta = self.client.post(reverse('lote_create'), {
+            'numero_lote': 'L-NUEVO', 'cantidad': 5, 'estado': 'Activo',
+            'fecha_vencimiento': (timezone.localdate() - timedelta(days=1)).isoformat(),
+            'id_medicamento': self.medicamento.pk,
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(Lote.objects.get(numero_lote='L-NUEVO').estado, 'Vencido')
+
+
+class PronosticoVencimientoTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.hoy = timezone.localdate()
+        self.rapido = Medicamento.objects.create(nombre_generico='Rápido', precio_unitario=Decimal('2.00'))
+        self.lento = Medicamento.objects.create(nombre_generico='Lento', precio_unitario=Decimal('1.00'))
+        # 60 unidades en los últimos 30 días: 2 por día
+        VentaDiaria.objects.bulk_create([
+            VentaDiaria(fecha=self.hoy - timedelta(days=dias), id_medicamento=self.rapido.pk, unidades=20)
+            for dias in (1, 10, 30)
+        ] + [VentaDiaria(fecha=self.hoy - timedelta(days=31), id_medicamento=self.lento.pk, unidades=500)])
+        for medicamento, numero, vence, cantidad in [
+            (self.rapido, 'R-vencido', -1, 7),
+            (self.rapido, 'R-1', 4, 20),
+            (self.rapido, 'R-2', 9, 5),
+            (self.rapido, 'R-3', 19, 30),
+            (self.rapido, 'R-agotado', 2, 0),
+            (self.rapido, 'R-sin-fecha', None, 50),
+            (self.lento, 'L-1', 100, 3),
+        ]:
+            Lote.objects.create(
+                id_medicamento=medicamento, numero_lote=numero, cantidad=cantidad,
+                fecha_vencimiento=None if vence is None else self.hoy + timedelta(days=vence),
+            )
+
+    def _sin_vender(self, **kwargs):
+        return {lote.numero_lote: lote.sin_vender for lote in pronostico.pronosticar_perdidas(self.hoy, **kwargs)}
+
+    def test_reparte_la_demanda_en_orden_fefo(self):
+        # R-1 vende 10 de 20 en 5 días; R-2 se agota; R-3 recibe la demanda hasta el día 20
+        self.assertEqual(self._sin_vender(), {'R-vencido': 7, 'R-1': 10, 'R-3': 5, 'L-1': 3})
+        lote = next(l for l in pronostico.pronosticar_perdidas(self.hoy) if l.numero_lote == 'R-1')
+        self.assertEqual((lote.dias, lote.velocidad, lote.vendidas, lote.perdida), (4, 2.0, 10, Decimal('20.00')))
+        self.assertEqual(self._sin_vender(id_medicamento=self.lento.pk), {'L-1': 3})
+        # La venta de hace 31 días solo entra con una ventana más larga
+        self.assertNotIn('L-1', self._sin_vender(ventana_dias=31))
+
+    @skipUnless(pronostico.np, 'NumPy no está instalado')
+    def test_numpy_y_python_coinciden(self):
+        with mock.patch.object(pronostico, 'np', None):
+            sin_numpy = pronostico.pronosticar_perdidas(self.hoy, solo_en_riesgo=False)
+        self.assertEqual(pronostico.pronosticar_perdidas(self.hoy, solo_en_riesgo=False), sin_numpy)
+
+    def test_reporte_y_exportacion(self):
+        respuesta = self.client.get(reverse('lote_pronostico'))
+        self.assertEqual([l.numero_lote for l in respuesta.context['lotes']], ['R-1', 'R-vencido', 'R-3', 'L-1'])
+        self.assertEqual(respuesta.context['total_unidades'], 25)
+        self.assertEqual(respuesta.context['total_perdida'], Decimal('47.00'))
+
+        respuesta = self.client.get(reverse('lote_pronostico_export', args=['csv']), {'medicamento': self.lento.pk})
+        filas = b''.join(respuesta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(filas), 2)
+        self.assertIn('L-1,Lento', filas[1])
+
+
+class RecepcionCompraTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.proveedor = Proveedor.objects.create(nombre_contacto='Droguería Central')
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico=f'Med {i:03d}', cantidad=5, precio_unitario=Decimal('2.00'), stock_minimo=10)
+            for i in range(100)
+        ])
+        recalcular_inventario()
+        sincronizar_alertas()
+        self.ids = list(Medicamento.objects.order_by('pk').values_list('pk', flat=True))
+
+    def _recibir(self, lineas, **datos):
+        return self.client.post(
+            reverse('facturacompra_recepcion'),
+            json.dumps({'id_proveedor': self.proveedor.pk, 'lineas': lineas, **datos}),
+            content_type='application/json',
+        )
+
+    def test_factura_con_lotes_y_stock(self):
+        vence = timezone.localdate() + timedelta(days=365)
+        respuesta = self._recibir([
+            {'id_medicamento': self.ids[0], 'cantidad': 20, 'precio_unitario': '1.10',
+             'numero_lote': 'A-1', 'fecha_vencimiento': vence.isoformat()},
+            {'id_medicamento': self.ids[0], 'cantidad': 5, 'precio_unitario': '1.10', 'numero_lote': 'A-2'},
+            {'id_medicamento': self.ids[1], 'cantidad': 3, 'precio_unitario': '4.00',
+             'fecha_vencimiento': (timezone.localdate() + timedelta(days=10)).isoformat()},
+        ], numero_factura='FC-100', impuesto='1.50')
+        self.assertEqual(respuesta.status_code, 201)
+        factura = FacturaCompra.objects.get(pk=respuesta.json()['id_factura_compra'])
+        self.assertEqual(factura.total, Decimal('41.00'))
+        self.assertEqual(factura.numero_factura, 'FC-100')
+        self.assertEqual(
+            sorted(Lote.objects.filter(id_factura_compra=factura).values_list('numero_lote', 'cantidad', 'estado')),
+            [('A-1', 20, 'Activo'), ('A-2', 5, 'Activo'), (f'SIN-LOTE-{factura.pk}-3', 3, 'Por Vencer')],
+        )
+        self.assertEqual(LoteMedicamento.objects.filter(id_lote__id_factura_compra=factura).count(), 3)
+        self.assertEqual(CompraMedicamento.objects.filter(id_factura_compra=factura).count(), 3)
+        self.assertEqual(Medicamento.objects.get(pk=self.ids[0]).cantidad, 30)
+        self.assertEqual(Medicamento.objects.get(pk=self.ids[1]).cantidad, 8)
+        # El resumen de inventario y las alertas siguen el UPDATE masivo
+        self.assertEqual(InventarioResumen.objects.get().valor_inventario, Decimal('1056.00'))
+        self.assertFalse(AlertaStock.objects.filter(id_medicamento=self.ids[0], fecha_cierre__isnull=True).exists())
+
+    def test_consultas_no_dependen_del_numero_de_lineas(self):
+        def lineas(ids, entrega):
+            return [
+                {'id_medicamento': pk, 'cantidad': 10, 'precio_unitario': '1.00', 'numero_lote': f'L-{entrega}-{pk}'}
+                for pk in ids
+            ]
+        # La primera recepción cierra las alertas de stock bajo; las siguientes no
+        self._recibir(lineas(self.ids, 1))
+        with CaptureQueriesContext(connection) as dos_lineas:
+            self._recibir(lineas(self.ids[:2], 2))
+        with CaptureQueriesContext(connection) as cien_lineas:
+            self._recibir(lineas(self.ids, 3))
+        self.assertEqual(len(cien_lineas), len(dos_lineas))
+        self.assertEqual(Lote.objects.count(), 202)
+
+    def test_linea_invalida_no_registra_nada(self):
+        respuesta = self._recibir([
+            {'id_medicamento': self.ids[0], 'cantidad': 10, 'precio_unitario': '1.00'},
+            {'id_medicamento': 999999, 'cantidad': 1, 'precio_unitario': '1.00'},
+        ])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('999999', respuesta.json()['error'])
+        respuesta = self._recibir([{'id_medicamento': self.ids[0], 'cantidad': 0, 'precio_unitario': '1.00'}])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(FacturaCompra.objects.count(), 0)
+        self.assertEqual(Lote.objects.count(), 0)
+        self.assertEqual(Medicamento.objects.get(pk=self.ids[0]).cantidad, 5)
+
+    def test_numero_de_lote_repetido(self):
+        linea = {'id_medicamento': self.ids[0], 'cantidad': 10, 'precio_unitario': '1.00', 'numero_lote': 'A-1'}
+        respuesta = self._recibir([linea, linea])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('repetido', respuesta.json()['error'])
+
+        self.assertEqual(self._recibir([linea]).status_code, 201)
+        respuesta = self._recibir([linea], numero_factura='FC-2')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['error'], 'Ya existe un lote con este número de lote.')
+        self.assertEqual(FacturaCompra.objects.count(), 1)
+        self.assertEqual(Medicamento.objects.get(pk=self.ids[0]).cantidad, 15)
+
+
+class RestriccionesUnicasTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.proveedor = Proveedor.objects.create(nombre_contacto='Droguería Central', ruc='J-1', correo='a@b.com')
+
+    def test_validar_no_consulta_la_base(self):
+        formulario = ProveedorForm({'nombre_contacto': 'Otro', 'estado': 1, 'ruc': 'J-1', 'correo': 'c@d.com'})
+        with self.assertNumQueries(0):
+            self.assertTrue(formulario.is_valid())
+        # La restricción rechaza el RUC al guardar, con el mensaje de siempre
+        self.assertIsNone(formulario.save())
+        self.assertEqual(formulario.errors['ruc'], ['Ya existe un proveedor con este RUC.'])
+        self.assertEqual(Proveedor.objects.count(), 1)
+
+    def test_vista_muestra_el_error(self):
+        datos = {'nombre_contacto': 'Otro', 'estado': 1, 'correo': 'a@b.com'}
+        respuesta = self.client.post(reverse('proveedor_create'), datos)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['form'].errors['correo'], ['Ya existe un proveedor con este correo electrónico.'])
+
+        # Editar el propio registro sin cambiar sus datos únicos no choca
+        datos.update(nombre_contacto='Droguería Norte', ruc='J-1')
+        respuesta = self.client.post(reverse('proveedor_edit', args=[self.proveedor.pk]), datos)
+        self.assertRedirects(respuesta, reverse('proveedor_list'))
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.nombre_contacto, 'Droguería Norte')
+
+    def test_restriccion_de_varios_campos_es_error_general(self):
+        medicamento = Medicamento.objects.create(nombre_generico='Ibuprofeno')
+        lote = Lote.objects.create(numero_lote='L-1', cantidad=10, id_medicamento=medicamento)
+        LoteMedicamento.objects.create(id_lote=lote, id_medicamento=medicamento, cantidad=10)
+
+        formulario = LoteMedicamentoForm({'id_lote': lote.pk, 'id_medicamento': medicamento.pk, 'cantidad': 5})
+        self.assertTrue(formulario.is_valid())
+        self.assertIsNone(formulario.save())
+        self.assertEqual(formulario.non_field_errors(), ['Este medicamento ya está asignado a este lote.'])
+
+
+class ReconciliacionStockTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        proveedor = Proveedor.objects.create(nombre_contacto='Droguería Central')
+        self.medicamentos = Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico=f'Med {i}', cantidad=0, precio_unitario=Decimal('1.00'))
+            for i in range(3)
+        ])
+        # Sin lotes: su stock no se compara con nada
+        Medicamento.objects.create(nombre_generico='Sin lotes', cantidad=50)
+        self.client.post(reverse('facturacompra_recepcion'), json.dumps({
+            'id_proveedor': proveedor.pk,
+            'lineas': [
+                {'id_medicamento': m.pk, 'cantidad': 10, 'precio_unitario': '1.00', 'numero_lote': f'L-{n}-{i}'}
+                for i, m in enumerate(self.medicamentos) for n in range(2)
+            ],
+        }), content_type='application/json')
+        self.client.post(reverse('venta_checkout'), json.dumps({
+            'lineas': [{'id_medicamento': self.medicamentos[0].pk, 'cantidad': 15}],
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': '15.00'}],
+        }), content_type='application/json')
+
+    def _desviar(self):
+        # Un lote editado a mano y un stock que no sigue a sus lotes
+        lote = Lote.objects.get(numero_lote='L-1-1')
+        Lote.objects.filter(pk=lote.pk).update(cantidad=4)
+        Medicamento.objects.filter(pk=self.medicamentos[2].pk).update(cantidad=7)
+        return lote
+
+    def test_datos_consistentes_no_tienen_diferencias(self):
+        self.assertEqual(Medicamento.objects.get(pk=self.medicamentos[0].pk).cantidad, 5)
+        self.assertEqual(list(diferencias('lotes')), [])
+        self.assertEqual(list(diferencias('medicamentos')), [])
+
+    def test_lote_con_mas_asignado_que_ingresado_espera_cero(self):
+        # El lote agotado por la venta: 10 asignadas, ahora solo 8 ingresadas
+        agotado = AsignacionLote.objects.get(cantidad=10).id_lote
+        LoteMedicamento.objects.filter(id_lote=agotado).update(cantidad=8)
+        self.assertEqual(list(diferencias('lotes')), [])
+
+        Lote.objects.filter(pk=agotado.pk).update(cantidad=3)
+        self.assertEqual([d['esperado'] for d in diferencias('lotes')], [0])
+        self.assertEqual(corregir(['lotes']), {'lotes': 1})
+        self.assertEqual(list(diferencias('lotes')), [])
+
+    def test_detecta_y_corrige(self):
+        lote = self._desviar()
+        self.assertEqual(list(diferencias('lotes')), [{
+            'id_lote': lote.pk, 'numero_lote': 'L-1-1', 'id_medicamento': self.medicamentos[1].pk,
+            'cantidad': 4, 'esperado': 10,
+        }])
+        self.assertEqual(
+            [(d['id_medicamento'], d['cantidad'], d['esperado']) for d in diferencias('medicamentos')],
+            [(self.medicamentos[1].pk, 20, 14), (self.medicamentos[2].pk, 7, 20)],
+        )
+
+        # Sin confirmar, el stock de Med 2 (quizá con unidades sin lote) no se toca
+        self.assertEqual(corregir(['medicamentos']), {'medicamentos': 0})
+        self.assertEqual(Medicamento.objects.get(pk=self.medicamentos[2].pk).cantidad, 7)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(corregir(medicamentos=[self.medicamentos[2].pk]), {'lotes': 1, 'medicamentos': 1})
+        # Los medicamentos se corrigen después de sus lotes
+        self.assertEqual(
+            list(Medicamento.objects.filter(pk__in=[m.pk for m in self.medicamentos])
+                 .order_by('pk').values_list('cantidad', flat=True)),
+            [5, 20, 20],
+        )
+        self.assertEqual(Medicamento.objects.get(nombre_generico='Sin lotes').cantidad, 50)
+        self.assertEqual(InventarioResumen.objects.get().valor_inventario, Decimal('45.00'))
+        self.assertEqual(list(diferencias('lotes')), [])
+        self.assertLess(len(consultas), 20)
+
+    def test_comando_y_reporte_admin(self):
+        self._desviar()
+        salida = io.StringIO()
+        call_command('reconciliar_stock', '--relacion', 'medicamentos', stdout=salida)
+        self.assertIn(f'Medicamento {self.medicamentos[2].pk} (Med 2): 7 -> 20', salida.getvalue())
+        self.assertIn('medicamentos: 2 diferencias', salida.getvalue())
+        salida = io.StringIO()
+        call_command('reconciliar_stock', '--corregir', '--medicamento', str(self.medicamentos[1].pk), stdout=salida)
+        self.assertIn('lotes: 1, medicamentos: 0.', salida.getvalue())
+
+        administrador = get_user_model().objects.create_superuser(
+            username='super', password='clave-segura-123', rol='administrador'
+        )
+        self.client.force_login(administrador)
+        url = reverse('admin:farmacia_app_medicamento_reconciliacion')
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, f'name="medicamento" value="{self.medicamentos[2].pk}"')
+        self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertEqual(len(list(diferencias('medicamentos'))), 1)
+        self.client.post(url, {'medicamento': [self.medicamentos[2].pk]})
+        self.assertEqual(list(diferencias('medicamentos')), [])
+        self.assertContains(self.client.get(url), 'Sin diferencias.', count=2)
+
+
+class VentaCarritoTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Medicamento.objects.bulk_create([
+            Medicamento(nombre_generico=f'Med {i:02d}', cantidad=10, precio_unitario=Decimal('1.50'))
+            for i in range(20)
+        ])
+        recalcular_inventario()
+        self.ids = list(Medicamento.objects.order_by('pk').values_list('pk', flat=True))
+
+    def _cobrar(self, lineas, pagos=None):
+        total = sum(Decimal('1.50') * linea['cantidad'] for linea in lineas)
+        return self.client.post(
+            reverse('venta_checkout'),
+            json.dumps({
+                'lineas': lineas,
+                'pagos': pagos or [
+                    {'tipo_pago': 'Efectivo', 'monto': str(total - 1)},
+                    {'tipo_pago': 'Tarjeta', 'monto': '1.00', 'referencia_pago': 'AUT-1'},
+                ],
+            }),
+            content_type='application/json',
+        )
+
+    def test_una_venta_con_lineas_y_pagos(self):
+        respuesta = self._cobrar([
+            {'id_medicamento': self.ids[0], 'cantidad': 2},
+            {'id_medicamento': self.ids[1], 'cantidad': 3},
+            {'id_medicamento': self.ids[0], 'cantidad': 1},
+        ])
+        self.assertEqual(respuesta.status_code, 201)
+        venta = Venta.objects.get(pk=respuesta.json()['id_venta'])
+        self.assertEqual(venta.total, Decimal('9.00'))
+        self.assertEqual(
+            sorted(Factura.objects.filter(id_venta=venta).values_list('id_medicamento', 'cantidad')),
+            [(self.ids[0], 3), (self.ids[1], 3)],
+        )
+        self.assertEqual(MetodoPago.objects.filter(id_venta=venta).count(), 2)
+        self.assertEqual(Medicamento.objects.get(pk=self.ids[0]).cantidad, 7)
+        self.assertEqual(InventarioResumen.objects.get().valor_inventario, Decimal('291.00'))
+
+        # Eliminar la venta devuelve el stock de todas las líneas
+        self.client.get(reverse('venta_delete', args=[venta.pk]))
+        self.assertEqual(Medicamento.objects.get(pk=self.ids[0]).cantidad, 10)
+        self.assertEqual(Factura.objects.count(), 0)
+
+    def test_consultas_no_dependen_del_numero_de_lineas(self):
+        # Una primera venta crea las filas del acumulado diario; las siguientes las actualizan
+        self._cobrar([{'id_medicamento': pk, 'cantidad': 1} for pk in self.ids])
+        with CaptureQueriesContext(connection) as dos_lineas:
+            self._cobrar([{'id_medicamento': pk, 'cantidad': 1} for pk in self.ids[:2]])
+        with CaptureQueriesContext(connection) as veinte_lineas:
+            self._cobrar([{'id_medicamento': pk, 'cantidad': 1} for pk in self.ids])
+        self.assertEqual(len(veinte_lineas), len(dos_lineas))
+
+    def test_sin_stock_no_descuenta_nada(self):
+        respuesta = self._cobrar([
+            {'id_medicamento': self.ids[0], 'cantidad': 2},
+            {'id_medicamento': self.ids[1], 'cantidad': 11},
+        ])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('Stock disponible: 10', respuesta.json()['error'])
+        self.assertEqual(Venta.objects.count(), 0)
+        self.assertEqual(set(Medicamento.objects.values_list('cantidad', flat=True)), {10})
+
+    def test_pagos_deben_cubrir_el_total(self):
+        respuesta = self._cobrar(
+            [{'id_medicamento': self.ids[0], 'cantidad': 2}],
+            pagos=[{'tipo_pago': 'Efectivo', 'monto': '2.00'}],
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Venta.objects.count(), 0)
+
+    def test_lineas_y_pagos_mal_formados(self):
+        linea = {'id_medicamento': self.ids[0], 'cantidad': 1}
+        pago = {'tipo_pago': 'Efectivo', 'monto': '1.50'}
+        for lineas, pagos, error in [
+            (5, [pago], 'Las líneas deben ser una lista'),
+            ([linea, 5], [pago], 'Línea 2 mal formada'),
+            ([linea], 'Efectivo', 'Los pagos deben ser una lista'),
+            ([linea], [None], 'Pago 1 mal formado'),
+        ]:
+            respuesta = self.client.post(
+                reverse('venta_checkout'), json.dumps({'lineas': lineas, 'pagos': pagos}),
+                content_type='application/json',
+            )
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertEqual(respuesta.json()['error'], error)
+
+
+class PosAsincronoTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.usuario)
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Ibuprofeno', cantidad=10, precio_unitario=Decimal('1.50')
+        )
+
+    async def test_stock_de_un_medicamento(self):
+        respuesta = await self.async_client.get(reverse('medicamento_stock', args=[self.medicamento.pk]))
+        self.assertEqual(respuesta.json()['cantidad'], 10)
+        respuesta = await self.async_client.get(reverse('medicamento_stock', args=[999]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_sugerencias_con_stock(self):
+        respuesta = await self.async_client.get(reverse('medicamento_sugerencias_pos'), {'q': 'ibu'})
+        self.assertEqual(
+            [(s['id'], s['cantidad']) for s in respuesta.json()['resultados']],
+            [(self.medicamento.pk, 10)],
+        )
+
+    async def test_cobro_descuenta_el_stock(self):
+        datos = {
+            'lineas': [{'id_medicamento': self.medicamento.pk, 'cantidad': 2}],
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': '3.00'}],
+        }
+        respuesta = await self.async_client.post(
+            reverse('venta_checkout_pos'), json.dumps(datos), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        venta = await Venta.objects.aget(pk=respuesta.json()['id_venta'])
+        self.assertEqual(venta.total, Decimal('3.00'))
+        self.assertEqual(await AsignacionLote.objects.filter(id_venta=venta).acount(), 1)
+        self.assertEqual((await Medicamento.objects.aget(pk=self.medicamento.pk)).cantidad, 8)
+
+        datos['lineas'][0]['cantidad'] = 9
+        datos['pagos'][0]['monto'] = '13.50'
+        respuesta = await self.async_client.post(
+            reverse('venta_checkout_pos'), json.dumps(datos), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('Stock disponible: 8', respuesta.json()['error'])
+
+
+class SincronizacionVentasTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Paracetamol', cantidad=5, precio_unitario=Decimal('2.00')
+        )
+
+    def _venta(self, cantidad, **extra):
+        return {
+            'uuid': str(uuid.uuid4()),
+            'fecha': timezone.localdate().isoformat(),
+            'lineas': [{'id_medicamento': self.medicamento.pk, 'cantidad': cantidad}],
+            'pagos': [{'tipo_pago': 'Efectivo', 'monto': str(2 * cantidad)}],
+            **extra,
+        }
+
+    def _sincronizar(self, ventas):
+        respuesta = self.client.post(
+            reverse('venta_sincronizar'), json.dumps({'ventas': ventas}), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        return [r['estado'] for r in respuesta.json()['resultados']]
+
+    def test_lote_con_resultado_por_venta_y_reenvio_sin_efecto(self):
+        primera = self._venta(3)
+        lote = [
+            primera,
+            self._venta(3),                    # ya no alcanza el stock
+            dict(primera),                     # UUID repetido en el mismo lote
+            self._venta(1, id_cliente=999),    # cliente inexistente
+            self._venta(2),
+        ]
+        self.assertEqual(
+            self._sincronizar(lote),
+            ['aplicada', 'rechazada', 'duplicada', 'rechazada', 'aplicada'],
+        )
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.cantidad, 0)
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(Factura.objects.count(), 2)
+
+        # Reenviar el mismo lote no aplica nada nuevo
+        self.assertEqual(
+            self._sincronizar(lote),
+            ['duplicada', 'rechazada', 'duplicada', 'rechazada', 'duplicada'],
+        )
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(InventarioResumen.objects.get().total_agotados, 1)
+
+    def test_venta_mal_formada_se_rechaza_sola(self):
+        self.assertEqual(
+            self._sincronizar([self._venta(1, lineas=5), self._venta(1, pagos=[3]), self._venta(1)]),
+            ['rechazada', 'rechazada', 'aplicada'],
+        )
+
+    def test_consultas_no_dependen_del_tamano_del_lote(self):
+        self.medicamento.cantidad = 1000
+        self.medicamento.save()
+        with CaptureQueriesContext(connection) as pequeno:
+            self._sincronizar([self._venta(1) for _ in range(2)])
+        # 50 ventas caben en un solo INSERT por tabla (límite de parámetros de SQLite)
+        with CaptureQueriesContext(connection) as grande:
+            self._sincronizar([self._venta(1) for _ in range(50)])
+        self.assertEqual(len(grande), len(pequeno))
+
+
+class IdempotenciaTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.medicamento = Medicamento.objects.create(nombre_generico='Ibuprofeno', cantidad=10, precio_unitario=Decimal('2.00'))
+
+    def test_doble_envio_crea_una_sola_venta(self):
+        formulario = self.client.get(reverse('venta_create'))
+        clave = formulario.context['clave_idempotencia']
+        self.assertContains(formulario, f'name="clave_idempotencia" value="{clave}"')
+
+        datos = {
+            'id_medicamento': self.medicamento.pk, 'cantidad': 2, 'estado': 'Pagada',
+            'clave_idempotencia': str(clave),
+        }
+        primera = self.client.post(reverse('venta_create'), datos)
+        # El reenvío solo carga la sesión y el usuario
+        with self.assertNumQueries(2):
+            segunda = self.client.post(reverse('venta_create'), datos)
+
+        self.assertRedirects(primera, reverse('venta_list'), fetch_redirect_response=False)
+        self.assertEqual(segunda.url, primera.url)
+        self.assertEqual(Venta.objects.count(), 1)
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.cantidad, 8)
+
+    def test_errores_liberan_la_clave(self):
+        datos = {
+            'id_medicamento': self.medicamento.pk, 'cantidad': 50, 'estado': 'Pagada',
+            'clave_idempotencia': 'a' * 32,
+        }
+        self.assertEqual(self.client.post(reverse('venta_create'), datos).status_code, 200)
+        datos['cantidad'] = 1
+        self.assertEqual(self.client.post(reverse('venta_create'), datos).status_code, 302)
+        self.assertEqual(Venta.objects.count(), 1)
+
+
+class OpcionesCacheadasTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cliente = Cliente.objects.create(nombre='Ana', cedula='1')
+        self.empleado = Empleados.objects.create(nombre='Luis', rol='Cajero')
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Ibuprofeno', cantidad=10, precio_unitario=Decimal('2.00')
+        )
+
+    def test_segunda_carga_no_lee_las_listas(self):
+        self.client.get(reverse('venta_create'))
+        # Sesión, usuario y nada más: clientes y empleados salen de la caché
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(reverse('venta_create'))
+        self.assertContains(respuesta, 'Ana - 1')
+
+    def test_guardar_invalida_la_lista(self):
+        self.assertEqual([c['nombre'] for c in opciones('clientes')], ['Ana'])
+        Cliente.objects.create(nombre='Beto', cedula='2')
+        self.assertEqual([c['nombre'] for c in opciones('clientes')], ['Ana', 'Beto'])
+        self.cliente.delete()
+        self.assertEqual([c['nombre'] for c in opciones('clientes')], ['Beto'])
+
+    def test_formulario_valida_contra_la_lista(self):
+        datos = {
+            'id_cliente': self.cliente.pk, 'id_empleado': self.empleado.pk,
+            'id_medicamento': self.medicamento.pk, 'cantidad': 1, 'estado': 'Pagada',
+        }
+        self.assertTrue(VentaForm(datos).is_valid())
+        # Con las listas en caché la validación no consulta las llaves foráneas
+        with self.assertNumQueries(0):
+            self.assertTrue(VentaForm(datos).is_valid())
+        datos['id_cliente'] = 999
+        formulario = VentaForm(datos)
+        self.assertFalse(formulario.is_valid())
+        self.assertIn('id_cliente', formulario.errors)
+
+    def test_instancia_trae_las_columnas_de_la_lista(self):
+        datos = {'id_medicamento': self.medicamento.pk, 'cantidad': 1, 'estado': 'Pagada'}
+        VentaForm(datos).is_valid()
+        with self.assertNumQueries(0):
+            formulario = VentaForm(datos)
+            formulario.is_valid()
+            self.assertEqual(formulario.cleaned_data['id_medicamento'].nombre_generico, 'Ibuprofeno')
+        # Una columna fuera de la lista se lee al usarla
+        self.assertEqual(formulario.cleaned_data['id_medicamento'].cantidad, 10)
+
+        # Un lote que no se guarda vuelve a mostrar el medicamento elegido
+        Lote.objects.create(numero_lote='L-2', cantidad=1)
+        lote = Lote.objects.create(numero_lote='L-1', cantidad=1)
+        respuesta = self.client.post(reverse('lote_edit', args=[lote.pk]), {
+            'numero_lote': 'L-2', 'cantidad': 1, 'id_medicamento': self.medicamento.pk,
+        })
+        self.assertContains(respuesta, 'Medicamento: Ibuprofeno')
+
+
+class VentaStockConcurrenteTests(TransactionTestCase):
+    """
+    Varios terminales vendiendo el mismo producto a la vez
+    """
+
+    STOCK_INICIAL = 20
+    TERMINALES = 8
+    VENTAS_POR_TERMINAL = 5
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(
+            username='cajero', password='clave-segura-123', rol='administrador'
+        )
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Paracetamol', cantidad=self.STOCK_INICIAL, stock_minimo=5, precio_unitario=Decimal('1.00')
+        )
+        # La fila del resumen la crea una migración; otra TransactionTestCase pudo vaciar la tabla
+        recalcular_inventario()
+
+    def _terminal(self, barrera, errores):
+        cliente = self.client_class()
+        cliente.force_login(self.usuario)
+        barrera.wait()
+        try:
+            for _ in range(self.VENTAS_POR_TERMINAL):
+                cliente.post(reverse('venta_create'), {
+                    'id_medicamento': self.medicamento.pk, 'cantidad': 1, 'estado': 'Pagada',
+                })
+        except Exception as e:  # se reporta en el hilo principal
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_no_sobrevende_ni_pierde_unidades(self):
+        barrera = threading.Barrier(self.TERMINALES)
+        errores = []
+        hilos = [
+            threading.Thread(target=self._terminal, args=(barrera, errores))
+            for _ in range(self.TERMINALES)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.medicamento.refresh_from_db()
+        vendidas = Venta.objects.filter(id_medicamento=self.medicamento).count()
+        # 40 intentos sobre 20 unidades: se venden exactamente 20 y el resto se rechaza
+        self.assertEqual(vendidas, self.STOCK_INICIAL)
+        self.assertEqual(self.medicamento.cantidad, 0)
+        self.assertEqual(InventarioResumen.objects.get().total_agotados, 1)
+
+
+class BenchmarkIndicesTests(TransactionTestCase):
+    """
+    El comando sobre la base de pruebas ya creada (quita y vuelve a crear los índices)
+    """
+
+    def test_compara_con_y_sin_indices(self):
+        salida = io.StringIO()
+        with mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'):
+            call_command('benchmark_indices', '--filas', '200', '--repeticiones', '1', stdout=salida)
+        self.assertIn('Resumen', salida.getvalue())
+        self.assertIn('Lote por número', salida.getvalue())
+        # Las restricciones quedan como estaban
+        with self.assertRaises(IntegrityError):
+            Lote.objects.create(numero_lote='L-0', cantidad=1)
+
+
+class ExportacionTests(VistaAutenticadaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.medicamento = Medicamento.objects.create(
+            nombre_generico='Ungüento', cantidad=4, precio_unitario=Decimal('2.50')
+        )
+        Venta.objects.create(id_medicamento=self.medicamento, cantidad=1, estado='Pagada')
+
+    def test_csv_de_ventas_en_streaming(self):
+        respuesta = self.client.get(reverse('venta_export', args=['csv']))
+        self.assertTrue(respuesta.streaming)
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        lineas = contenido.splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertIn('Ungüento', lineas[1])
+
+    def test_xlsx_de_stock_es_un_libro_valido(self):
+        respuesta = self.client.get(reverse('medicamento_stock_export', args=['xlsx']))
+        archivo = zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content)))
+        hoja = archivo.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('Ungüento', hoja)
+        # Precio unitario y valor (cantidad * precio) como celdas numéricas
+        self.assertIn('<c><v>2.50</v></c><c><v>10</v></c></row>', hoja)
+
+    def test_formato_desconocido(self):
+        respuesta = self.client.get(reverse('lote_export', args=['pdf']))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class ImportacionMedicamentosTests(TestCase):
+
+    def test_importa_actualiza_y_rechaza(self):
+        existente = Medicamento.objects.create(
+            nombre_generico='Viejo', registro_sanitario='RS-1', cantidad=3, stock_minimo=7
+        )
+        contenido = (
+            'nombre_generico,registro_sanitario,cantidad,precio_unitario\n'
+            'Nuevo nombre,RS-1,10,1.50\n'
+            'Amoxicilina,RS-2,5,3.00\n'
+            'Repetido,RS-2,1,1.00\n'
+            ',RS-3,1,1.00\n'
+            'Sin registro,,abc,1.00\n'
+            'Loratadina,,2,0.75\n'
+        )
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        self.addCleanup(os.remove, archivo.name)
+
+        salida = io.StringIO()
+        call_command('importar_medicamentos', archivo.name, '--tamano-lote', '2', stdout=salida)
+
+        self.assertIn('Creados: 2, actualizados: 1, rechazados: 3', salida.getvalue())
+        existente.refresh_from_db()
+        self.assertEqual(existente.nombre_generico, 'Nuevo nombre')
+        self.assertEqual(existente.cantidad, 10)
+        # Las columnas que el archivo no trae no se tocan
+        self.assertEqual(existente.stock_minimo, 7)
+        self.assertEqual(InventarioResumen.objects.get().total_medicamentos, 3)
+
+    def test_json_en_streaming(self):
+        archivo = io.StringIO(json.dumps([
+            {'nombre_generico': f'Med {i}', 'registro_sanitario': f'RS-{i}', 'cantidad': i}
+            for i in range(50)
+        ]))
+        filas = list(leer_json(archivo, tamano_bloque=16))
+        self.assertEqual(len(filas), 50)
+        self.assertEqual(filas[-1]['registro_sanitario'], 'RS-49')
@@ -18,6 +18,9 @@ urlpatterns = [
     path('medicamentos/detalle/<int:id_medicamento>/', login_required(views.medicamento_detail), name='medicamento_detail'),
     path('medicamentos/cambiar-estado/<int:id_medicamento>/', login_required(views.medicamento_toggle_estado), name='medicamento_toggle_estado'),
     path('medicamentos/reporte-stock/', login_required(views.medicamento_stock_report), name='medicamento_stock_report'),
+    path('medicamentos/reporte-stock/exportar/<str:formato>/', login_required(views.medicamento_stock_export), name='medicamento_stock_export'),
+    path('api/medicamentos/suggest', login_required(views.medicamento_sugerencias), name='medicamento_sugerencias'),
+    path('api/alertas-stock', login_required(views.alerta_stock_list), name='alerta_stock_list'),
     # =======================
     # RUTAS DE PROVEEDORES
     # =======================
@@ -39,8 +42,19 @@ urlpatterns = [
     # =======================
     path('ventas/', login_required(views.venta_list), name='venta_list'),
     path('ventas/crear/', login_required(views.venta_create), name='venta_create'),
+    path('api/ventas/checkout', login_required(views.venta_checkout), name='venta_checkout'),
+    path('api/ventas/sincronizar', login_required(views.venta_sincronizar), name='venta_sincronizar'),
     path('ventas/editar/<int:id_venta>/', login_required(views.venta_edit), name='venta_edit'),
     path('ventas/eliminar/<int:id_venta>/', login_required(views.venta_delete), name='venta_delete'),
+    path('ventas/exportar/<str:formato>/', login_required(views.venta_export), name='venta_export'),
+    path('ventas/reporte/', login_required(views.venta_reporte), name='venta_reporte'),
+
+    # =======================
+    # RUTAS ASÍNCRONAS DEL POS (ASGI)
+    # =======================
+    path('api/pos/medicamentos/<int:id_medicamento>/stock', login_required(views.medicamento_stock), name='medicamento_stock'),
+    path('api/pos/medicamentos/suggest', login_required(views.medicamento_sugerencias_pos), name='medicamento_sugerencias_pos'),
+    path('api/pos/ventas/checkout', login_required(views.venta_checkout_pos), name='venta_checkout_pos'),
 
     # =======================
     # RUTAS DE LOTES
@@ -49,6 +63,9 @@ urlpatterns = [
     path('lotes/crear/', login_required(views.lote_create), name='lote_create'),
     path('lotes/editar/<int:id_lote>/', login_required(views.lote_edit), name='lote_edit'),
     path('lotes/eliminar/<int:id_lote>/', login_required(views.lote_delete), name='lote_delete'),
+    path('lotes/exportar/<str:formato>/', login_required(views.lote_export), name='lote_export'),
+    path('lotes/pronostico/', login_required(views.lote_pronostico), name='lote_pronostico'),
+    path('lotes/pronostico/exportar/<str:formato>/', login_required(views.lote_pronostico_export), name='lote_pronostico_export'),
 
     # ==========================
     # RUTAS DE FACTURA COMPRA
@@ -57,6 +74,7 @@ urlpatterns = [
     path('facturas-compra/crear/', login_required(views.facturacompra_create), name='facturacompra_create'),
     path('facturas-compra/editar/<int:id_factura_compra>/', login_required(views.facturacompra_edit), name='facturacompra_edit'),
     path('facturas-compra/eliminar/<int:id_factura_compra>/', login_required(views.facturacompra_delete), name='facturacompra_delete'),
+    path('api/facturas-compra/recepcion', login_required(views.facturacompra_recepcion), name='facturacompra_recepcion'),
     
     # ==========================
     # RUTAS LOTE_MEDICAMENTO
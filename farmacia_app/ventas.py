@@ -0,0 +1,359 @@
+"""
+Venta de un carrito completo: una Venta con N líneas (Factura) y uno o más
+pagos (MetodoPago).
+
+El costo en consultas no depende del número de líneas: los precios se leen en
+una consulta y se cotizan con las reglas de precios.py, el stock de todos los
+medicamentos se descuenta con un solo UPDATE condicional (ver
+stock.ajustar_stock_varios) y las líneas y los pagos se insertan con
+bulk_create, todo dentro de una transacción. Una venta por carrito no se
+edita desde venta_edit (el formulario maneja un solo medicamento): se elimina
+y se cobra de nuevo.
+
+sincronizar_ventas aplica del mismo modo un lote de ventas hechas fuera de
+línea por los terminales; cada venta trae un UUID generado en el terminal y
+VentaSincronizada recuerda los ya aplicados para que reenviar el lote no
+duplique nada.
+
+aregistrar_venta_carrito es la variante para las vistas asíncronas del POS:
+valida y cotiza en el bucle de eventos y solo la transacción (que el ORM
+asíncrono de Django no admite) corre en un hilo con sync_to_async.
+"""
+import uuid
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cliente, Empleados, Factura, Medicamento, MetodoPago, Venta, VentaSincronizada
+from .lotes import asignar_lotes
+from .opciones import invalidar_opciones
+from .precios import PrecioInvalido, aprecios_vigentes, cotizar, precios_vigentes
+from .stock import ajustar_stock_varios
+from .ventas_diarias import aportes_venta, registrar_aportes
+
+CENTAVOS = Decimal('0.01')
+
+# Máximo de ventas aceptadas en un lote de sincronización
+MAXIMO_VENTAS_POR_LOTE = 1000
+
+
+class CarritoInvalido(Exception):
+    pass
+
+
+def _entero_positivo(valor, campo):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise CarritoInvalido(f'Valor inválido en {campo}: {valor!r}')
+    if valor <= 0:
+        raise CarritoInvalido(f'{campo} debe ser mayor que cero')
+    return valor
+
+
+def _monto(valor, campo, defecto=None):
+    if valor in (None, ''):
+        if defecto is None:
+            raise CarritoInvalido(f'Falta {campo}')
+        return defecto
+    try:
+        valor = Decimal(str(valor)).quantize(CENTAVOS)
+    except InvalidOperation:
+        raise CarritoInvalido(f'Valor inválido en {campo}: {valor!r}')
+    if valor < 0:
+        raise CarritoInvalido(f'{campo} no puede ser negativo')
+    return valor
+
+
+def _agrupar_lineas(lineas):
+    """
+    {id_medicamento: cantidad} sumando las líneas repetidas del mismo producto
+    """
+    if not lineas:
+        raise CarritoInvalido('El carrito está vacío')
+    if not isinstance(lineas, list):
+        raise CarritoInvalido('Las líneas deben ser una lista')
+    cantidades = {}
+    for numero, linea in enumerate(lineas, start=1):
+        if not isinstance(linea, dict):
+            raise CarritoInvalido(f'Línea {numero} mal formada')
+        id_medicamento = _entero_positivo(linea.get('id_medicamento'), 'id_medicamento')
+        cantidad = _entero_positivo(linea.get('cantidad'), 'cantidad')
+        cantidades[id_medicamento] = cantidades.get(id_medicamento, 0) + cantidad
+    return cantidades
+
+
+class Carrito:
+    """
+    Venta validada en memoria, lista para guardarse con bulk_create
+    """
+
+    def __init__(self, lineas, pagos, id_cliente=None, id_empleado=None,
+                 descuento=None, fecha=None):
+        self.cantidades = _agrupar_lineas(lineas)
+        self.id_cliente = None if id_cliente is None else _entero_positivo(id_cliente, 'id_cliente')
+        self.id_empleado = None if id_empleado is None else _entero_positivo(id_empleado, 'id_empleado')
+        # Descuento manual; el impuesto y los descuentos por regla los calcula el servidor
+        self.descuento = _monto(descuento, 'descuento', Decimal('0.00'))
+        self.fecha = fecha or timezone.localdate()
+
+        if not pagos:
+            raise CarritoInvalido('Falta el método de pago')
+        if not isinstance(pagos, list):
+            raise CarritoInvalido('Los pagos deben ser una lista')
+        self.pagos = []
+        for numero, pago in enumerate(pagos, start=1):
+            if not isinstance(pago, dict):
+                raise CarritoInvalido(f'Pago {numero} mal formado')
+            tipo_pago = str(pago.get('tipo_pago') or '').strip()
+            if not tipo_pago:
+                raise CarritoInvalido('Falta tipo_pago')
+            self.pagos.append((
+                tipo_pago[:50],
+                str(pago.get('referencia_pago') or '').strip() or None,
+                _monto(pago.get('monto'), 'monto'),
+            ))
+        self.cotizacion = None
+        self.total = None
+
+    def aplicar_precios(self, precios):
+        """
+        Calcula el total con los precios del servidor ({pk: precio} de los
+        medicamentos activos) y verifica que los pagos lo cubran exactamente
+        """
+        try:
+            self.cotizacion = cotizar(self.cantidades, precios, self.descuento)
+        except PrecioInvalido as e:
+            raise CarritoInvalido(str(e))
+
+        total = self.cotizacion.total
+        pagado = sum(monto for _, _, monto in self.pagos)
+        if pagado != total:
+            raise CarritoInvalido(f'Los pagos ({pagado}) no coinciden con el total ({total})')
+        self.total = total
+
+    def venta(self):
+        return Venta(
+            fecha=self.fecha,
+            total=self.total,
+            id_cliente_id=self.id_cliente,
+            id_empleado_id=self.id_empleado,
+            descuento=self.cotizacion.descuento,
+            impuesto=self.cotizacion.impuesto,
+            estado='Pagada',
+            # Las unidades de cada producto están en las líneas (Factura)
+            id_medicamento=None,
+            cantidad=sum(self.cantidades.values()),
+        )
+
+    def lineas(self, venta):
+        return [
+            Factura(
+                id_venta=venta,
+                id_medicamento_id=pk,
+                cantidad=linea.cantidad,
+                precio_unitario=linea.precio_unitario,
+                subtotal=linea.subtotal,
+                total=linea.total,
+                fecha=self.fecha,
+            )
+            for pk, linea in self.cotizacion.lineas.items()
+        ]
+
+    def metodos_pago(self, venta):
+        return [
+            MetodoPago(id_venta=venta, tipo_pago=tipo_pago, referencia_pago=referencia, monto=monto)
+            for tipo_pago, referencia, monto in self.pagos
+        ]
+
+
+def _guardar(carritos):
+    """
+    Inserta las ventas, sus líneas y sus pagos con tres bulk_create, asigna
+    los lotes de cada línea y suma las ventas al acumulado diario
+    """
+    ventas = Venta.objects.bulk_create([carrito.venta() for carrito in carritos])
+    # bulk_create no emite señales
+    invalidar_opciones(Venta)
+    lineas = Factura.objects.bulk_create([
+        linea for carrito, venta in zip(carritos, ventas) for linea in carrito.lineas(venta)
+    ])
+    asignar_lotes([(linea.id_venta, linea, linea.id_medicamento_id, linea.cantidad) for linea in lineas])
+    MetodoPago.objects.bulk_create([
+        pago for carrito, venta in zip(carritos, ventas) for pago in carrito.metodos_pago(venta)
+    ])
+    registrar_aportes([
+        aporte
+        for carrito, venta in zip(carritos, ventas)
+        for aporte in aportes_venta(venta, [
+            (pk, linea.cantidad, linea.total) for pk, linea in carrito.cotizacion.lineas.items()
+        ])
+    ])
+    return ventas
+
+
+def registrar_venta_carrito(lineas, pagos, id_cliente=None, id_empleado=None, descuento=None):
+    """
+    Crea la venta de un carrito; lanza CarritoInvalido o StockInsuficiente.
+
+    `lineas` es una lista de {'id_medicamento', 'cantidad'} y `pagos` una de
+    {'tipo_pago', 'monto', 'referencia_pago'} cuya suma debe ser el total.
+    """
+    carrito = Carrito(lineas, pagos, id_cliente, id_empleado, descuento)
+    # Precios del servidor, nunca los que envía el cliente
+    carrito.aplicar_precios(precios_vigentes(list(carrito.cantidades)))
+    return cobrar_carrito(carrito)
+
+
+async def aregistrar_venta_carrito(lineas, pagos, id_cliente=None, id_empleado=None, descuento=None):
+    """
+    Igual que registrar_venta_carrito, para las vistas asíncronas
+    """
+    carrito = Carrito(lineas, pagos, id_cliente, id_empleado, descuento)
+    carrito.aplicar_precios(await aprecios_vigentes(list(carrito.cantidades)))
+    return await sync_to_async(cobrar_carrito)(carrito)
+
+
+def cobrar_carrito(carrito):
+    """
+    Descuenta el stock y guarda la venta de un carrito ya cotizado
+    """
+    with transaction.atomic():
+        ajustar_stock_varios((pk, -cantidad) for pk, cantidad in carrito.cantidades.items())
+        venta, = _guardar([carrito])
+    return venta
+
+
+# ===========================
+# SINCRONIZACIÓN DE TERMINALES FUERA DE LÍNEA
+# ===========================
+def _leer_venta_sincronizada(datos):
+    """
+    (uuid, Carrito) de una venta del lote; lanza CarritoInvalido
+    """
+    if not isinstance(datos, dict):
+        raise CarritoInvalido('Venta mal formada')
+    try:
+        id_uuid = uuid.UUID(str(datos.get('uuid')))
+    except ValueError:
+        raise CarritoInvalido(f'UUID inválido: {datos.get("uuid")!r}')
+
+    fecha = None
+    if datos.get('fecha'):
+        try:
+            fecha = date.fromisoformat(str(datos['fecha']))
+        except ValueError:
+            raise CarritoInvalido(f'Fecha inválida: {datos["fecha"]!r}')
+        if fecha > timezone.localdate():
+            raise CarritoInvalido('La fecha de la venta está en el futuro')
+
+    carrito = Carrito(
+        datos.get('lineas'),
+        datos.get('pagos'),
+        id_cliente=datos.get('id_cliente'),
+        id_empleado=datos.get('id_empleado'),
+        descuento=datos.get('descuento'),
+        fecha=fecha,
+    )
+    return id_uuid, carrito
+
+
+def sincronizar_ventas(lote):
+    """
+    Aplica un lote de ventas fuera de línea en una transacción y devuelve un
+    resultado por venta, en el mismo orden: 'aplicada', 'duplicada' (su UUID
+    ya se había aplicado) o 'rechazada' (con el motivo)
+    """
+    if len(lote) > MAXIMO_VENTAS_POR_LOTE:
+        raise CarritoInvalido(f'El lote supera el máximo de {MAXIMO_VENTAS_POR_LOTE} ventas')
+
+    resultados = [None] * len(lote)
+    leidas = []  # (posición, uuid, carrito)
+    for posicion, datos in enumerate(lote):
+        try:
+            id_uuid, carrito = _leer_venta_sincronizada(datos)
+        except CarritoInvalido as e:
+            resultados[posicion] = {
+                'uuid': datos.get('uuid') if isinstance(datos, dict) else None,
+                'estado': 'rechazada',
+                'error': str(e),
+            }
+            continue
+        leidas.append((posicion, id_uuid, carrito))
+
+    with transaction.atomic():
+        # Dentro de la transacción: dos reenvíos simultáneos no aplican dos veces
+        aplicadas = dict(
+            VentaSincronizada.objects.filter(uuid__in=[u for _, u, _ in leidas]).values_list('uuid', 'id_venta')
+        )
+
+        # Precios y stock de todos los productos del lote en una consulta,
+        # bloqueando las filas (en SQLite la transacción ya tiene el bloqueo)
+        ids = {pk for _, _, carrito in leidas for pk in carrito.cantidades}
+        filas = Medicamento.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list(
+            'pk', 'precio_unitario', 'estado', 'cantidad'
+        )
+        precios = {}
+        disponibles = {}
+        for pk, precio, estado, cantidad in filas:
+            disponibles[pk] = cantidad
+            if estado == 1:
+                precios[pk] = precio
+
+        # Clientes y empleados referenciados (una llave inválida rechaza solo su venta)
+        clientes = set(Cliente.objects.filter(
+            pk__in={c.id_cliente for _, _, c in leidas if c.id_cliente}
+        ).values_list('pk', flat=True))
+        empleados = set(Empleados.objects.filter(
+            pk__in={c.id_empleado for _, _, c in leidas if c.id_empleado}
+        ).values_list('pk', flat=True))
+
+        # Se simula el stock venta por venta: las que no alcanzan se rechazan
+        # y el resto se descuenta de una sola vez
+        aceptadas = []
+        vistas = set()
+        for posicion, id_uuid, carrito in leidas:
+            resultado = {'uuid': str(id_uuid)}
+            resultados[posicion] = resultado
+            if id_uuid in aplicadas or id_uuid in vistas:
+                resultado.update(estado='duplicada', id_venta=aplicadas.get(id_uuid))
+                continue
+            vistas.add(id_uuid)
+            try:
+                if carrito.id_cliente and carrito.id_cliente not in clientes:
+                    raise CarritoInvalido(f'El cliente {carrito.id_cliente} no existe')
+                if carrito.id_empleado and carrito.id_empleado not in empleados:
+                    raise CarritoInvalido(f'El empleado {carrito.id_empleado} no existe')
+                carrito.aplicar_precios(precios)
+                faltante = next(
+                    (pk for pk, cantidad in carrito.cantidades.items() if disponibles[pk] < cantidad), None
+                )
+                if faltante is not None:
+                    raise CarritoInvalido(
+                        f'No hay suficiente stock del medicamento {faltante}. '
+                        f'Stock disponible: {disponibles[faltante]}'
+                    )
+            except CarritoInvalido as e:
+                resultado.update(estado='rechazada', error=str(e))
+                continue
+            for pk, cantidad in carrito.cantidades.items():
+                disponibles[pk] -= cantidad
+            aceptadas.append((resultado, id_uuid, carrito))
+
+        if aceptadas:
+            movimientos = [
+                (pk, -cantidad) for _, _, carrito in aceptadas for pk, cantidad in carrito.cantidades.items()
+            ]
+            ajustar_stock_varios(movimientos)
+            ventas = _guardar([carrito for _, _, carrito in aceptadas])
+            VentaSincronizada.objects.bulk_create([
+                VentaSincronizada(uuid=id_uuid, id_venta=venta)
+                for (_, id_uuid, _), venta in zip(aceptadas, ventas)
+            ])
+            for (resultado, _, _), venta in zip(aceptadas, ventas):
+                resultado.update(estado='aplicada', id_venta=venta.id_venta)
+
+    return resultados
@@ -0,0 +1,230 @@
+"""
+Acumulado diario de ventas (VentaDiaria) para los reportes.
+
+Cada fila suma las unidades, el monto y el número de ventas que incluyeron el
+medicamento para un (fecha, medicamento, empleado). En lugar de recorrer todo el historial de
+ventas, los reportes diarios y mensuales leen estas filas, y cada alta, edición
+o baja de una venta aplica solo su diferencia: a lo sumo tres consultas sin
+importar cuántas líneas traiga.
+
+El monto es siempre lo cobrado: el total de la venta, con descuentos e
+impuesto. Una venta simple lo aporta completo a su medicamento; una venta por
+carrito lo reparte entre sus líneas (Factura) en proporción al total de cada
+una (repartir_total), así que la suma del acumulado de un día es la suma de
+Venta.total de ese día sin importar cómo se hizo cada venta. Las ventas sin
+fecha no entran en el acumulado. Los cambios hechos por fuera de las vistas
+(admin, SQL) se corrigen con el comando reconstruir_ventas_diarias, que aplica
+el mismo reparto.
+"""
+from decimal import Decimal
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Factura, Venta, VentaDiaria
+from .precios import CENTAVOS
+
+# Id guardado cuando la venta no tiene medicamento o empleado
+SIN_ID = 0
+
+
+def repartir_total(total, lineas):
+    """
+    Reparte el total cobrado de una venta entre sus líneas [(id_medicamento,
+    cantidad, total de la línea)] en proporción al total de cada una; la
+    última se queda con el redondeo para que sumen exactamente `total`
+    """
+    total = total or Decimal('0')
+    base = sum((monto or Decimal('0') for _, _, monto in lineas), Decimal('0'))
+    repartidas = []
+    restante = total
+    for posicion, (id_medicamento, cantidad, monto) in enumerate(lineas):
+        if posicion == len(lineas) - 1:
+            parte = restante
+        elif base:
+            parte = (total * (monto or Decimal('0')) / base).quantize(CENTAVOS)
+        else:
+            parte = Decimal('0')
+        restante -= parte
+        repartidas.append((id_medicamento, cantidad, parte))
+    return repartidas
+
+
+def aportes_venta(venta, lineas=None, signo=1):
+    """
+    Aportes [(fecha, id_medicamento, id_empleado, unidades, monto, ventas)] de
+    una venta. `lineas` son sus (id_medicamento, cantidad, total de la línea)
+    si es una venta por carrito; signo=-1 para descontarla.
+    """
+    if venta.fecha is None:
+        return []
+    id_empleado = venta.id_empleado_id or SIN_ID
+    if lineas:
+        lineas = repartir_total(venta.total, lineas)
+    else:
+        lineas = [(venta.id_medicamento_id, venta.cantidad, venta.total)]
+    # Dos líneas del mismo medicamento cuentan como una sola venta
+    por_medicamento = {}
+    for id_medicamento, cantidad, monto in lineas:
+        acumulado = por_medicamento.setdefault(id_medicamento or SIN_ID, [0, Decimal('0')])
+        acumulado[0] += cantidad or 0
+        acumulado[1] += monto or Decimal('0')
+    return [
+        (venta.fecha, id_medicamento, id_empleado, signo * unidades, signo * monto, signo)
+        for id_medicamento, (unidades, monto) in por_medicamento.items()
+    ]
+
+
+def lineas_venta(venta):
+    # Las líneas anteriores a precios.py no guardaban el total: vale el subtotal
+    return list(
+        Factura.objects.filter(id_venta=venta).order_by('pk').values_list(
+            'id_medicamento', 'cantidad', Coalesce('total', 'subtotal')
+        )
+    )
+
+
+def _agrupar(aportes):
+    grupos = {}
+    for fecha, id_medicamento, id_empleado, unidades, monto, ventas in aportes:
+        acumulado = grupos.setdefault((fecha, id_medicamento, id_empleado), [0, Decimal('0'), 0])
+        acumulado[0] += unidades
+        acumulado[1] += monto
+        acumulado[2] += ventas
+    return grupos
+
+
+def registrar_aportes(aportes):
+    """
+    Aplica los aportes al acumulado: una lectura de las filas afectadas
+    (bloqueadas), un bulk_update y un bulk_create para las claves nuevas.
+    Se debe llamar dentro de la transacción que guarda la venta.
+    """
+    grupos = {
+        clave: valores for clave, valores in _agrupar(aportes).items() if any(valores)
+    }
+    if not grupos:
+        return
+
+    with transaction.atomic():
+        existentes = VentaDiaria.objects.select_for_update().filter(
+            fecha__in={fecha for fecha, _, _ in grupos},
+            id_medicamento__in={id_medicamento for _, id_medicamento, _ in grupos},
+            id_empleado__in={id_empleado for _, _, id_empleado in grupos},
+        )
+        modificadas = []
+        for fila in existentes:
+            valores = grupos.pop((fila.fecha, fila.id_medicamento, fila.id_empleado), None)
+            if valores is None:
+                continue
+            fila.unidades += valores[0]
+            fila.monto += valores[1]
+            fila.numero_ventas += valores[2]
+            modificadas.append(fila)
+        if modificadas:
+            VentaDiaria.objects.bulk_update(modificadas, ['unidades', 'monto', 'numero_ventas'])
+        if grupos:
+            VentaDiaria.objects.bulk_create([
+                VentaDiaria(
+                    fecha=fecha, id_medicamento=id_medicamento, id_empleado=id_empleado,
+                    unidades=unidades, monto=monto, numero_ventas=ventas,
+                )
+                for (fecha, id_medicamento, id_empleado), (unidades, monto, ventas) in grupos.items()
+            ])
+
+
+def _aportes_carritos():
+    """
+    Aportes de todas las ventas por carrito, recorriendo sus líneas en orden
+    de venta (el reparto del total necesita todas las líneas de cada una)
+    """
+    lineas = Factura.objects.filter(id_venta__fecha__isnull=False).order_by('id_venta', 'pk').values_list(
+        'id_venta', 'id_venta__fecha', 'id_venta__id_empleado', 'id_venta__total',
+        'id_medicamento', 'cantidad', Coalesce('total', 'subtotal'),
+    )
+    actual, lineas_actual = None, []
+    for id_venta, fecha, id_empleado, total, id_medicamento, cantidad, monto in lineas.iterator():
+        if actual is not None and id_venta != actual.pk:
+            yield from aportes_venta(actual, lineas_actual)
+            lineas_actual = []
+        if actual is None or id_venta != actual.pk:
+            actual = Venta(pk=id_venta, fecha=fecha, id_empleado_id=id_empleado, total=total)
+        lineas_actual.append((id_medicamento, cantidad, monto))
+    if actual is not None:
+        yield from aportes_venta(actual, lineas_actual)
+
+
+def reconstruir_ventas_diarias():
+    """
+    Recalcula todo el acumulado desde Venta (un GROUP BY de las ventas
+    simples) y Factura (las líneas de los carritos, para repartir su total);
+    devuelve el número de filas creadas
+    """
+    simples = Venta.objects.filter(fecha__isnull=False, factura__isnull=True).values_list(
+        'fecha', 'id_medicamento', 'id_empleado'
+    ).annotate(
+        unidades=Coalesce(Sum('cantidad'), 0),
+        monto=Sum('total'),
+        ventas=Count('pk'),
+    ).order_by()
+
+    grupos = _agrupar(chain(
+        (
+            (fecha, id_medicamento or SIN_ID, id_empleado or SIN_ID, unidades, monto or Decimal('0'), ventas)
+            for fecha, id_medicamento, id_empleado, unidades, monto, ventas in simples.iterator()
+        ),
+        _aportes_carritos(),
+    ))
+
+    with transaction.atomic():
+        VentaDiaria.objects.all().delete()
+        creadas = VentaDiaria.objects.bulk_create(
+            (
+                VentaDiaria(
+                    fecha=fecha, id_medicamento=id_medicamento, id_empleado=id_empleado,
+                    unidades=unidades, monto=monto, numero_ventas=ventas,
+                )
+                for (fecha, id_medicamento, id_empleado), (unidades, monto, ventas) in grupos.items()
+            ),
+            batch_size=500,
+        )
+    return len(creadas)
+
+
+# ===========================
+# REPORTES
+# ===========================
+def ventas_por_periodo(desde, hasta, periodo='diario'):
+    """
+    Totales por día (o por mes con periodo='mensual') entre dos fechas,
+    leídos solo del acumulado
+    """
+    filas = VentaDiaria.objects.filter(fecha__range=(desde, hasta))
+    if periodo == 'mensual':
+        filas = filas.annotate(periodo=TruncMonth('fecha'))
+    else:
+        filas = filas.annotate(periodo=F('fecha'))
+    return filas.values('periodo').annotate(
+        unidades=Sum('unidades'),
+        monto=Sum('monto'),
+    ).order_by('periodo')
+
+
+def ventas_por(campo, desde, hasta, modelo, limite=None):
+    """
+    Totales por id_medicamento o id_empleado entre dos fechas, de mayor a menor
+    monto, con el objeto correspondiente (None si ya no existe o es SIN_ID)
+    """
+    filas = list(
+        VentaDiaria.objects.filter(fecha__range=(desde, hasta)).values(campo).annotate(
+            unidades=Sum('unidades'),
+            monto=Sum('monto'),
+            ventas=Sum('numero_ventas'),
+        ).order_by('-monto', campo)[:limite]
+    )
+    objetos = modelo.objects.in_bulk([fila[campo] for fila in filas if fila[campo] != SIN_ID])
+    for fila in filas:
+        fila['objeto'] = objetos.get(fila[campo])
+    return filas
@@ -1,11 +1,55 @@
+import heapq
+import json
+from datetime import date, timedelta
+from operator import attrgetter
+from urllib.parse import urlencode
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db import transaction
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
 from django.contrib.auth.decorators import login_required  
-from .models import Medicamento, Proveedor, Empleados, Venta, Lote, FacturaCompra, LoteMedicamento, Cliente, DevolucionCliente,DevolucionProveedor
+from django.views.decorators.http import require_GET, require_POST
+from .models import Medicamento, Proveedor, Empleados, Venta, Lote, FacturaCompra, LoteMedicamento, Cliente, DevolucionCliente,DevolucionProveedor, Factura
 from .forms import MedicamentoForm, ProveedorForm, EmpleadoForm, VentaForm, LoteForm,FacturaCompraForm, LoteMedicamentoForm, ClienteForm,DevolucionClienteForm,DevolucionProveedorForm
+from .alertas import alertas_abiertas
+from .busqueda import buscar_medicamentos
+from .compras import RecepcionInvalida, registrar_recepcion
+from .estado_lotes import INACTIVO, MAXIMO_DIAS_POR_VENCER, estado_por_vencimiento, reglas as reglas_lotes
+from .exportacion import FORMATOS, respuesta_exportacion
+from .idempotencia import idempotente
+from .inventario import CATEGORIAS_STOCK, VALOR_INVENTARIO, medicamentos_por_categoria, obtener_resumen_inventario
+from .lotes import asignar_lotes, liberar_lotes
+from .opciones import opciones
+from .paginacion import paginar_por_cursor
+from .precios import PrecioInvalido, cotizar, reglas
+from .pronostico import VENTANA_DIAS, pronosticar_perdidas
+from .stock import StockInsuficiente, ajustar_stock, ajustar_stock_varios
+from .sugerencias import asugerir_con_stock, sugerir_con_stock
+from .ventas import CarritoInvalido, aregistrar_venta_carrito, registrar_venta_carrito, sincronizar_ventas
+from .ventas_diarias import aportes_venta, lineas_venta, registrar_aportes, ventas_por, ventas_por_periodo
+
+# Filas por página en los listados paginados por cursor
+MEDICAMENTOS_POR_PAGINA = 50
+
+# Filas por página del listado de ventas (dentro del rango de fechas)
+VENTAS_POR_PAGINA = 50
+
+# Filas por página del listado de lotes
+LOTES_POR_PAGINA = 50
+
+# Máximo de alertas devueltas por el endpoint de alertas de stock
+LIMITE_ALERTAS = 50
+
+# Medicamentos más vendidos que muestra el reporte de ventas
+LIMITE_MAS_VENDIDOS = 10
+
+# Lotes con más pérdida que muestra el pronóstico de vencimientos
+LIMITE_PRONOSTICO = 100
 
 
 # ===========================
@@ -21,7 +65,9 @@ def home(request):
     
     # Pasar el rol al contexto del template
     context = {
-        'rol': rol_usuario
+        'rol': rol_usuario,
+        # Conteo sobre el índice parcial de alertas abiertas (no recorre el catálogo)
+        'total_alertas_stock': alertas_abiertas().count(),
     }
     
     return render(request, 'home/home.html', context)
@@ -33,25 +79,46 @@ def home(request):
 @login_required
 def medicamento_list(request):
     """
-    Vista para listar todos los medicamentos
+    Vista para listar los medicamentos paginados por cursor
     """
     try:
-        medicamentos = Medicamento.objects.all().order_by('nombre_generico')
+        medicamentos = Medicamento.objects.all()
         
         # Filtros opcionales
         estado_filter = request.GET.get('estado')
         if estado_filter:
             medicamentos = medicamentos.filter(estado=int(estado_filter))
         
+        # Búsqueda de texto completo: los resultados se ordenan por relevancia
+        campos_orden = ('nombre_generico', 'id_medicamento')
         search_query = request.GET.get('search')
         if search_query:
-            medicamentos = medicamentos.filter(nombre_generico__icontains=search_query)
+            medicamentos = buscar_medicamentos(medicamentos, search_query)
+            campos_orden = ('rango', 'id_medicamento')
+        
+        # Totales en una sola consulta con agregados condicionales
+        resumen = medicamentos.aggregate(
+            total=Count('pk'),
+            activos=Count('pk', filter=Q(estado=1)),
+            inactivos=Count('pk', filter=Q(estado=0)),
+        )
+        
+        pagina = paginar_por_cursor(
+            medicamentos,
+            campos_orden,
+            despues=request.GET.get('despues'),
+            antes=request.GET.get('antes'),
+            por_pagina=MEDICAMENTOS_POR_PAGINA,
+        )
         
         context = {
-            'medicamentos': medicamentos,
-            'total_medicamentos': medicamentos.count(),
-            'medicamentos_activos': medicamentos.filter(estado=1).count(),
-            'medicamentos_inactivos': medicamentos.filter(estado=0).count(),
+            'medicamentos': pagina,
+            'pagina': pagina,
+            'estado_filter': estado_filter or '',
+            'search_query': search_query or '',
+            'total_medicamentos': resumen['total'],
+            'medicamentos_activos': resumen['activos'],
+            'medicamentos_inactivos': resumen['inactivos'],
         }
         
         return render(request, 'medicamento/list.html', context)
@@ -61,6 +128,7 @@ def medicamento_list(request):
         return render(request, 'medicamento/list.html', {'medicamentos': []})
 
 @login_required
+@idempotente
 def medicamento_create(request):
     """
     Vista para crear un nuevo medicamento
@@ -117,9 +185,11 @@ def medicamento_create(request):
                     medicamento.precio_unitario = 0.0
                 # stock_minimo ya se maneja en el clean_stock_minimo del formulario
                 
-                medicamento.save()
-                messages.success(request, f'Medicamento "{medicamento.nombre_generico}" creado exitosamente.')
-                return redirect('medicamento_list')
+                # Un registro sanitario repetido deja el error en el formulario
+                if form.save():
+                    messages.success(request, f'Medicamento "{medicamento.nombre_generico}" creado exitosamente.')
+                    return redirect('medicamento_list')
+                messages.error(request, 'Por favor, corrige los errores en el formulario.')
                 
             except Exception as e:
                 messages.error(request, f'Error al guardar el medicamento: {str(e)}')
@@ -217,10 +287,11 @@ def medicamento_edit(request, id_medicamento):
                     medicamento_actualizado.precio_unitario = 0.0
                 # stock_minimo ya se maneja en el clean_stock_minimo del formulario
                 
-                medicamento_actualizado.save()
-                print("=== MEDICAMENTO ACTUALIZADO ===")
-                messages.success(request, f'Medicamento "{medicamento_actualizado.nombre_generico}" actualizado exitosamente.')
-                return redirect('medicamento_list')
+                if form.save():
+                    print("=== MEDICAMENTO ACTUALIZADO ===")
+                    messages.success(request, f'Medicamento "{medicamento_actualizado.nombre_generico}" actualizado exitosamente.')
+                    return redirect('medicamento_list')
+                messages.error(request, 'Por favor, corrige los errores en el formulario.')
                 
             except Exception as e:
                 print(f"=== ERROR AL GUARDAR ===")
@@ -314,29 +385,20 @@ def medicamento_stock_report(request):
     Vista para generar reporte de stock
     """
     try:
-        medicamentos = Medicamento.objects.all().order_by('nombre_generico')
+        # Valor del inventario y conteos desde la fila del resumen
+        context = obtener_resumen_inventario()
         
-        # Categorizar medicamentos por estado de stock
-        medicamentos_agotados = medicamentos.filter(cantidad=0)
-        medicamentos_bajo_stock = medicamentos.filter(cantidad__gt=0, cantidad__lte=models.F('stock_minimo'))
-        medicamentos_stock_normal = medicamentos.filter(cantidad__gt=models.F('stock_minimo'))
-        
-        # Estadísticas
-        total_valor_inventario = sum(
-            med.cantidad * (med.precio_unitario or 0) 
-            for med in medicamentos 
-            if med.precio_unitario is not None
-        )
-        
-        context = {
-            'medicamentos_agotados': medicamentos_agotados,
-            'medicamentos_bajo_stock': medicamentos_bajo_stock,
-            'medicamentos_stock_normal': medicamentos_stock_normal,
-            'total_medicamentos': medicamentos.count(),
-            'total_valor_inventario': total_valor_inventario,
-            'total_agotados': medicamentos_agotados.count(),
-            'total_bajo_stock': medicamentos_bajo_stock.count(),
-        }
+        # La lista de una categoría solo se carga si se pide, y paginada
+        categoria = request.GET.get('categoria')
+        if categoria in CATEGORIAS_STOCK:
+            context['categoria'] = categoria
+            context['pagina'] = paginar_por_cursor(
+                medicamentos_por_categoria(categoria),
+                ('nombre_generico', 'id_medicamento'),
+                despues=request.GET.get('despues'),
+                antes=request.GET.get('antes'),
+                por_pagina=MEDICAMENTOS_POR_PAGINA,
+            )
         
         return render(request, 'medicamento/stock_report.html', context)
         
@@ -344,6 +406,64 @@ def medicamento_stock_report(request):
         messages.error(request, f'Error al generar el reporte de stock: {str(e)}')
         return render(request, 'medicamento/stock_report.html', {})
 
+@login_required
+def medicamento_stock_export(request, formato):
+    """
+    Exporta el reporte de stock (o una categoría con ?categoria=) en CSV o XLSX
+    """
+    if formato not in FORMATOS:
+        raise Http404('Formato de exportación no soportado')
+    
+    categoria = request.GET.get('categoria')
+    if categoria in CATEGORIAS_STOCK:
+        medicamentos = medicamentos_por_categoria(categoria)
+    else:
+        medicamentos = Medicamento.objects.all()
+    
+    filas = medicamentos.annotate(valor=VALOR_INVENTARIO).order_by('id_medicamento').values_list(
+        'id_medicamento', 'nombre_generico', 'presentacion', 'cantidad',
+        'stock_minimo', 'precio_unitario', 'valor'
+    )
+    encabezados = ['ID', 'Nombre Genérico', 'Presentación', 'Cantidad',
+                   'Stock Mínimo', 'Precio Unitario', 'Valor']
+    return respuesta_exportacion(formato, 'reporte_stock', encabezados, filas)
+
+@login_required
+def medicamento_sugerencias(request):
+    """
+    Autocompletado para el POS: medicamentos cuyo nombre o código de
+    laboratorio empieza por `q`, con el stock actual
+    """
+    # Con ?con_stock=1 se omiten las agotadas
+    resultados = sugerir_con_stock(request.GET.get('q', ''), request.GET.get('con_stock') == '1')
+    return JsonResponse({'resultados': resultados})
+
+@login_required
+def alerta_stock_list(request):
+    """
+    Alertas de reposición abiertas, las más recientes primero
+    """
+    abiertas = alertas_abiertas()
+    alertas = abiertas.order_by('-fecha_apertura').values(
+        'id_alerta', 'id_medicamento', 'id_medicamento__nombre_generico', 'tipo',
+        'id_medicamento__cantidad', 'stock_minimo', 'fecha_apertura',
+    )[:LIMITE_ALERTAS]
+    
+    resultados = [
+        {
+            'id': alerta['id_alerta'],
+            'id_medicamento': alerta['id_medicamento'],
+            'nombre': alerta['id_medicamento__nombre_generico'],
+            'tipo': alerta['tipo'],
+            'cantidad': alerta['id_medicamento__cantidad'],
+            'stock_minimo': alerta['stock_minimo'],
+            'fecha_apertura': alerta['fecha_apertura'],
+        }
+        for alerta in alertas
+    ]
+    
+    return JsonResponse({'total': abiertas.count(), 'alertas': resultados})
+
 # ===========================
 # VISTAS DE PROVEEDORES
 # ===========================
@@ -351,11 +471,11 @@ def proveedor_list(request):
     proveedores = Proveedor.objects.all()
     return render(request, 'proveedor/list.html', {'proveedores': proveedores})
 
+@idempotente
 def proveedor_create(request):
     if request.method == 'POST':
         form = ProveedorForm(request.POST)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.save():
             return redirect('proveedor_list')
     else:
         form = ProveedorForm()
@@ -364,8 +484,7 @@ def proveedor_create(request):
 def proveedor_edit(request, id_proveedor):
     proveedor = get_object_or_404(Proveedor, pk=id_proveedor)
     form = ProveedorForm(request.POST or None, instance=proveedor)
-    if form.is_valid():
-        form.save()
+    if form.is_valid() and form.save():
         return redirect('proveedor_list')
     return render(request, 'proveedor/edit.html', {'form': form})
 
@@ -378,8 +497,7 @@ def proveedor_edit(request, id_proveedor):
     proveedor = get_object_or_404(Proveedor, pk=id_proveedor)
     if request.method == 'POST':
         form = ProveedorForm(request.POST, instance=proveedor)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.save():
             return redirect('proveedor_list')
     else:
         form = ProveedorForm(instance=proveedor)
@@ -391,11 +509,11 @@ def empleado_list(request):
     empleados = Empleados.objects.all()
     return render(request, 'empleado/list.html', {'empleados': empleados})
 
+@idempotente
 def empleado_create(request):
     if request.method == 'POST':
         form = EmpleadoForm(request.POST)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.save():
             return redirect('empleado_list')
     else:
         form = EmpleadoForm()
@@ -404,8 +522,7 @@ def empleado_create(request):
 def empleado_edit(request, id_empleado):
     empleado = get_object_or_404(Empleados, pk=id_empleado)
     form = EmpleadoForm(request.POST or None, instance=empleado)
-    if form.is_valid():
-        form.save()
+    if form.is_valid() and form.save():
         return redirect('empleado_list')
     return render(request, 'empleado/edit.html', {'form': form})
 
@@ -418,113 +535,472 @@ def empleado_delete(request, id_empleado):
 # ===========================
 # VISTAS DE VENTAS
 # ===========================
+def _fecha_parametro(request, nombre, defecto):
+    try:
+        return date.fromisoformat(request.GET.get(nombre, ''))
+    except ValueError:
+        return defecto
+
 def venta_list(request):
-    ventas = Venta.objects.all()
-    return render(request, 'venta/list.html', {'ventas': ventas})
+    """
+    Vista para listar las ventas de un rango de fechas (hoy por defecto),
+    paginadas por cursor sobre el índice (fecha, id_venta)
+    """
+    hoy = timezone.localdate()
+    desde = _fecha_parametro(request, 'desde', hoy)
+    hasta = _fecha_parametro(request, 'hasta', desde if 'desde' in request.GET else hoy)
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    
+    ventas = Venta.objects.filter(fecha__range=(desde, hasta))
+    resumen = ventas.aggregate(total_ventas=Count('pk'), monto_total=Sum('total'))
+    
+    # Solo las columnas que muestra la tabla, con las relaciones en el mismo JOIN
+    ventas = ventas.select_related('id_cliente', 'id_empleado', 'id_medicamento').only(
+        'id_venta', 'fecha', 'cantidad', 'total', 'descuento', 'impuesto', 'estado',
+        'id_cliente__nombre', 'id_empleado__nombre',
+        'precio_unitario', 'id_medicamento__nombre_generico',
+    )
+    pagina = paginar_por_cursor(
+        ventas,
+        ('fecha', 'id_venta'),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=VENTAS_POR_PAGINA,
+    )
+    
+    # Navegación por periodos del mismo largo que el seleccionado
+    dias = (hasta - desde).days + 1
+    return render(request, 'venta/list.html', {
+        'ventas': pagina,
+        'pagina': pagina,
+        'desde': desde,
+        'hasta': hasta,
+        'periodo_anterior': (desde - timedelta(days=dias), desde - timedelta(days=1)),
+        'periodo_siguiente': (hasta + timedelta(days=1), hasta + timedelta(days=dias)),
+        'total_ventas': resumen['total_ventas'],
+        'monto_total': resumen['monto_total'] or 0,
+    })
+
+def venta_export(request, formato):
+    if formato not in FORMATOS:
+        raise Http404('Formato de exportación no soportado')
+    
+    filas = Venta.objects.order_by('id_venta').values_list(
+        'id_venta', 'fecha', 'id_cliente__nombre', 'id_empleado__nombre',
+        'id_medicamento__nombre_generico', 'cantidad', 'total', 'descuento',
+        'impuesto', 'estado'
+    )
+    encabezados = ['ID', 'Fecha', 'Cliente', 'Empleado', 'Medicamento', 'Cantidad',
+                   'Total', 'Descuento', 'Impuesto', 'Estado']
+    return respuesta_exportacion(formato, 'ventas', encabezados, filas)
+
+def _medicamento_seleccionado(form):
+    """
+    Medicamento elegido en el formulario de venta (para re-mostrar el select)
+    """
+    valor = form['id_medicamento'].value()
+    if not valor or not str(valor).isdigit():
+        return Medicamento.objects.none()
+    return Medicamento.objects.filter(pk=valor)
 
+def _cotizar_venta(venta, precios=None):
+    """
+    Fija precio_unitario, descuento, impuesto y total de una venta simple con
+    el motor de precios; el descuento del formulario es el manual
+    """
+    if venta.id_medicamento_id is None:
+        raise PrecioInvalido('Seleccione un medicamento')
+    cotizacion = cotizar({venta.id_medicamento_id: venta.cantidad}, precios, venta.descuento)
+    venta.precio_unitario = cotizacion.lineas[venta.id_medicamento_id].precio_unitario
+    venta.descuento = cotizacion.descuento
+    venta.impuesto = cotizacion.impuesto
+    venta.total = cotizacion.total
+
+def _descuento_manual(venta):
+    """
+    Parte manual del descuento guardado (sin los descuentos por regla)
+    """
+    if venta.id_medicamento_id is None or venta.precio_unitario is None:
+        return venta.descuento or 0
+    cotizacion = cotizar({venta.id_medicamento_id: venta.cantidad}, {venta.id_medicamento_id: venta.precio_unitario})
+    return max((venta.descuento or 0) - cotizacion.descuento_reglas, 0)
+
+@idempotente
 def venta_create(request):
     if request.method == 'POST':
         form = VentaForm(request.POST)
         if form.is_valid():
-            # Guardar la venta primero
             venta = form.save(commit=False)
             
-            # Verificar que hay suficiente stock
-            medicamento = venta.id_medicamento
-            if venta.cantidad > medicamento.cantidad:
-                # Si no hay suficiente stock, mostrar error
-                form.add_error('cantidad', f'No hay suficiente stock. Stock disponible: {medicamento.cantidad}')
+            # El descuento de stock y la venta se confirman juntos; el UPDATE
+            # condicional falla si otro terminal vendió el stock primero
+            try:
+                _cotizar_venta(venta)
+                with transaction.atomic():
+                    ajustar_stock(venta.id_medicamento_id, -venta.cantidad)
+                    venta.save()
+                    asignar_lotes([(venta, None, venta.id_medicamento_id, venta.cantidad)])
+                    registrar_aportes(aportes_venta(venta))
+            except PrecioInvalido as e:
+                form.add_error(e.campo, str(e))
+            except StockInsuficiente as e:
+                form.add_error('cantidad', str(e))
             else:
-                # Si hay stock, guardar la venta y actualizar stock
-                venta.save()
-                medicamento.cantidad -= venta.cantidad
-                medicamento.save()
                 return redirect('venta_list')
     else:
         form = VentaForm()
     
-    # Obtener clientes, empleados y medicamentos para los selects
-    clientes = Cliente.objects.all()
-    empleados = Empleados.objects.all()
-    medicamentos = Medicamento.objects.filter(cantidad__gt=0)  # Solo medicamentos con stock
+    # Clientes y empleados para los selects (listas cacheadas); los medicamentos se
+    # cargan por autocompletado y solo se envía el ya seleccionado
+    clientes = opciones('clientes')
+    empleados = opciones('empleados')
+    medicamentos = _medicamento_seleccionado(form)
     
     return render(request, 'venta/create.html', {
         'form': form,
         'clientes': clientes,
         'empleados': empleados,
-        'medicamentos': medicamentos
+        'medicamentos': medicamentos,
+        'tasa_impuesto': reglas()['TASA_IMPUESTO'],
     })
 
 def venta_edit(request, id_venta):
     venta = get_object_or_404(Venta, pk=id_venta)
+    # El formulario edita un solo medicamento: una venta por carrito (varias
+    # líneas y pagos) se anula y se vuelve a cobrar
+    if Factura.objects.filter(id_venta=venta).exists():
+        messages.error(
+            request,
+            f'La venta {venta.id_venta} se cobró desde el carrito y no se puede editar; '
+            'elimínela y vuelva a registrarla.',
+        )
+        return redirect('venta_list')
     cantidad_original = venta.cantidad
-    medicamento_original = venta.id_medicamento
+    id_medicamento_original = venta.id_medicamento_id
+    # Copia sin cambios para descontar su aporte al acumulado diario
+    venta_original = Venta(
+        fecha=venta.fecha, total=venta.total, id_empleado_id=venta.id_empleado_id,
+        id_medicamento_id=id_medicamento_original, cantidad=cantidad_original,
+    )
+    precio_original = venta.precio_unitario
+    descuento_manual = _descuento_manual(venta)
     
     if request.method == 'POST':
         form = VentaForm(request.POST, instance=venta)
         if form.is_valid():
             venta_nueva = form.save(commit=False)
-            medicamento_nuevo = venta_nueva.id_medicamento
+            id_medicamento_nuevo = venta_nueva.id_medicamento_id
             
-            # Caso 1: Mismo medicamento, cambiar cantidad
-            if medicamento_original == medicamento_nuevo:
-                diferencia = venta_nueva.cantidad - cantidad_original
-                if diferencia > medicamento_original.cantidad:
-                    form.add_error('cantidad', f'No hay suficiente stock. Stock disponible: {medicamento_original.cantidad}')
-                else:
-                    medicamento_original.cantidad -= diferencia
-                    medicamento_original.save()
-                    venta_nueva.save()
-                    return redirect('venta_list')
+            # Caso 1: Mismo medicamento, se ajusta solo la diferencia
+            if id_medicamento_original == id_medicamento_nuevo:
+                movimientos = [(id_medicamento_nuevo, cantidad_original - venta_nueva.cantidad)]
+                mensaje = 'No hay suficiente stock. Stock disponible: {}'
             
-            # Caso 2: Diferente medicamento
+            # Caso 2: Diferente medicamento, se devuelve el original y se descuenta el nuevo
             else:
-                # Verificar stock en el nuevo medicamento
-                if venta_nueva.cantidad > medicamento_nuevo.cantidad:
-                    form.add_error('cantidad', f'No hay suficiente stock en el nuevo medicamento. Stock disponible: {medicamento_nuevo.cantidad}')
-                else:
-                    # Restaurar stock del medicamento original
-                    medicamento_original.cantidad += cantidad_original
-                    medicamento_original.save()
-                    
-                    # Descontar stock del nuevo medicamento
-                    medicamento_nuevo.cantidad -= venta_nueva.cantidad
-                    medicamento_nuevo.save()
-                    
+                movimientos = [
+                    (id_medicamento_nuevo, -venta_nueva.cantidad),
+                    (id_medicamento_original, cantidad_original),
+                ]
+                mensaje = 'No hay suficiente stock en el nuevo medicamento. Stock disponible: {}'
+            
+            # Con el mismo medicamento se conserva el precio con que se vendió
+            precios = None
+            if id_medicamento_original == id_medicamento_nuevo and precio_original is not None:
+                precios = {id_medicamento_nuevo: precio_original}
+            
+            try:
+                _cotizar_venta(venta_nueva, precios)
+                with transaction.atomic():
+                    ajustar_stock_varios(movimientos)
                     venta_nueva.save()
-                    return redirect('venta_list')
+                    # Las unidades vuelven a sus lotes y se asignan de nuevo
+                    liberar_lotes([venta_nueva.pk])
+                    asignar_lotes([(venta_nueva, None, id_medicamento_nuevo, venta_nueva.cantidad)])
+                    registrar_aportes(aportes_venta(venta_original, signo=-1) + aportes_venta(venta_nueva))
+            except PrecioInvalido as e:
+                form.add_error(e.campo, str(e))
+            except StockInsuficiente as e:
+                form.add_error('cantidad', mensaje.format(e.disponible))
+            else:
+                return redirect('venta_list')
     else:
         form = VentaForm(instance=venta)
     
-    # Obtener clientes, empleados y medicamentos para los selects
-    clientes = Cliente.objects.all()
-    empleados = Empleados.objects.all()
-    medicamentos = Medicamento.objects.filter(cantidad__gt=0)
+    # Clientes y empleados para los selects (listas cacheadas); los medicamentos se
+    # cargan por autocompletado y solo se envía el ya seleccionado
+    clientes = opciones('clientes')
+    empleados = opciones('empleados')
+    medicamentos = _medicamento_seleccionado(form)
     
     return render(request, 'venta/edit.html', {
         'form': form,
         'venta': venta,
         'clientes': clientes,
         'empleados': empleados,
-        'medicamentos': medicamentos
+        'medicamentos': medicamentos,
+        'descuento_manual': request.POST.get('descuento', descuento_manual),
+        'tasa_impuesto': reglas()['TASA_IMPUESTO'],
     })
 
 def venta_delete(request, id_venta):
     venta = get_object_or_404(Venta, pk=id_venta)
     
-    # Restaurar el stock del medicamento antes de eliminar la venta
-    medicamento = venta.id_medicamento
-    medicamento.cantidad += venta.cantidad
-    medicamento.save()
+    # Restaurar el stock solo si esta petición fue la que borró la venta,
+    # para que dos eliminaciones simultáneas no devuelvan el stock dos veces
+    with transaction.atomic():
+        # Unidades de la venta simple y de las líneas de una venta por carrito
+        lineas = lineas_venta(venta)
+        movimientos = [(venta.id_medicamento_id, venta.cantidad)]
+        movimientos += [(id_medicamento, cantidad) for id_medicamento, cantidad, _ in lineas]
+        liberar_lotes([venta.pk])
+        _, borrados = Venta.objects.filter(pk=venta.pk).delete()
+        if borrados.get(Venta._meta.label):
+            ajustar_stock_varios(movimientos)
+            registrar_aportes(aportes_venta(venta, lineas, signo=-1))
     
-    venta.delete()
     return redirect('venta_list')
 
+def venta_reporte(request):
+    """
+    Vista para el reporte de ventas diario o mensual, leído del acumulado
+    VentaDiaria (no recorre las ventas)
+    """
+    periodo = 'mensual' if request.GET.get('periodo') == 'mensual' else 'diario'
+    hoy = timezone.localdate()
+    # Por defecto el mes en curso (diario) o el año en curso (mensual)
+    inicio = hoy.replace(month=1, day=1) if periodo == 'mensual' else hoy.replace(day=1)
+    desde = _fecha_parametro(request, 'desde', inicio)
+    hasta = _fecha_parametro(request, 'hasta', hoy)
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    
+    filas = list(ventas_por_periodo(desde, hasta, periodo))
+    return render(request, 'venta/reporte.html', {
+        'periodo': periodo,
+        'desde': desde,
+        'hasta': hasta,
+        'filas': filas,
+        'total_unidades': sum(fila['unidades'] for fila in filas),
+        'total_monto': sum(fila['monto'] for fila in filas),
+        'medicamentos': ventas_por('id_medicamento', desde, hasta, Medicamento, LIMITE_MAS_VENDIDOS),
+        'empleados': ventas_por('id_empleado', desde, hasta, Empleados),
+    })
+
+@require_POST
+def venta_checkout(request):
+    """
+    Cobra un carrito (JSON) como una sola venta con varias líneas y pagos
+    """
+    try:
+        datos = json.loads(request.body)
+        venta = registrar_venta_carrito(
+            datos.get('lineas'),
+            datos.get('pagos'),
+            id_cliente=datos.get('id_cliente'),
+            id_empleado=datos.get('id_empleado'),
+            descuento=datos.get('descuento'),
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except (CarritoInvalido, StockInsuficiente) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        return JsonResponse({'error': 'El cliente o el empleado no existe'}, status=400)
+    
+    return JsonResponse({'id_venta': venta.id_venta, 'total': venta.total}, status=201)
+
+@require_POST
+def venta_sincronizar(request):
+    """
+    Recibe un lote de ventas hechas fuera de línea ({"ventas": [...]}, cada
+    una con su UUID) y devuelve el resultado de cada una
+    """
+    try:
+        ventas = json.loads(request.body).get('ventas')
+        if not isinstance(ventas, list):
+            raise ValueError
+        resultados = sincronizar_ventas(ventas)
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except CarritoInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        # Otro envío del mismo lote se aplicó a la vez; reenviar devuelve "duplicada"
+        return JsonResponse({'error': 'Conflicto al aplicar el lote, reintente'}, status=409)
+    
+    return JsonResponse({'resultados': resultados})
+
+# ===========================
+# VISTAS ASÍNCRONAS DEL POS (ASGI)
+# ===========================
+# Consulta de stock y cobro para los terminales. Servidas con ASGI (ver
+# farmacia_site/asgi.py) no ocupan un worker mientras esperan la base de datos,
+# así que un reporte lento no deja a los terminales sin atender. Con WSGI
+# también funcionan, pero sin esa ventaja.
+
+@require_GET
+async def medicamento_stock(request, id_medicamento):
+    """
+    Stock actual de un medicamento
+    """
+    try:
+        medicamento = await Medicamento.objects.only(
+            'nombre_generico', 'cantidad', 'stock_minimo', 'estado'
+        ).aget(pk=id_medicamento)
+    except Medicamento.DoesNotExist:
+        return JsonResponse({'error': 'El medicamento no existe'}, status=404)
+    
+    return JsonResponse({
+        'id': medicamento.id_medicamento,
+        'nombre': medicamento.nombre_generico,
+        'cantidad': medicamento.cantidad,
+        'stock_minimo': medicamento.stock_minimo,
+        'estado': medicamento.estado,
+    })
+
+@require_GET
+async def medicamento_sugerencias_pos(request):
+    """
+    Versión asíncrona de medicamento_sugerencias
+    """
+    resultados = await asugerir_con_stock(request.GET.get('q', ''), request.GET.get('con_stock') == '1')
+    return JsonResponse({'resultados': resultados})
+
+@require_POST
+async def venta_checkout_pos(request):
+    """
+    Versión asíncrona de venta_checkout
+    """
+    try:
+        datos = json.loads(request.body)
+        venta = await aregistrar_venta_carrito(
+            datos.get('lineas'),
+            datos.get('pagos'),
+            id_cliente=datos.get('id_cliente'),
+            id_empleado=datos.get('id_empleado'),
+            descuento=datos.get('descuento'),
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except (CarritoInvalido, StockInsuficiente) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        return JsonResponse({'error': 'El cliente o el empleado no existe'}, status=400)
+    
+    return JsonResponse({'id_venta': venta.id_venta, 'total': venta.total}, status=201)
+
 def lote_list(request):
-    lotes = Lote.objects.all()
-    return render(request, 'lote/list.html', {'lotes': lotes})
+    """
+    Vista para listar los lotes por fecha de vencimiento (los que no tienen
+    fecha al final), paginados por cursor, con filtros de vencimiento y
+    medicamento
+    """
+    hoy = timezone.localdate()
+    lotes = Lote.objects.select_related('id_medicamento', 'id_factura_compra')
+    
+    # Filtros opcionales: vencidos o que vencen en los próximos `dias`
+    vencimiento = request.GET.get('vencimiento', '')
+    try:
+        dias = min(MAXIMO_DIAS_POR_VENCER, max(0, int(request.GET.get('dias', ''))))
+    except ValueError:
+        dias = reglas_lotes()['DIAS_POR_VENCER']
+    if vencimiento == 'vencidos':
+        lotes = lotes.filter(fecha_vencimiento__lt=hoy)
+    elif vencimiento == 'por_vencer':
+        lotes = lotes.filter(fecha_vencimiento__range=(hoy, hoy + timedelta(days=dias)))
+    else:
+        vencimiento = ''
+    
+    medicamento_filter = request.GET.get('medicamento', '')
+    if medicamento_filter.isdigit():
+        lotes = lotes.filter(id_medicamento=int(medicamento_filter))
+    else:
+        medicamento_filter = ''
+    
+    pagina = paginar_por_cursor(
+        lotes,
+        ('fecha_vencimiento', 'id_lote'),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=LOTES_POR_PAGINA,
+        nulos_al_final=True,
+    )
+    
+    return render(request, 'lote/list.html', {
+        'lotes': pagina,
+        'pagina': pagina,
+        'vencimiento': vencimiento,
+        'dias': dias,
+        'medicamento_filter': medicamento_filter,
+        'medicamentos': opciones('medicamentos'),
+        # Para conservar los filtros en los enlaces de paginación
+        'filtros': urlencode({'vencimiento': vencimiento, 'dias': dias, 'medicamento': medicamento_filter}),
+    })
+
 
+def lote_export(request, formato):
+    if formato not in FORMATOS:
+        raise Http404('Formato de exportación no soportado')
+    
+    filas = Lote.objects.order_by('id_lote').values_list(
+        'id_lote', 'numero_lote', 'id_medicamento__nombre_generico', 'cantidad',
+        'fecha_fabricacion', 'fecha_vencimiento', 'estado',
+        'id_factura_compra__numero_factura'
+    )
+    encabezados = ['ID', 'Número de Lote', 'Medicamento', 'Cantidad',
+                   'Fecha Fabricación', 'Fecha Vencimiento', 'Estado', 'Factura']
+    return respuesta_exportacion(formato, 'lotes', encabezados, filas)
+
+
+def _parametros_pronostico(request):
+    try:
+        ventana = min(365, max(1, int(request.GET.get('ventana', ''))))
+    except ValueError:
+        ventana = VENTANA_DIAS
+    medicamento = request.GET.get('medicamento', '')
+    return ventana, (int(medicamento) if medicamento.isdigit() else None)
 
+
+def lote_pronostico(request):
+    """
+    Vista para el pronóstico de unidades que vencerán sin venderse, con la
+    velocidad de venta de los últimos `ventana` días
+    """
+    ventana, id_medicamento = _parametros_pronostico(request)
+    pronostico = pronosticar_perdidas(ventana_dias=ventana, id_medicamento=id_medicamento)
+    medicamento_filter = '' if id_medicamento is None else str(id_medicamento)
+    
+    return render(request, 'lote/pronostico.html', {
+        'lotes': heapq.nlargest(LIMITE_PRONOSTICO, pronostico, key=attrgetter('perdida')),
+        'limite': LIMITE_PRONOSTICO,
+        'total_lotes': len(pronostico),
+        'total_unidades': sum(lote.sin_vender for lote in pronostico),
+        'total_perdida': sum(lote.perdida for lote in pronostico),
+        'ventana': ventana,
+        'medicamento_filter': medicamento_filter,
+        'medicamentos': opciones('medicamentos'),
+        'filtros': urlencode({'ventana': ventana, 'medicamento': medicamento_filter}),
+    })
+
+
+def lote_pronostico_export(request, formato):
+    if formato not in FORMATOS:
+        raise Http404('Formato de exportación no soportado')
+    
+    ventana, id_medicamento = _parametros_pronostico(request)
+    filas = (
+        (lote.id_lote, lote.numero_lote, lote.medicamento, lote.fecha_vencimiento, lote.dias,
+         lote.cantidad, lote.velocidad, lote.vendidas, lote.sin_vender, lote.perdida)
+        for lote in pronosticar_perdidas(ventana_dias=ventana, id_medicamento=id_medicamento)
+    )
+    encabezados = ['ID', 'Número de Lote', 'Medicamento', 'Fecha Vencimiento', 'Días', 'Cantidad',
+                   'Ventas por Día', 'Se Venderán', 'Sin Vender', 'Pérdida']
+    return respuesta_exportacion(formato, 'pronostico_vencimientos', encabezados, filas)
+
+
+@idempotente
 def lote_create(request):
     if request.method == 'POST':
         form = LoteForm(request.POST)
@@ -541,11 +1017,12 @@ def lote_create(request):
                 lote.cantidad = 0
             if not lote.numero_lote:
                 lote.numero_lote = "SIN-LOTE"
-            if not lote.estado:
-                lote.estado = "DESCONOCIDO"
+            # El estado sale de la fecha de vencimiento; "Inactivo" se respeta
+            if lote.estado != INACTIVO:
+                lote.estado = estado_por_vencimiento(lote.fecha_vencimiento)
 
-            lote.save()
-            return redirect('lote_list')
+            if form.save():
+                return redirect('lote_list')
         else:
             print("=== ERRORES DEL FORMULARIO ===")
             print(form.errors)
@@ -554,7 +1031,7 @@ def lote_create(request):
         form = LoteForm()
 
     # OBTENER MEDICAMENTOS PARA EL CONTEXTO
-    medicamentos = Medicamento.objects.all()
+    medicamentos = opciones('medicamentos')
     
     return render(request, 'lote/create.html', {
         'form': form,
@@ -584,11 +1061,11 @@ def lote_edit(request, id_lote):
                 lote_actualizado.cantidad = 0
             if not lote_actualizado.numero_lote:
                 lote_actualizado.numero_lote = "SIN-LOTE"
-            if not lote_actualizado.estado:
-                lote_actualizado.estado = "DESCONOCIDO"
+            if lote_actualizado.estado != INACTIVO:
+                lote_actualizado.estado = estado_por_vencimiento(lote_actualizado.fecha_vencimiento)
 
-            lote_actualizado.save()
-            return redirect('lote_list')
+            if form.save():
+                return redirect('lote_list')
 
         else:
             print("=== ERRORES DEL FORMULARIO ===")
@@ -599,7 +1076,7 @@ def lote_edit(request, id_lote):
         print("=== FORMULARIO CARGADO (GET) ===")
 
     # OBTENER MEDICAMENTOS PARA EL CONTEXTO
-    medicamentos = Medicamento.objects.all()
+    medicamentos = opciones('medicamentos')
 
     return render(request, 'lote/edit.html', {
         'form': form,
@@ -620,17 +1097,17 @@ def facturacompra_list(request):
 
 
 # CREAR FACTURA
+@idempotente
 def facturacompra_create(request):
     if request.method == 'POST':
         form = FacturaCompraForm(request.POST)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.save():
             return redirect('facturacompra_list')
     else:
         form = FacturaCompraForm()
 
     # OBTENER PROVEEDORES PARA EL CONTEXTO
-    proveedores = Proveedor.objects.all()
+    proveedores = opciones('proveedores')
     
     return render(request, 'facturas/facturacompra_form.html', {
         'form': form, 
@@ -645,14 +1122,13 @@ def facturacompra_edit(request, id_factura_compra):
 
     if request.method == 'POST':
         form = FacturaCompraForm(request.POST, instance=factura)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.save():
             return redirect('facturacompra_list')
     else:
         form = FacturaCompraForm(instance=factura)
 
     # OBTENER PROVEEDORES PARA EL CONTEXTO
-    proveedores = Proveedor.objects.all()
+    proveedores = opciones('proveedores')
 
     return render(request, 'facturas/facturacompra_form.html', {
         'form': form, 
@@ -672,6 +1148,35 @@ def facturacompra_delete(request, id_factura_compra):
 
     return render(request, 'facturas/facturacompra_delete.html', {'factura': factura})
 
+
+# RECIBIR UNA ENTREGA COMPLETA
+@require_POST
+def facturacompra_recepcion(request):
+    """
+    Registra una factura de compra (JSON) con todos sus lotes y suma las
+    unidades al stock
+    """
+    try:
+        datos = json.loads(request.body)
+        factura = registrar_recepcion(
+            datos.get('id_proveedor'),
+            datos.get('lineas'),
+            numero_factura=datos.get('numero_factura'),
+            fecha=datos.get('fecha'),
+            impuesto=datos.get('impuesto'),
+            estado=datos.get('estado'),
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except RecepcionInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'id_factura_compra': factura.id_factura_compra,
+        'total': factura.total,
+        'lotes': len(datos['lineas']),
+    }, status=201)
+
 # LISTAR LOTES DE MEDICAMENTOS
 def lotemedicamento_list(request):
     lotes = LoteMedicamento.objects.all()
@@ -679,6 +1184,7 @@ def lotemedicamento_list(request):
 
 
 # CREAR LOTE
+@idempotente
 def lotemedicamento_create(request):
     if request.method == 'POST':
         form = LoteMedicamentoForm(request.POST)
@@ -690,8 +1196,8 @@ def lotemedicamento_create(request):
             if lote.cantidad is None:
                 lote.cantidad = 0
 
-            lote.save()
-            return redirect('lotemedicamento_list')
+            if form.save():
+                return redirect('lotemedicamento_list')
 
     else:
         form = LoteMedicamentoForm()
@@ -708,8 +1214,7 @@ def lotemedicamento_edit(request, id_lote_medicamento):
 
     if request.method == 'POST':
         form = LoteMedicamentoForm(request.POST, instance=lote_med)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and form.save():
             return redirect('lotemedicamento_list')
 
     else:
@@ -745,6 +1250,7 @@ def cliente_list(request):
 # ===========================
 # CREAR CLIENTE
 # ===========================
+@idempotente
 def cliente_create(request):
     if request.method == 'POST':
         form = ClienteForm(request.POST)
@@ -815,11 +1321,12 @@ def devolucioncliente_list(request):
     return render(request, 'devolucioncliente/devolucion_list.html', {'devoluciones': devoluciones})
 
 # CREAR
+@idempotente
 def devolucioncliente_create(request):
-    # Obtener las listas para los dropdowns
-    ventas = Venta.objects.all()
-    medicamentos = Medicamento.objects.all()
-    empleados = Empleados.objects.all()
+    # Listas cacheadas para los dropdowns
+    ventas = opciones('ventas')
+    medicamentos = opciones('medicamentos')
+    empleados = opciones('empleados')
     
     if request.method == 'POST':
         form = DevolucionClienteForm(request.POST)
@@ -857,10 +1364,10 @@ def devolucioncliente_create(request):
 def devolucioncliente_edit(request, pk):
     devolucion = get_object_or_404(DevolucionCliente, pk=pk)
     
-    # Obtener las listas para los dropdowns
-    ventas = Venta.objects.all()
-    medicamentos = Medicamento.objects.all()
-    empleados = Empleados.objects.all()
+    # Listas cacheadas para los dropdowns
+    ventas = opciones('ventas')
+    medicamentos = opciones('medicamentos')
+    empleados = opciones('empleados')
 
     if request.method == 'POST':
         form = DevolucionClienteForm(request.POST, instance=devolucion)
@@ -915,10 +1422,11 @@ def devolucionproveedor_list(request):
 
 
 # CREAR
+@idempotente
 def devolucionproveedor_create(request):
-    # Obtener las listas para los dropdowns
-    facturas = FacturaCompra.objects.select_related('id_proveedor').all()
-    empleados = Empleados.objects.all()
+    # Listas cacheadas para los dropdowns
+    facturas = opciones('facturas')
+    empleados = opciones('empleados')
     
     if request.method == 'POST':
         form = DevolucionProveedorForm(request.POST)
@@ -949,9 +1457,9 @@ def devolucionproveedor_create(request):
 def devolucionproveedor_edit(request, pk):
     devolucion = get_object_or_404(DevolucionProveedor, pk=pk)
     
-    # Obtener las listas para los dropdowns
-    facturas = FacturaCompra.objects.select_related('id_proveedor').all()
-    empleados = Empleados.objects.all()
+    # Listas cacheadas para los dropdowns
+    facturas = opciones('facturas')
+    empleados = opciones('empleados')
 
     if request.method == 'POST':
         form = DevolucionProveedorForm(request.POST, instance=devolucion)
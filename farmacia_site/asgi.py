@@ -5,6 +5,29 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Servidor ASGI para el POS
+-------------------------
+Las rutas api/pos/ (stock de un medicamento, autocompletado y cobro) son
+vistas asíncronas: servidas por ASGI esperan la base de datos sin ocupar un
+worker, y un reporte lento no deja a los terminales en cola. El resto de las
+vistas sigue siendo síncrono; Django las corre en un hilo por petición. La
+base usa WAL (settings.DATABASES): sin él un cobro espera a que terminen las
+lecturas de los reportes y la vista asíncrona no gana nada.
+
+    pip install "uvicorn[standard]"
+    uvicorn farmacia_site.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+
+o con Daphne o Hypercorn (``daphne farmacia_site.asgi:application``). Con
+varios workers la caché de settings.CACHES debe ser compartida (ver el
+comentario en settings.py). ``manage.py runserver`` sirve WSGI: las vistas
+asíncronas funcionan ahí, pero sin la ventaja.
+
+La mejora se mide con ``python manage.py prueba_carga_pos``: con reportes
+lentos ocupando los workers, envía peticiones del POS a ritmo fijo a las
+aplicaciones WSGI y ASGI sobre una base de prueba y compara la latencia. ASGI
+no agrega CPU: si los reportes saturan el procesador, ninguna de las dos
+opciones ayuda.
 """
 
 import os
@@ -14,3 +37,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'farmacia_site.settings')
 
 application = get_asgi_application()
+
+# Recálculo periódico del estado de los lotes (solo si FARMACIA_LOTES define INTERVALO_MINUTOS)
+from farmacia_app.estado_lotes import iniciar_programador  # noqa: E402
+
+iniciar_programador()
@@ -74,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'farmacia_app.idempotencia.clave_idempotencia',
             ],
         },
     },
@@ -88,6 +89,20 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'Farmacia.db'),
+        'OPTIONS': {
+            # Varios terminales escriben a la vez: cada transacción toma el
+            # bloqueo de escritura al empezar y espera su turno en vez de
+            # fallar con "database is locked" al intentar escalar el bloqueo
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            # El modo WAL (las lecturas largas de los reportes no bloquean los
+            # cobros ni al revés) lo activa una vez la migración 0017: queda
+            # guardado en el archivo y no hace falta repetirlo en cada conexión
+        },
+        # Base de pruebas en archivo (no en memoria) para las pruebas con hilos
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_farmacia.db'),
+        },
     },
 
     # Base de datos secundaria SOLO para usuarios
@@ -97,6 +112,29 @@ DATABASES = {
     #}
 }
 
+# Caché (claves de idempotencia de los formularios). La caché en memoria es
+# por proceso: con varios workers usar una compartida (Redis, Memcached o
+# django.core.cache.backends.db.DatabaseCache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'farmacia',
+    },
+}
+
+# Reglas de precios de las ventas (ver farmacia_app/precios.py)
+FARMACIA_PRECIOS = {
+    'TASA_IMPUESTO': '0',               # proporción sobre el subtotal menos descuentos
+    'DESCUENTO_MAXIMO': '1',            # descuento manual máximo, proporción del subtotal
+    'DESCUENTOS_POR_CANTIDAD': [],      # [(unidades mínimas por línea, proporción)]
+}
+
+# Estado de los lotes por vencimiento (ver farmacia_app/estado_lotes.py)
+FARMACIA_LOTES = {
+    'DIAS_POR_VENCER': 30,              # días de aviso antes del vencimiento
+    'INTERVALO_MINUTOS': None,          # recálculo dentro del proceso web; None: solo el comando
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
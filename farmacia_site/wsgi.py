@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'farmacia_site.settings')
 
 application = get_wsgi_application()
+
+# Recálculo periódico del estado de los lotes (solo si FARMACIA_LOTES define INTERVALO_MINUTOS)
+from farmacia_app.estado_lotes import iniciar_programador  # noqa: E402
+
+iniciar_programador()